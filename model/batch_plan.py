@@ -0,0 +1,231 @@
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from . import main as planner
+from . import metrics
+from .config_generator import UserPreferences, generate_route_config_from_user_preferences
+
+
+# === BATCH PLANNING ===
+# Plans many trips from a JSONL file, e.g. to precompute itineraries overnight:
+#
+#   python -m model.batch_plan requests.jsonl results.jsonl --workers 8
+#
+# Each input line is one trip request:
+#
+#   {"id": "bos-pvd-1", "start": "Boston MA", "end": "Providence RI",
+#    "preferences": {"theme_preference": "Food_and_Drink", "trip_duration_days": 3}}
+#
+# start/end are place names or [lon, lat]; a missing end plans a loop inside the start city.
+# preferences are UserPreferences arguments, max_iterations and time_limit_s (per trip) are
+# optional. Trips run on a bounded thread pool, so they share the planner's route, corridor,
+# tile, POI, ratings and evaluation caches. One result line is appended per trip as soon as it
+# finishes; on restart, trips that already have a result in the output file are skipped.
+
+def read_requests(path):
+    """(request id, request dict or None, error) for every non-empty line of a JSONL file"""
+    with open(path) as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError("a request must be a JSON object")
+            except ValueError as e:
+                yield f"line-{line_number}", None, f"invalid request: {e}"
+                continue
+            yield str(request.get("id", f"line-{line_number}")), request, None
+
+
+def completed_ids(output_path, retry_failed=False):
+    """Ids that already have a result in output_path (a line cut off by a crash is ignored)"""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path) as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                continue
+            if result.get("ok") or not retry_failed:
+                done.add(result["id"])
+    return done
+
+
+def _resolve(place, start_city=None):
+    """(lon, lat) of a place name or [lon, lat]; None plans a loop inside start_city"""
+    if place is None:
+        return planner.generate_random_point_within(planner.get_city_bounds(start_city))
+    if isinstance(place, str):
+        coord = planner.geocode_city(place)
+        if not coord:
+            raise ValueError(f"couldn't geocode {place}")
+        return coord
+    lon, lat = place
+    return (float(lon), float(lat))
+
+
+def plan_request(request_id, request, max_iterations=100, time_limit_s=None):
+    """Plan one trip request and return its JSON-serializable result"""
+    result = {"id": request_id, "start": request.get("start"), "end": request.get("end")}
+    timings = {}
+    with metrics.plan() as plan_metrics:
+        try:
+            start_time = time.perf_counter()
+            preferences = UserPreferences(**request.get("preferences", {}))
+            config = generate_route_config_from_user_preferences(preferences)
+            start_coord = _resolve(request["start"])
+            end_coord = _resolve(request.get("end"), start_city=request["start"])
+            timings["geocode_s"] = time.perf_counter() - start_time
+
+            stage_time = time.perf_counter()
+            initial = planner.generate_random_route_and_poll_pois(start_coord, end_coord, config)
+            timings["initial_route_s"] = time.perf_counter() - stage_time
+            if not initial or not initial[0] or not initial[1]:
+                raise RuntimeError("no initial route")
+            route, pois = initial
+
+            stage_time = time.perf_counter()
+            time_limit_s = request.get("time_limit_s", time_limit_s)
+            best = None
+            for best in planner.simulated_annealing_progress(
+                    pois, start_coord, end_coord, route, config,
+                    max_iterations=request.get("max_iterations", max_iterations),
+                    deadline=time.time() + time_limit_s if time_limit_s else None):
+                pass
+            timings["annealing_s"] = time.perf_counter() - stage_time
+            timings["total_s"] = time.perf_counter() - start_time
+
+            best_route = best["route"] or {}
+            result.update({
+                "ok": True,
+                "start_coord": list(start_coord),
+                "end_coord": list(end_coord),
+                "config": {name: getattr(best["config"], name) for name in best["config"]._fields},
+                "score": float(best["score"]),
+                "iterations": best["iteration"],
+                "duration_s": best_route.get("duration"),
+                "distance_m": best_route.get("distance"),
+                "geometry": best_route.get("geometry"),
+                "pois": best["pois"],
+            })
+        except Exception as e:
+            result.update({"ok": False, "error": f"{type(e).__name__}: {e}"})
+
+    summary = plan_metrics.summary()
+    result.update({"timings": timings, "stages": summary["stages"], "caches": summary["caches"]})
+    return result
+
+
+@contextlib.contextmanager
+def shared_query_mode():
+    """
+    Use the tile cache for Overpass queries while trips run concurrently: the "incremental"
+    mode diffs against the area queried by the previous call, which only makes sense for one
+    route at a time.
+    """
+    saved = planner.poi_query_mode
+    if saved != "tiles":
+        print(f"Switching poi_query_mode from {saved!r} to 'tiles' for concurrent planning", file=sys.stderr)
+    planner.poi_query_mode = "tiles"
+    try:
+        yield
+    finally:
+        planner.poi_query_mode = saved
+
+
+def run_batch(input_path, output_path, workers=4, max_pending=None, max_iterations=100, time_limit_s=None,
+              retry_failed=False, verbose=False):
+    """
+    Plan every request of input_path that has no result in output_path yet.
+
+    Parameters:
+    - workers: Trips planned at the same time
+    - max_pending: Trips read ahead of the workers (defaults to 2 x workers), bounds memory on large inputs
+    - max_iterations, time_limit_s: SA defaults for requests that don't set their own
+    - retry_failed: Also re-plan requests whose previous result is a failure
+    - verbose: Show the planner's output (interleaved across workers)
+
+    Returns:
+    - counts of planned, failed and skipped requests
+    """
+    max_pending = max_pending or 2 * workers
+    done = completed_ids(output_path, retry_failed)
+    counts = {"planned": 0, "failed": 0, "skipped": 0}
+    directory = os.path.dirname(output_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    # a previous run killed mid-write may have left a partial line without its newline
+    needs_newline = os.path.exists(output_path) and os.path.getsize(output_path) > 0
+    if needs_newline:
+        with open(output_path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            needs_newline = f.read(1) != b"\n"
+
+    started = time.perf_counter()
+    with open(output_path, "a") as out, shared_query_mode(), planner.quiet_output(verbose), \
+            ThreadPoolExecutor(max_workers=workers) as executor:
+        if needs_newline:
+            out.write("\n")
+
+        def write(result):
+            out.write(json.dumps(result, default=lambda value: value.tolist()) + "\n")  # numpy values
+            out.flush()
+            counts["planned" if result.get("ok") else "failed"] += 1
+            status = "ok" if result.get("ok") else f"FAILED ({result.get('error')})"
+            print(f"{result['id']}: {status} in {result['timings'].get('total_s', 0.0):.1f} s "
+                  f"[{counts['planned'] + counts['failed']} done, "
+                  f"{time.perf_counter() - started:.0f} s elapsed]", file=sys.stderr)
+
+        pending = set()
+        for request_id, request, error in read_requests(input_path):
+            if request_id in done:
+                counts["skipped"] += 1
+                continue
+            done.add(request_id)  # a duplicate id later in the file is planned only once
+            if error:
+                write({"id": request_id, "ok": False, "error": error, "timings": {}})
+                continue
+
+            if len(pending) >= max_pending:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    write(future.result())
+            pending.add(executor.submit(plan_request, request_id, request, max_iterations, time_limit_s))
+
+        for future in pending:
+            write(future.result())
+
+    print(f"Planned {counts['planned']}, failed {counts['failed']}, skipped {counts['skipped']} "
+          f"(already in {output_path}) in {time.perf_counter() - started:.0f} s", file=sys.stderr)
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Plan trip requests from a JSONL file")
+    parser.add_argument("input", help="JSONL file with one trip request per line")
+    parser.add_argument("output", help="JSONL file results are appended to (resumed if it exists)")
+    parser.add_argument("--workers", type=int, default=4, help="trips planned at the same time")
+    parser.add_argument("--max-pending", type=int, help="trips read ahead of the workers (default 2 x workers)")
+    parser.add_argument("--iterations", type=int, default=100, help="SA max_iterations per trip")
+    parser.add_argument("--time-limit", type=float, help="SA wall-clock limit per trip, in seconds")
+    parser.add_argument("--retry-failed", action="store_true", help="re-plan requests whose last result failed")
+    parser.add_argument("--poi-index", help="answer POI queries from an offline index directory")
+    parser.add_argument("--metrics-port", type=int, help="serve Prometheus metrics on this port while running")
+    parser.add_argument("--verbose", action="store_true", help="show the planner's output")
+    args = parser.parse_args()
+
+    if args.poi_index:
+        planner.load_offline_poi_index(args.poi_index)
+    if args.metrics_port:
+        metrics.start_metrics_server(args.metrics_port)
+    run_batch(args.input, args.output, workers=args.workers, max_pending=args.max_pending,
+              max_iterations=args.iterations, time_limit_s=args.time_limit, retry_failed=args.retry_failed,
+              verbose=args.verbose)
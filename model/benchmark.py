@@ -0,0 +1,466 @@
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from urllib.parse import urlsplit
+from . import main as planner
+from . import metrics
+from .config_generator import UserPreferences, generate_route_config_from_user_preferences
+from .cooling import AdaptiveSchedule
+from .geocoding import CachedGeocoder
+from .http_client import backend_stats, reset_stats
+from .ratings_store import RatingsStore
+from .route_cache import RouteCache
+from .standin_servers import (StandinServer, foursquare_routes, load_recordings, nominatim_routes, osrm_routes,
+                              overpass_routes, proxy_routes)
+from .tile_cache import TileCache
+
+
+# === PLANNER BENCHMARKS ===
+# Runs canonical planning scenarios against local stand-ins for OSRM, Overpass, Nominatim and
+# Foursquare and writes wall time, SA throughput, HTTP calls, bytes and peak memory as JSON,
+# so results can be compared across commits:
+#
+#   python -m model.benchmark run --output benchmarks/after.json
+#   python -m model.benchmark compare benchmarks/before.json benchmarks/after.json
+#
+# The stand-ins listen on the endpoints configured in model/main.py unless --ephemeral-ports is
+# given (needed when the Docker stack is running). `record` proxies the same scenarios to the
+# real backends and saves their responses, which `run --recordings` then replays.
+
+SCENARIOS = [
+    {"name": "boston_loop_tourism", "start": "Boston MA", "end": None, "theme": "Tourism", "days": 2},
+    {"name": "boston_providence_food", "start": "Boston MA", "end": "Providence RI", "theme": "Food_and_Drink",
+     "days": 3},
+    {"name": "boston_new_york_leisure", "start": "Boston MA", "end": "New York NY", "theme": "Leisure", "days": 5},
+]
+
+
+# ==== STAND-IN BACKENDS ====
+def _endpoints():
+    """(service, configured URL) for every backend the planner talks to"""
+    return [("osrm", planner.osrm_route_url),
+            ("osrm", planner.osrm_table_url),
+            ("overpass", planner.overpass_url),
+            ("nominatim", planner.geolocator.api)]
+
+
+def _service_routes(service, upstream=None):
+    if upstream:
+        return proxy_routes(upstream)
+    return {"osrm": osrm_routes, "overpass": overpass_routes,
+            "nominatim": nominatim_routes, "foursquare": foursquare_routes}[service]()
+
+
+def _rebase(url, base):
+    parts = urlsplit(url)
+    return f"{base}{parts.path}" + (f"?{parts.query}" if parts.query else "")
+
+
+@contextlib.contextmanager
+def standin_backends(ephemeral_ports=False, recordings=None, proxy=False):
+    """
+    Start stand-in servers for every backend and point the planner at them for the duration of
+    the block. Yields {service: StandinServer}.
+
+    Parameters:
+    - ephemeral_ports: bind free ports and rewrite the planner URLs instead of binding the configured ones
+    - recordings: recorded responses (see standin_servers.load_recordings) answered before the synthetic ones
+    - proxy: forward to the configured backends and record their responses (implies ephemeral_ports)
+    """
+    ephemeral_ports = ephemeral_ports or proxy
+    servers = {}
+    by_netloc = {}
+    for service, url in _endpoints():
+        by_netloc.setdefault(urlsplit(url).netloc, (service, url))
+
+    saved = {name: getattr(planner, name) for name in
+             ("osrm_route_url", "osrm_trip_url", "osrm_table_url", "overpass_url", "foursquare_url")}
+    saved_geocoder_api = (planner.geolocator.api, planner.geolocator.reverse_api)
+    saved_table_url = planner.duration_matrix.table_url
+    try:
+        for netloc, (service, url) in by_netloc.items():
+            parts = urlsplit(url)
+            upstream = f"{parts.scheme}://{netloc}" if proxy else None
+            host, port = ("127.0.0.1", 0) if ephemeral_ports else (parts.hostname, parts.port or 80)
+            try:
+                server = StandinServer(_service_routes(service, upstream), host, port,
+                                       recordings=recordings, record=proxy)
+            except OSError as e:
+                raise RuntimeError(f"Can't bind the {service} stand-in to {host}:{port} ({e}), "
+                                   f"is the real backend running? Use --ephemeral-ports") from e
+            servers[service] = server.start()
+
+        # Foursquare is a public https API, so its stand-in always gets a local port
+        upstream = "https://api.foursquare.com" if proxy else None
+        servers["foursquare"] = StandinServer(_service_routes("foursquare", upstream), recordings=recordings,
+                                              record=proxy).start()
+        planner.foursquare_url = _rebase(planner.foursquare_url, servers["foursquare"].url)
+
+        if ephemeral_ports:
+            bases = {netloc: servers[service].url for netloc, (service, _) in by_netloc.items()}
+            for name in ("osrm_route_url", "osrm_trip_url", "osrm_table_url", "overpass_url"):
+                url = getattr(planner, name)
+                if urlsplit(url).netloc in bases:
+                    setattr(planner, name, _rebase(url, bases[urlsplit(url).netloc]))
+            planner.duration_matrix.table_url = planner.osrm_table_url
+            planner.geolocator.api = _rebase(planner.geolocator.api, servers["nominatim"].url)
+            planner.geolocator.reverse_api = _rebase(planner.geolocator.reverse_api, servers["nominatim"].url)
+        yield servers
+    finally:
+        for server in servers.values():
+            server.stop()
+        for name, value in saved.items():
+            setattr(planner, name, value)
+        planner.geolocator.api, planner.geolocator.reverse_api = saved_geocoder_api
+        planner.duration_matrix.table_url = saved_table_url
+
+
+@contextlib.contextmanager
+def isolated_caches(cache_dir):
+    """Point the planner's persistent caches at cache_dir (restored afterwards)"""
+    names = ("route_cache", "ratings_store", "tile_cache", "geocoder")
+    saved = {name: getattr(planner, name) for name in names}
+    planner.route_cache = RouteCache(os.path.join(cache_dir, "osrm_routes.sqlite"))
+    planner.ratings_store = RatingsStore(os.path.join(cache_dir, "ratings.sqlite"))
+    planner.tile_cache = TileCache(os.path.join(cache_dir, "overpass_tiles.sqlite"))
+    planner.geocoder = CachedGeocoder(planner.geolocator, os.path.join(cache_dir, "geocoding.sqlite"))
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            setattr(planner, name, value)
+
+
+# ==== SCENARIOS ====
+def run_scenario(scenario, max_iterations=30, seed=0, measure_memory=True, sa_kwargs=None, keep_trace=False):
+    """
+    Plan one scenario end to end and return its measurements. sa_kwargs are passed on to
+    simulated_annealing; keep_trace adds the (evaluations, best score) curve of the search.
+    """
+    random.seed(seed)
+    planner.duration_matrix.reset()
+    planner.poi_manager.reset()
+    planner.surrogate.reset_stats()
+    reset_stats()
+    if measure_memory:
+        tracemalloc.start()
+
+    preferences = UserPreferences(theme_preference=scenario["theme"], trip_duration_days=scenario["days"])
+    config = generate_route_config_from_user_preferences(preferences)
+    result = {"scenario": scenario["name"], "seed": seed, "max_iterations": max_iterations}
+    timings = {}
+    with metrics.plan() as plan_metrics:
+        try:
+            start_time = time.perf_counter()
+            start_coord = planner.geocode_city(scenario["start"])
+            end_coord = (planner.geocode_city(scenario["end"]) if scenario["end"]
+                         else planner.generate_random_point_within(planner.get_city_bounds(scenario["start"])))
+            timings["geocode_s"] = time.perf_counter() - start_time
+
+            stage_time = time.perf_counter()
+            initial = planner.generate_random_route_and_poll_pois(start_coord, end_coord, config)
+            timings["initial_route_s"] = time.perf_counter() - stage_time
+            if not initial or not initial[0]:
+                raise RuntimeError("no initial route")
+            route, pois = initial
+
+            stage_time = time.perf_counter()
+            trace = []
+            best_route, best_config, best_pois = planner.simulated_annealing(pois, start_coord, end_coord, route,
+                                                                             config, max_iterations=max_iterations,
+                                                                             trace=trace, **(sa_kwargs or {}))
+            timings["annealing_s"] = time.perf_counter() - stage_time
+            timings["total_s"] = time.perf_counter() - start_time
+
+            iterations = len(trace) - 1
+            result.update({
+                "ok": True,
+                "iterations": iterations,
+                "iterations_per_s": iterations / timings["annealing_s"] if timings["annealing_s"] else 0.0,
+                "evaluations": trace[-1]["evaluations"],
+                "evaluations_per_s": (trace[-1]["evaluations"] / timings["annealing_s"]
+                                      if timings["annealing_s"] else 0.0),
+                "best_score": trace[-1]["best_score"],
+                "best_pois": len(best_pois or []),
+            })
+            if keep_trace:
+                result["quality_curve"] = [[entry["evaluations"], entry["best_score"]] for entry in trace]
+        except Exception as e:
+            result.update({"ok": False, "error": f"{type(e).__name__}: {e}"})
+        finally:
+            if measure_memory:
+                result["peak_memory_bytes"] = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+
+    backends = {name: stats for name, stats in backend_stats().items() if stats["requests"]}
+    summary = plan_metrics.summary()
+    result.update({
+        "timings": timings,
+        "stages": summary["stages"],
+        "http": {
+            "requests": sum(stats["requests"] for stats in backends.values()),
+            "errors": sum(stats["errors"] for stats in backends.values()),
+            "bytes_sent": sum(stats["bytes_sent"] for stats in backends.values()),
+            "bytes_received": sum(stats["bytes_received"] for stats in backends.values()),
+            "backends": backends,
+        },
+        "caches": summary["caches"],
+        "surrogate": planner.surrogate.stats(),
+    })
+    return result
+
+
+def _git_revision():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                               capture_output=True, text=True, check=True).stdout
+        return commit.strip(), bool(dirty.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def run_benchmarks(scenarios=SCENARIOS, max_iterations=30, seed=0, repeat=1, ephemeral_ports=False,
+                   recordings=None, cache_dir=None, measure_memory=True, verbose=False, record_path=None,
+                   batch_size=1):
+    """
+    Run every scenario `repeat` times and return the report dict. Repeats share the caches, so
+    the first run of a scenario is cold and later runs show the warm-cache cost. batch_size is
+    the number of SA neighbors evaluated concurrently per step.
+    """
+    commit, dirty = _git_revision()
+    report = {
+        "commit": commit,
+        "dirty": dirty,
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "settings": {"max_iterations": max_iterations, "seed": seed, "repeat": repeat, "batch_size": batch_size,
+                     "poi_query_mode": planner.poi_query_mode, "use_duration_matrix": planner.use_duration_matrix,
+                     "overpass_max_concurrency": planner.overpass_max_concurrency,
+                     "offline_poi_index": planner.offline_poi_index is not None,
+                     "recorded_responses": bool(recordings) or record_path is not None},
+        "runs": [],
+    }
+    with tempfile.TemporaryDirectory() as temp_dir, \
+            standin_backends(ephemeral_ports, recordings, proxy=record_path is not None) as servers, \
+            isolated_caches(cache_dir or temp_dir):
+        for scenario in scenarios:
+            for run in range(repeat):
+                served_before = sum(server.request_count for server in servers.values())
+                with planner.quiet_output(verbose):
+                    result = run_scenario(scenario, max_iterations, seed, measure_memory,
+                                          sa_kwargs={"batch_size": batch_size})
+                result["repeat"] = run
+                result["standin_requests"] = sum(server.request_count for server in servers.values()) - served_before
+                report["runs"].append(result)
+                print(_summary_line(result))
+
+        if record_path is not None:
+            recorded = {}
+            for server in servers.values():
+                recorded.update(server.recordings)
+            os.makedirs(os.path.dirname(record_path) or ".", exist_ok=True)
+            with open(record_path, "w") as f:
+                json.dump(recorded, f)
+            print(f"Recorded {len(recorded)} responses to {record_path}")
+    return report
+
+
+def _summary_line(result):
+    if not result.get("ok"):
+        return f"{result['scenario']} #{result['repeat']}: FAILED ({result.get('error')})"
+    memory = result.get("peak_memory_bytes")
+    memory_str = f", peak {memory / 2 ** 20:.1f} MiB" if memory is not None else ""
+    return (f"{result['scenario']} #{result['repeat']}: {result['timings']['total_s']:.2f} s, "
+            f"{result['iterations']} iterations ({result['iterations_per_s']:.1f}/s, "
+            f"{result['evaluations_per_s']:.1f} evaluations/s), "
+            f"{result['http']['requests']} HTTP calls, "
+            f"{(result['http']['bytes_sent'] + result['http']['bytes_received']) / 1024:.0f} KiB{memory_str}")
+
+
+# ==== COMPARING REPORTS ====
+COMPARED_METRICS = [
+    ("total_s", lambda run: run["timings"].get("total_s")),
+    ("iterations_per_s", lambda run: run.get("iterations_per_s")),
+    ("evaluations_per_s", lambda run: run.get("evaluations_per_s")),
+    ("http_requests", lambda run: run["http"]["requests"]),
+    ("http_bytes", lambda run: run["http"]["bytes_sent"] + run["http"]["bytes_received"]),
+    ("peak_memory_bytes", lambda run: run.get("peak_memory_bytes")),
+]
+
+
+def compare_reports(before, after):
+    """Print the relative change of each metric for runs present in both reports"""
+    def by_run(report):
+        return {(run["scenario"], run["repeat"]): run for run in report["runs"] if run.get("ok")}
+
+    old_runs, new_runs = by_run(before), by_run(after)
+    print(f"{(before.get('commit') or '?')[:10]} -> {(after.get('commit') or '?')[:10]}")
+    for key in sorted(old_runs.keys() & new_runs.keys()):
+        print(f"{key[0]} #{key[1]}")
+        for name, metric in COMPARED_METRICS:
+            old, new = metric(old_runs[key]), metric(new_runs[key])
+            if old is None or new is None:
+                continue
+            change = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+            print(f"  {name:>18}: {old:>14.2f} -> {new:>14.2f} ({change})")
+
+
+# ==== COOLING SCHEDULES ====
+# annealing setups compared by `python -m model.benchmark schedules`; the first one is the
+# baseline whose final best score the others have to reach
+SCHEDULE_VARIANTS = {
+    "geometric": {},
+    "geometric_auto": {"initial_temperature": "auto"},
+    "lundy_mees_auto": {"initial_temperature": "auto", "schedule": "lundy_mees"},
+    "adaptive_auto": {"initial_temperature": "auto", "schedule": "adaptive"},
+    "adaptive_auto_reheat": {"initial_temperature": "auto", "schedule": AdaptiveSchedule(reheat_after=8)},
+}
+
+
+def run_schedule_comparison(scenarios=SCENARIOS, variants=SCHEDULE_VARIANTS, seeds=(0, 1, 2), max_iterations=60,
+                            ephemeral_ports=False, cache_dir=None, verbose=False):
+    """
+    Iterations-to-quality of each cooling setup: every scenario and seed is planned once per
+    variant from the same initial route, and each run reports how many evaluated candidates
+    (SA iterations plus temperature calibration samples) it needed to reach the final best
+    score of the baseline variant on the same scenario and seed.
+    """
+    baseline = next(iter(variants))
+    commit, dirty = _git_revision()
+    report = {
+        "commit": commit,
+        "dirty": dirty,
+        "timestamp": time.time(),
+        "settings": {"max_iterations": max_iterations, "seeds": list(seeds), "baseline": baseline,
+                     "variants": {name: {key: value if isinstance(value, (str, int, float)) else repr(value)
+                                         for key, value in sa_kwargs.items()}
+                                  for name, sa_kwargs in variants.items()}},
+        "runs": [],
+    }
+    with tempfile.TemporaryDirectory() as temp_dir, standin_backends(ephemeral_ports), \
+            isolated_caches(cache_dir or temp_dir):
+        for scenario in scenarios:
+            for seed in seeds:
+                results = {}
+                for name, sa_kwargs in variants.items():
+                    with planner.quiet_output(verbose):
+                        results[name] = run_scenario(scenario, max_iterations, seed, measure_memory=False,
+                                                     sa_kwargs=sa_kwargs, keep_trace=True)
+                    results[name]["variant"] = name
+
+                reference = results[baseline].get("best_score")
+                for name, result in results.items():
+                    if result.get("ok"):
+                        curve = result["quality_curve"]
+                        result["evaluations"] = curve[-1][0]
+                        result["evaluations_to_baseline"] = (
+                            None if reference is None else
+                            next((evaluations for evaluations, best in curve if best <= reference + 1e-9), None))
+                    report["runs"].append(result)
+                    print(_schedule_line(result))
+
+    report["summary"] = summarize_schedules(report["runs"], variants)
+    for name, summary in report["summary"].items():
+        print(f"{name:>22}: mean best {summary['mean_best_score']:.4f}, reached baseline in "
+              f"{summary['reached_baseline']}/{summary['runs']} runs, median "
+              f"{summary['median_evaluations_to_baseline']} evaluations to get there "
+              f"(of {summary['mean_evaluations']:.1f} on average)")
+    return report
+
+
+def _schedule_line(result):
+    prefix = f"{result['scenario']} seed {result['seed']} {result['variant']}"
+    if not result.get("ok"):
+        return f"{prefix}: FAILED ({result.get('error')})"
+    return (f"{prefix}: best {result['best_score']:.4f} after {result['evaluations']} evaluations, "
+            f"baseline reached after {result['evaluations_to_baseline']}")
+
+
+def summarize_schedules(runs, variants):
+    summary = {}
+    for name in variants:
+        ok = [run for run in runs if run.get("variant") == name and run.get("ok")]
+        reached = sorted(run["evaluations_to_baseline"] for run in ok if run["evaluations_to_baseline"] is not None)
+        summary[name] = {
+            "runs": len(ok),
+            "mean_best_score": sum(run["best_score"] for run in ok) / len(ok) if ok else float("nan"),
+            "mean_evaluations": sum(run["evaluations"] for run in ok) / len(ok) if ok else float("nan"),
+            "reached_baseline": len(reached),
+            "median_evaluations_to_baseline": reached[len(reached) // 2] if reached else None,
+        }
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the planner against local backend stand-ins")
+    commands = parser.add_subparsers(dest="command", required=True)
+    for command in ("run", "record"):
+        command_parser = commands.add_parser(command, help="run the scenarios" if command == "run" else
+                                             "run the scenarios against the real backends and save their responses")
+        command_parser.add_argument("--scenario", action="append", choices=[s["name"] for s in SCENARIOS],
+                                    help="only run this scenario (repeatable)")
+        command_parser.add_argument("--iterations", type=int, default=30, help="SA max_iterations per plan")
+        command_parser.add_argument("--batch-size", type=int, default=1, help="SA neighbors evaluated per step")
+        command_parser.add_argument("--seed", type=int, default=0)
+        command_parser.add_argument("--repeat", type=int, default=1, help="runs per scenario (caches are shared)")
+        command_parser.add_argument("--cache-dir", help="persistent cache directory (default: a fresh temp dir)")
+        command_parser.add_argument("--no-memory", action="store_true", help="skip tracemalloc peak memory tracking")
+        command_parser.add_argument("--verbose", action="store_true", help="show the planner's output")
+        command_parser.add_argument("--output", help="JSON report path")
+    commands.choices["run"].add_argument("--ephemeral-ports", action="store_true",
+                                         help="bind free ports instead of the endpoints configured in main.py")
+    commands.choices["run"].add_argument("--recordings", help="replay responses saved by `record`")
+    commands.choices["record"].set_defaults(output="benchmarks/recordings.json")
+    compare_parser = commands.add_parser("compare", help="compare two JSON reports")
+    compare_parser.add_argument("before")
+    compare_parser.add_argument("after")
+    schedules_parser = commands.add_parser("schedules", help="compare iterations-to-quality of cooling schedules")
+    schedules_parser.add_argument("--scenario", action="append", choices=[s["name"] for s in SCENARIOS],
+                                  help="only run this scenario (repeatable)")
+    schedules_parser.add_argument("--variant", action="append", choices=list(SCHEDULE_VARIANTS),
+                                  help="only compare this setup (repeatable, the first one is the baseline)")
+    schedules_parser.add_argument("--iterations", type=int, default=60, help="SA max_iterations per plan")
+    schedules_parser.add_argument("--seeds", type=int, default=3, help="seeds per scenario")
+    schedules_parser.add_argument("--cache-dir", help="persistent cache directory (default: a fresh temp dir)")
+    schedules_parser.add_argument("--ephemeral-ports", action="store_true",
+                                  help="bind free ports instead of the endpoints configured in main.py")
+    schedules_parser.add_argument("--verbose", action="store_true", help="show the planner's output")
+    schedules_parser.add_argument("--output", help="JSON report path")
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        with open(args.before) as f_before, open(args.after) as f_after:
+            compare_reports(json.load(f_before), json.load(f_after))
+    elif args.command == "schedules":
+        selected = [s for s in SCENARIOS if not args.scenario or s["name"] in args.scenario]
+        variants = {name: SCHEDULE_VARIANTS[name] for name in args.variant or SCHEDULE_VARIANTS}
+        report = run_schedule_comparison(selected, variants, range(args.seeds), args.iterations,
+                                         ephemeral_ports=args.ephemeral_ports, cache_dir=args.cache_dir,
+                                         verbose=args.verbose)
+        output = args.output or f"benchmarks/schedules-{(report['commit'] or 'results')[:10]}.json"
+        os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {output}")
+    else:
+        selected = [s for s in SCENARIOS if not args.scenario or s["name"] in args.scenario]
+        recording = args.command == "record"
+        recordings = load_recordings(args.recordings) if getattr(args, "recordings", None) else None
+        report = run_benchmarks(selected, args.iterations, args.seed, args.repeat,
+                                ephemeral_ports=getattr(args, "ephemeral_ports", False), recordings=recordings,
+                                cache_dir=args.cache_dir, measure_memory=not args.no_memory, verbose=args.verbose,
+                                record_path=args.output if recording else None, batch_size=args.batch_size)
+        if not recording:
+            output = args.output or f"benchmarks/{(report['commit'] or 'results')[:10]}.json"
+            os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+            with open(output, "w") as f:
+                json.dump(report, f, indent=2)
+            print(f"Wrote {output}")
@@ -1,7 +1,62 @@
 import random
+import threading
+from types import MappingProxyType
+import numpy as np
+import shapely
+from shapely.strtree import STRtree
+
+# ==== CONFIGURATION CLASSES ====
+# RouteConfig and UserPreferences are immutable value types: derive changed copies with
+# replace(), compare and hash them by value (so they can key caches), no deepcopy needed.
+class _ValueType:
+    __slots__ = ()
+    _fields = ()
+
+    def _set(self, **values):
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+        object.__setattr__(self, "_hash", None)
+
+    def replace(self, **changes):
+        """Copy with some fields changed"""
+        values = {name: getattr(self, name) for name in self._fields}
+        values.update(changes)
+        return type(self)(**values)
+
+    def _key(self):
+        return tuple(getattr(self, name) for name in self._fields)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable, use replace({name}=...)")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __eq__(self, other):
+        return type(other) is type(self) and other._key() == self._key()
+
+    def __hash__(self):
+        if self._hash is None:
+            object.__setattr__(self, "_hash", hash((type(self).__name__,) + self._key()))
+        return self._hash
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self._fields)
+        return f"{type(self).__name__}({fields})"
+
+    def __reduce__(self):
+        # pickled by value (process pools), since __setattr__ is disabled
+        return type(self)._from_values, (tuple(getattr(self, name) for name in self._fields),)
+
+    @classmethod
+    def _from_values(cls, values):
+        return cls(**dict(zip(cls._fields, values)))
+
+
+class RouteConfig(_ValueType):
+    _fields = ("buffer_km", "min_pois", "max_pois", "daily_capacity", "segment_km", "theme", "time_budget", "pace")
+    __slots__ = _fields + ("_hash",)
 
-# ==== CONFIGURATION CLASS ====
-class RouteConfig:
     def __init__(
         self,
         buffer_km=3,           # Search corridor width
@@ -10,18 +65,27 @@ class RouteConfig:
         daily_capacity=3,       # Stops per day simulation
         segment_km=5,          # Route splitting granularity
         theme="tourism",        # Default theme
-        time_budget=8 *60 * 60          # Exploration tolerance
+        time_budget=8 *60 * 60,          # Exploration tolerance
+        pace="moderate"         # Time spent at each stop, see theme_meta.PACE_FACTORS
     ):
-        self.buffer_km = buffer_km      # parameterized
-        self.min_pois = min_pois        # default value
-        self.max_pois = max_pois        # parameterized
-        self.daily_capacity = daily_capacity    # user defined
-        self.segment_km = segment_km    # parameterized
-        self.theme = theme              # user defined
-        self.time_budget = time_budget           # calculated from user parameters, stored in seconds
+        self._set(
+            buffer_km=buffer_km,            # parameterized
+            min_pois=min_pois,              # default value
+            max_pois=max_pois,              # parameterized
+            daily_capacity=daily_capacity,  # user defined
+            segment_km=segment_km,          # parameterized
+            theme=theme,                    # user defined
+            time_budget=time_budget,        # calculated from user parameters, stored in seconds
+            pace=pace,                      # user defined
+        )
+
+
+class UserPreferences(_ValueType):
+    _fields = ("weights", "theme_preference", "budget_level", "max_daily_spending", "trip_duration_days",
+               "max_daily_driving_hours", "max_daily_pois", "min_poi_rating", "route_type",
+               "prefer_scenic_routes", "roam_level", "pace")
+    __slots__ = _fields + ("_hash",)
 
-
-class UserPreferences:
     def __init__(
         self,
         weights=None,  # Default weights for objective function components
@@ -34,52 +98,123 @@ class UserPreferences:
         min_poi_rating=3.5,  # Minimum acceptable rating (1-5 scale)
         route_type="loop",  # "loop" or "one-way"
         prefer_scenic_routes=True,
-        roam_level=1.5
+        roam_level=1.5,
+        pace="moderate"  # "relaxed", "moderate" or "fast": how long to stay at each stop
     ):
         # Use provided values or default fallbacks
-        self.weights = weights or {
+        weights = weights or {
             "distance": 0.3,         # Preference for shorter routes
             "poi_count": 0.2,        # Preference for more POIs
             "theme_alignment": 0.3,  # How well POIs match preferred themes
             "daily_pace": 0.2        # Preference for comfortable daily schedule
         }
 
-        self.theme_preference = theme_preference or "tourism"
-
-        self.budget_level = budget_level
-        self.max_daily_spending = max_daily_spending
-
-        self.trip_duration_days = trip_duration_days
-        self.max_daily_driving_hours = max_daily_driving_hours
-        self.max_daily_pois = max_daily_pois
-
-        self.min_poi_rating = min_poi_rating
-
-        self.route_type = route_type
-        self.prefer_scenic_routes = prefer_scenic_routes
-
-        self.roam_level = roam_level
+        self._set(
+            # read-only copy, so the preferences stay immutable and hashable
+            weights=MappingProxyType(dict(weights)),
+            theme_preference=theme_preference or "tourism",
+            budget_level=budget_level,
+            max_daily_spending=max_daily_spending,
+            trip_duration_days=trip_duration_days,
+            max_daily_driving_hours=max_daily_driving_hours,
+            max_daily_pois=max_daily_pois,
+            min_poi_rating=min_poi_rating,
+            route_type=route_type,
+            prefer_scenic_routes=prefer_scenic_routes,
+            roam_level=roam_level,
+            pace=pace,
+        )
+
+    def _key(self):
+        return (tuple(sorted(self.weights.items())),) + super()._key()[1:]
+
+    def __reduce__(self):
+        values = (dict(self.weights),) + tuple(getattr(self, name) for name in self._fields[1:])
+        return type(self)._from_values, (values,)
 
 
 class POIQueryManager:
     def __init__(self):
         self.previously_queried_area = None
-        self.cached_pois = []  # Store POIs with their coordinates for efficient filtering
+        self._lock = threading.RLock()          # plans running on several threads share the cache
+        self.reset()
 
     def reset(self):
         """Reset the query state for a new route"""
-        self.previously_queried_area = None
-        self.cached_pois = []
+        with self._lock:
+            self.previously_queried_area = None
+            self._index = {}                    # (lon, lat) -> row in _coords, used for O(1) dedupe
+            self._coords = np.empty((1024, 2))  # array-backed coordinate store, grown by doubling
+            self._size = 0
+            self._tree = None                   # STRtree over the cached points, rebuilt lazily
+            self._tags = {}                     # (lon, lat) -> "key=value" THEMES tag the POI matched
+
+    @property
+    def cached_pois(self):
+        return self.get_cached_pois()
+
+    @cached_pois.setter
+    def cached_pois(self, pois):
+        self.reset_cache(pois)
+
+    def reset_cache(self, pois):
+        """Replace the cached POIs, keeping the previously queried area"""
+        with self._lock:
+            area, tags = self.previously_queried_area, self._tags
+            self.reset()
+            self.previously_queried_area, self._tags = area, tags  # a POI's tag never changes
+            self.add_to_cache(pois)
 
     def add_to_cache(self, pois):
-        """Add new POIs to the cache, avoiding duplicates"""
-        for poi in pois:
-            if poi not in self.cached_pois:
-                self.cached_pois.append(poi)
+        """Add new POIs ((lon, lat) or (lon, lat, tag) records) to the cache, avoiding duplicates"""
+        with self._lock:
+            for poi in pois:
+                key = (poi[0], poi[1])
+                if len(poi) > 2 and poi[2] is not None:
+                    self._tags[key] = poi[2]
+                if key in self._index:
+                    continue
+                if self._size == len(self._coords):
+                    self._coords = np.concatenate([self._coords, np.empty_like(self._coords)])
+                self._coords[self._size] = key
+                self._index[key] = self._size
+                self._size += 1
+                self._tree = None
 
     def get_cached_pois(self):
         """Get all cached POIs"""
-        return self.cached_pois
+        with self._lock:
+            return list(self._index)
+
+    def pois_within(self, area):
+        """Get the cached POIs that lie inside the given (Multi)Polygon"""
+        with self._lock:
+            if self._size == 0:
+                return []
+            coords = self._coords[:self._size]
+            keys = list(self._index)
+            if self._tree is None:
+                self._tree = STRtree(shapely.points(coords))
+            tree = self._tree
+
+        # bounding-box candidates from the tree, then one vectorized point-in-polygon test
+        candidates = np.sort(tree.query(area))
+        shapely.prepare(area)
+        inside = candidates[shapely.contains_xy(area, coords[candidates, 0], coords[candidates, 1])]
+        return [keys[i] for i in inside]
+
+    def add_tags(self, records):
+        """Remember the tags of (lon, lat, tag) records without adding them to the cache"""
+        with self._lock:
+            for lon, lat, tag in records:
+                if tag is not None:
+                    self._tags[(lon, lat)] = tag
+
+    def records(self, pois):
+        """(lon, lat, tag) record of each POI, with the tag it was queried with (None if unknown)"""
+        with self._lock:
+            return [(poi[0], poi[1], poi[2] if len(poi) > 2 else self._tags.get((poi[0], poi[1])))
+                    for poi in pois]
 
 # generates a route based on above user preferences
 def generate_route_config_from_user_preferences(user_preferences = UserPreferences()):
@@ -89,5 +224,6 @@ def generate_route_config_from_user_preferences(user_preferences = UserPreferenc
 
     route_config = RouteConfig(max_pois=max_pois,
                                time_budget=time_budget,
-                               daily_capacity=daily_capacity, theme=user_preferences.theme_preference)
+                               daily_capacity=daily_capacity, theme=user_preferences.theme_preference,
+                               pace=user_preferences.pace)
     return route_config
\ No newline at end of file
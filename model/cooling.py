@@ -0,0 +1,149 @@
+import abc
+import copy
+import math
+
+
+# === COOLING SCHEDULES ===
+# Temperature control for simulated annealing. A schedule is started with the initial
+# temperature and the iteration budget, then told after every iteration whether the candidate
+# was accepted and by how much it changed the score, and returns the next temperature. Any
+# schedule can also reheat when the search stagnates (see should_reheat).
+#
+#   geometric:  T *= cooling_rate (the classic schedule, and the default)
+#   lundy_mees: T /= 1 + beta * T, with beta chosen to reach a final temperature in the budget
+#   adaptive:   raises or lowers T to track a target acceptance ratio that follows the
+#               modified Lam schedule (high at first, ~44% through the middle, then falling)
+
+class CoolingSchedule(abc.ABC):
+    def __init__(self, reheat_after=None, reheat_fraction=0.5, max_reheats=2):
+        """
+        Parameters:
+        - reheat_after: Iterations without a new best after which the search reheats (None = never)
+        - reheat_fraction: A reheat raises the temperature to this fraction of the initial one
+        - max_reheats: Reheats allowed per run
+        """
+        self.reheat_after = reheat_after
+        self.reheat_fraction = reheat_fraction
+        self.max_reheats = max_reheats
+        self.start(100.0, 100)
+
+    def start(self, initial_temperature, max_iterations):
+        """Reset the schedule for a new run and return the initial temperature"""
+        self.initial_temperature = self.temperature = float(initial_temperature)
+        self.max_iterations = max(1, max_iterations)
+        self.iteration = 0
+        self.accepted = 0
+        self.reheats = 0
+        return self.temperature
+
+    def update(self, accepted, delta):
+        """Record one iteration (delta = new score - current score) and return the next temperature"""
+        self.iteration += 1
+        self.accepted += int(accepted)
+        self.temperature = self.next_temperature(accepted, delta)
+        return self.temperature
+
+    @abc.abstractmethod
+    def next_temperature(self, accepted, delta):
+        """The temperature after an iteration; called by update once its counters are recorded"""
+
+    def should_reheat(self, non_improving_iterations, converged=False):
+        """True when the search stagnated (no new best for reheat_after iterations, or the score
+        stopped moving) and reheats are left"""
+        return (self.reheat_after is not None and self.reheats < self.max_reheats
+                and (converged or non_improving_iterations >= self.reheat_after))
+
+    def reheat(self):
+        self.reheats += 1
+        self.temperature = max(self.temperature, self.reheat_fraction * self.initial_temperature)
+        return self.temperature
+
+    def acceptance_ratio(self):
+        return self.accepted / self.iteration if self.iteration else 0.0
+
+
+class GeometricSchedule(CoolingSchedule):
+    def __init__(self, cooling_rate=0.95, **reheating):
+        self.cooling_rate = cooling_rate
+        super().__init__(**reheating)
+
+    def next_temperature(self, accepted, delta):
+        return self.temperature * self.cooling_rate
+
+
+class LundyMeesSchedule(CoolingSchedule):
+    def __init__(self, final_fraction=0.01, **reheating):
+        """final_fraction: temperature reached after max_iterations, relative to the initial one"""
+        self.final_fraction = final_fraction
+        super().__init__(**reheating)
+
+    def start(self, initial_temperature, max_iterations):
+        temperature = super().start(initial_temperature, max_iterations)
+        # T_k = T_0 / (1 + k * beta * T_0), so T reaches final_fraction * T_0 at k = max_iterations
+        self.beta = (1.0 / self.final_fraction - 1.0) / (self.max_iterations * max(temperature, 1e-12))
+        return temperature
+
+    def next_temperature(self, accepted, delta):
+        return self.temperature / (1.0 + self.beta * self.temperature)
+
+
+class AdaptiveSchedule(CoolingSchedule):
+    def __init__(self, adjust_rate=0.9, window=10, **reheating):
+        """
+        Parameters:
+        - adjust_rate: Temperature factor per iteration (T *= adjust_rate when accepting too
+          much, T /= adjust_rate when accepting too little)
+        - window: Iterations the acceptance ratio is averaged over (exponentially weighted)
+        """
+        self.adjust_rate = adjust_rate
+        self.window = max(1, window)
+        super().__init__(**reheating)
+
+    def start(self, initial_temperature, max_iterations):
+        self.recent_acceptance = 0.5
+        return super().start(initial_temperature, max_iterations)
+
+    def target_acceptance(self):
+        return lam_target_acceptance(self.iteration / self.max_iterations)
+
+    def next_temperature(self, accepted, delta):
+        self.recent_acceptance += (float(accepted) - self.recent_acceptance) / self.window
+        if self.recent_acceptance > self.target_acceptance():
+            return self.temperature * self.adjust_rate
+        return self.temperature / self.adjust_rate
+
+
+# target acceptance ratio of the modified Lam schedule at a fraction of the iteration budget
+def lam_target_acceptance(progress):
+    if progress < 0.15:
+        return 0.44 + 0.56 * 560 ** (-progress / 0.15)
+    if progress < 0.65:
+        return 0.44
+    return 0.44 * 440 ** (-(progress - 0.65) / 0.35)
+
+
+SCHEDULES = {"geometric": GeometricSchedule, "lundy_mees": LundyMeesSchedule, "adaptive": AdaptiveSchedule}
+
+
+def make_schedule(schedule=None, cooling_rate=0.95):
+    """
+    Schedule for one annealing run: None is geometric cooling at cooling_rate, a name from
+    SCHEDULES builds that schedule with its defaults, and a CoolingSchedule is copied so one
+    instance can be passed to several concurrent runs.
+    """
+    if schedule is None or schedule == "geometric":
+        return GeometricSchedule(cooling_rate)
+    if isinstance(schedule, str):
+        return SCHEDULES[schedule]()
+    return copy.deepcopy(schedule)
+
+
+def calibrate_initial_temperature(deltas, initial_acceptance=0.8):
+    """
+    Temperature at which a typical uphill move (the mean positive score change among deltas)
+    is accepted with probability initial_acceptance; None when no delta was uphill.
+    """
+    uphill = [delta for delta in deltas if delta > 0]
+    if not uphill:
+        return None
+    return -(sum(uphill) / len(uphill)) / math.log(initial_acceptance)
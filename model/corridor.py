@@ -0,0 +1,152 @@
+import math
+import threading
+from collections import OrderedDict
+import numpy as np
+import shapely
+from shapely.geometry import LineString
+from .geo_kernels import EARTH_RADIUS_M
+
+
+# === MEMOIZED ROUTE CORRIDORS ===
+# The base route between a start and an end never changes during a search, only the corridor
+# parameters do. The engine keeps the base LineString per (start, end), its projection to a
+# local metric plane, the route resampled per segment_km, and the finished corridors per
+# (segment_km, quantized buffer_km). A corridor is one buffer of the resampled line in meters,
+# instead of a union of one buffer per segment.
+
+class LocalProjection:
+    """Equirectangular projection centred on a point: meters east/north of (lon0, lat0)"""
+
+    def __init__(self, lon0, lat0):
+        self.lon0 = lon0
+        self.lat0 = lat0
+        self.x_scale = EARTH_RADIUS_M * math.cos(math.radians(lat0)) * math.pi / 180.0
+        self.y_scale = EARTH_RADIUS_M * math.pi / 180.0
+
+    def forward(self, geometry):
+        return shapely.transform(geometry, lambda coords: np.column_stack(
+            [(coords[:, 0] - self.lon0) * self.x_scale, (coords[:, 1] - self.lat0) * self.y_scale]))
+
+    def inverse(self, geometry):
+        return shapely.transform(geometry, lambda coords: np.column_stack(
+            [coords[:, 0] / self.x_scale + self.lon0, coords[:, 1] / self.y_scale + self.lat0]))
+
+
+class _RouteEntry:
+    def __init__(self, line):
+        self.line = line                     # lon/lat LineString as returned by OSRM
+        lon0, lat0 = line.centroid.x, line.centroid.y
+        self.projection = LocalProjection(lon0, lat0)
+        self.projected = self.projection.forward(line)
+        self.resampled = {}                  # segment_km -> projected LineString through the segment ends
+        self.corridors = OrderedDict()       # (segment_km, buffer_key) -> lon/lat Polygon
+
+
+class CorridorEngine:
+    def __init__(self, fetch_line, max_routes=64, max_corridors_per_route=64, buffer_step_km=0.25):
+        """
+        Parameters:
+        - fetch_line: callable (start, end) -> lon/lat LineString of the base route, or None
+        - max_routes: base routes kept (least recently used are dropped with their corridors)
+        - max_corridors_per_route: corridors kept per base route
+        - buffer_step_km: buffer widths are rounded to this step so nearby widths share a corridor
+        """
+        self.fetch_line = fetch_line
+        self.max_routes = max_routes
+        self.max_corridors_per_route = max_corridors_per_route
+        self.buffer_step_km = buffer_step_km
+        self.route_hits = 0
+        self.route_misses = 0
+        self.corridor_hits = 0
+        self.corridor_misses = 0
+        self._routes = OrderedDict()   # (start, end) -> _RouteEntry
+        self._by_line = {}             # id(line) -> (start, end), for lines handed out by route_line
+        self._lock = threading.Lock()
+
+    def route_line(self, start, end):
+        """Base route LineString between two (lon, lat) points, fetched once per pair"""
+        key = (tuple(start), tuple(end))
+        with self._lock:
+            entry = self._routes.get(key)
+            if entry is not None:
+                self._routes.move_to_end(key)
+                self.route_hits += 1
+                return entry.line
+            self.route_misses += 1
+
+        line = self.fetch_line(start, end)
+        if line is None:
+            return None
+        with self._lock:
+            if key not in self._routes:
+                self._routes[key] = _RouteEntry(line)
+                self._by_line[id(line)] = key
+                while len(self._routes) > self.max_routes:
+                    _, dropped = self._routes.popitem(last=False)
+                    self._by_line.pop(id(dropped.line), None)
+            return self._routes[key].line
+
+    def quantize(self, buffer_km):
+        steps = max(1, round(buffer_km / self.buffer_step_km))
+        return steps * self.buffer_step_km
+
+    def corridor(self, line, segment_km, buffer_km):
+        """
+        Polygon (lon/lat) covering buffer_km around the route resampled every segment_km.
+        Lines returned by route_line are memoized, any other line is built on the spot.
+        """
+        buffer_km = self.quantize(buffer_km)
+        with self._lock:
+            route_key = self._by_line.get(id(line))
+            entry = self._routes.get(route_key) if route_key is not None else None
+            if entry is not None and entry.line is not line:
+                entry = None
+            if entry is not None:
+                cached = entry.corridors.get((segment_km, buffer_km))
+                if cached is not None:
+                    entry.corridors.move_to_end((segment_km, buffer_km))
+                    self.corridor_hits += 1
+                    return _copy(cached)
+            self.corridor_misses += 1
+
+        if entry is None:
+            return self._build(_RouteEntry(line), segment_km, buffer_km)
+
+        with self._lock:
+            polygon = entry.corridors.get((segment_km, buffer_km))
+            if polygon is None:
+                polygon = self._build(entry, segment_km, buffer_km)
+            entry.corridors[(segment_km, buffer_km)] = polygon
+            while len(entry.corridors) > self.max_corridors_per_route:
+                entry.corridors.popitem(last=False)
+        return _copy(polygon)
+
+    def stats(self):
+        return {"route_hits": self.route_hits, "route_misses": self.route_misses,
+                "corridor_hits": self.corridor_hits, "corridor_misses": self.corridor_misses}
+
+    def clear(self):
+        with self._lock:
+            self._routes.clear()
+            self._by_line.clear()
+
+    def _build(self, entry, segment_km, buffer_km):
+        resampled = entry.resampled.get(segment_km)
+        if resampled is None:
+            resampled = entry.resampled[segment_km] = resample_line(entry.projected, segment_km * 1000)
+        return entry.projection.inverse(resampled.buffer(buffer_km * 1000))
+
+
+# callers prepare corridors for point-in-polygon tests, and GEOS fills a prepared geometry's
+# indexes lazily (not thread-safe), so every caller gets its own copy of a cached corridor
+def _copy(geometry):
+    return shapely.from_wkb(shapely.to_wkb(geometry))
+
+
+# line through points spaced `spacing` apart along a line (plus its end point)
+def resample_line(line, spacing):
+    distances = np.append(np.arange(0, line.length, spacing), line.length)
+    points = shapely.get_coordinates(shapely.line_interpolate_point(line, distances))
+    if len(points) < 2:
+        points = np.vstack([points, points])
+    return LineString(points)
@@ -0,0 +1,127 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from . import metrics
+
+
+# === OSRM /table DURATION MATRIX ===
+# Keeps pairwise driving durations/distances for every point seen so far, so the duration of
+# any visiting order can be computed in-process instead of requesting a full /route per
+# candidate. New points only fetch their own rows and columns.
+class DurationMatrix:
+    def __init__(self, table_url, client, max_table_size=100, max_points=2000, max_workers=4):
+        self.table_url = table_url
+        self.client = client
+        self.max_table_size = max_table_size  # OSRM's --max-table-size (coordinates per request)
+        self.max_points = max_points          # start over once the matrix grows past this
+        self.max_workers = max_workers
+        self._lock = threading.RLock()  # ensure() may reset the matrix under concurrent plans
+        self.reset()
+
+    def reset(self):
+        self.points = []                      # (lon, lat) as requested
+        self.index = {}                       # (lon, lat) -> row/column
+        self.snapped = np.empty((0, 2))       # (lon, lat) snapped to the road network by OSRM
+        self.durations = np.empty((0, 0))     # seconds, inf when unreachable
+        self.distances = np.empty((0, 0))     # meters, inf when unreachable
+
+    def ensure(self, points):
+        """Make sure every point has its row and column in the matrix"""
+        with self._lock:
+            new_points = list(dict.fromkeys((float(lon), float(lat)) for lon, lat in points
+                                            if (float(lon), float(lat)) not in self.index))
+            if not new_points:
+                return
+            if len(self.points) + len(new_points) > self.max_points:
+                self.reset()
+                new_points = list(dict.fromkeys((float(lon), float(lat)) for lon, lat in points))
+
+            known = len(self.points)
+            total = known + len(new_points)
+            self.points.extend(new_points)
+            for i, point in enumerate(new_points):
+                self.index[point] = known + i
+            self.snapped = np.vstack([self.snapped, np.asarray(new_points)])
+            self.durations = self._grow(self.durations, total)
+            self.distances = self._grow(self.distances, total)
+
+            # new rows against every column, then the old rows against the new columns
+            new_idx = list(range(known, total))
+            blocks = self._blocks(new_idx, list(range(total))) + self._blocks(list(range(known)), new_idx)
+            try:
+                with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                    list(executor.map(metrics.propagate(lambda block: self._fetch_block(*block)), blocks))
+            except Exception:
+                # never keep rows that were only partially fetched
+                self.reset()
+                raise
+
+    def route(self, coords):
+        """
+        Build an OSRM-like route summary for visiting coords in order.
+
+        Returns:
+        - route_info: dict with duration, distance, per-leg costs and the requested coordinates
+          (geometry is None until the route is materialized through /route)
+        - waypoints: snapped [lat, lon] of every coordinate, matching the /route waypoints
+        """
+        with self._lock:
+            self.ensure(coords)
+            idx = np.array([self.index[(float(lon), float(lat))] for lon, lat in coords])
+            leg_durations = self.durations[idx[:-1], idx[1:]]
+            leg_distances = self.distances[idx[:-1], idx[1:]]
+            snapped = self.snapped[idx]
+        if not np.all(np.isfinite(leg_durations)):
+            return None, None
+
+        route_info = {
+            "duration": float(leg_durations.sum()),
+            "distance": float(leg_distances.sum()),
+            "legs": [{"duration": float(d), "distance": float(m)} for d, m in zip(leg_durations, leg_distances)],
+            "geometry": None,
+            "coordinates": [(float(lon), float(lat)) for lon, lat in coords],
+        }
+        waypoints = [[lat, lon] for lon, lat in snapped.tolist()]
+        return route_info, waypoints
+
+    def submatrix(self, points):
+        """Durations (seconds, inf when unreachable) between every pair of points, in order"""
+        with self._lock:
+            self.ensure(points)
+            idx = [self.index[(float(lon), float(lat))] for lon, lat in points]
+            return self.durations[np.ix_(idx, idx)]
+
+    def _blocks(self, sources, destinations):
+        # split a sources x destinations request so each call stays under max_table_size coordinates
+        if not sources or not destinations:
+            return []
+        half = max(1, self.max_table_size // 2)
+        return [(sources[i:i + half], destinations[j:j + half])
+                for i in range(0, len(sources), half)
+                for j in range(0, len(destinations), half)]
+
+    def _fetch_block(self, sources, destinations):
+        coords = [self.points[i] for i in sources] + [self.points[j] for j in destinations]
+        coord_str = ";".join(f"{lon},{lat}" for lon, lat in coords)
+        source_str = ";".join(str(i) for i in range(len(sources)))
+        destination_str = ";".join(str(len(sources) + j) for j in range(len(destinations)))
+        url = (f"{self.table_url}{coord_str}?annotations=duration,distance"
+               f"&sources={source_str}&destinations={destination_str}")
+        response = self.client.get(url).json()
+        if response.get("code") != "Ok":
+            raise ValueError(f"OSRM table request failed: {response.get('code')}")
+
+        # OSRM reports unreachable pairs as null
+        durations = np.array(response["durations"], dtype=float)
+        distances = np.array(response["distances"], dtype=float)
+        rows, cols = np.ix_(sources, destinations)
+        self.durations[rows, cols] = np.nan_to_num(durations, nan=np.inf)
+        self.distances[rows, cols] = np.nan_to_num(distances, nan=np.inf)
+        for i, source in zip(sources, response.get("sources", [])):
+            self.snapped[i] = source["location"]
+
+    @staticmethod
+    def _grow(matrix, size):
+        grown = np.full((size, size), np.inf)
+        grown[:len(matrix), :len(matrix)] = matrix
+        return grown
@@ -0,0 +1,41 @@
+import numpy as np
+from .theme_meta import DEFAULT_DWELL_HOURS, DWELL_HOURS, PACE_FACTORS, THEMES
+
+
+# === DWELL TIME AT WAYPOINTS ===
+# Deterministic visit lengths: each waypoint gets the dwell time of the THEMES tag its POI
+# matched (a museum takes longer than a cafe or a fuel stop), scaled by the user's pace. The
+# same route therefore always gets the same time score, so scored candidates can be cached and
+# convergence detection sees real improvements instead of noise.
+
+class DwellTimeModel:
+    def __init__(self, hours_by_tag=DWELL_HOURS, default_hours=DEFAULT_DWELL_HOURS, pace_factors=PACE_FACTORS):
+        """
+        Parameters:
+        - hours_by_tag: Visit length in hours per "key=value" tag
+        - default_hours: Visit length of a waypoint whose tag is unknown (or that is not a POI)
+        - pace_factors: Dwell multiplier per pace name
+        """
+        self.pace_factors = dict(pace_factors)
+        self._codes = {tag: code for code, tag in enumerate(hours_by_tag)}
+        # seconds per tag code, the last entry is the default for unknown tags
+        self._seconds = np.array(list(hours_by_tag.values()) + [default_hours], dtype=float) * 60 * 60
+
+    def pace_factor(self, pace):
+        if pace not in self.pace_factors:
+            raise ValueError(f"unknown pace {pace!r}, expected one of {sorted(self.pace_factors)}")
+        return self.pace_factors[pace]
+
+    def default_seconds(self, pace="moderate"):
+        return float(self._seconds[-1] * self.pace_factor(pace))
+
+    def seconds(self, tags, pace="moderate"):
+        """Dwell time in seconds for each tag (None or an unknown tag gets the default), as an array"""
+        unknown = len(self._seconds) - 1
+        codes = np.fromiter((self._codes.get(tag, unknown) for tag in tags), dtype=np.int64)
+        return self._seconds[codes] * self.pace_factor(pace)
+
+    def theme_seconds(self, theme, pace="moderate"):
+        """Mean dwell time in seconds over the tags of a theme (the default for an unknown theme)"""
+        tags = [f"{key}={value}" for key, values in THEMES.get(theme, {}).items() for value in values]
+        return float(self.seconds(tags, pace).mean()) if tags else self.default_seconds(pace)
@@ -0,0 +1,90 @@
+import threading
+from collections import OrderedDict
+from . import metrics
+
+
+# === EVALUATION CACHE FOR ANNEALING CANDIDATES ===
+# Candidates are keyed by their endpoints, the RouteConfig fields that affect the score once the
+# POIs are chosen (theme, POI counts, time budget, daily capacity, pace), the sampled POIs in
+# canonical order and whether the route was asked for with its full geometry, so a candidate that was already routed and scored is answered from memory
+# instead of being routed and scored again. buffer_km and segment_km only decide which POIs are
+# available, and they change by a small random amount in every neighbor, so they are left out.
+#
+# The cache also keeps the corridor POI pools candidates are sampled from, per endpoints, theme,
+# segment_km and quantized buffer_km (see CorridorEngine.quantize), so a candidate whose corridor
+# was polled before is sampled and looked up without querying the corridor again.
+class EvaluationCache:
+    def __init__(self, max_entries=10000, max_pools=256):
+        self.max_entries = max_entries
+        self.max_pools = max_pools
+        self.hits = 0
+        self.misses = 0
+        self.pool_hits = 0
+        self.pool_misses = 0
+        self._entries = OrderedDict()  # key -> (route, waypoints, score, time_percentage)
+        self._pools = OrderedDict()    # pool key -> [(lon, lat, tag), ...]
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(start, end, config, pois, full_geometry=True):
+        return (tuple(start), tuple(end), config.theme, config.min_pois, config.max_pois, config.time_budget,
+                config.daily_capacity, config.pace, tuple(sorted((float(poi[0]), float(poi[1])) for poi in pois)),
+                bool(full_geometry))
+
+    @staticmethod
+    def make_pool_key(start, end, config, buffer_km):
+        """buffer_km: the config's buffer width, already quantized by the caller"""
+        return (tuple(start), tuple(end), config.theme, config.segment_km, buffer_km)
+
+    def get(self, start, end, config, pois, full_geometry=True):
+        """(route, waypoints, score, time_percentage) of an evaluated candidate, or None"""
+        key = self.make_key(start, end, config, pois, full_geometry)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        metrics.record_cache("evaluation", hits=int(entry is not None), misses=int(entry is None))
+        return entry
+
+    def put(self, start, end, config, pois, evaluation, full_geometry=True):
+        key = self.make_key(start, end, config, pois, full_geometry)
+        with self._lock:
+            self._entries[key] = evaluation
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_pool(self, key):
+        """POI records polled for a pool key (see make_pool_key), or None"""
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                self.pool_misses += 1
+            else:
+                self._pools.move_to_end(key)
+                self.pool_hits += 1
+        metrics.record_cache("corridor_pois", hits=int(pool is not None), misses=int(pool is None))
+        return pool
+
+    def put_pool(self, key, pois):
+        with self._lock:
+            self._pools[key] = pois
+            self._pools.move_to_end(key)
+            while len(self._pools) > self.max_pools:
+                self._pools.popitem(last=False)
+
+    def stats(self):
+        total = self.hits + self.misses
+        pool_total = self.pool_hits + self.pool_misses
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries),
+                "hit_ratio": self.hits / total if total else 0.0,
+                "pool_hits": self.pool_hits, "pool_misses": self.pool_misses, "pools": len(self._pools),
+                "pool_hit_ratio": self.pool_hits / pool_total if pool_total else 0.0}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._pools.clear()
@@ -0,0 +1,56 @@
+import numpy as np
+
+# === VECTORIZED GEODESIC KERNELS ===
+# NumPy versions of the scalar distance helpers used by the scoring functions.
+# All inputs are (lon, lat) in degrees and all outputs are in meters.
+
+EARTH_RADIUS_M = 6371 * 1000
+
+
+# haversine distance between paired coordinate arrays (broadcasts like any NumPy ufunc)
+def haversine_distances(lon1, lat1, lon2, lat2):
+    phi1 = np.radians(lat1)
+    phi2 = np.radians(lat2)
+    delta_phi = np.radians(np.subtract(lat2, lat1))
+    delta_lambda = np.radians(np.subtract(lon2, lon1))
+
+    a = np.sin(delta_phi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(delta_lambda / 2) ** 2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    return EARTH_RADIUS_M * c
+
+
+# full distance matrix between two point sets, shape (len(points_a), len(points_b))
+def haversine_matrix(points_a, points_b=None):
+    points_a = np.asarray(points_a, dtype=float).reshape(-1, 2)
+    points_b = points_a if points_b is None else np.asarray(points_b, dtype=float).reshape(-1, 2)
+    return haversine_distances(points_a[:, None, 0], points_a[:, None, 1],
+                               points_b[None, :, 0], points_b[None, :, 1])
+
+
+# mean distance over all unordered pairs of points; above max_exact_points the mean is
+# estimated from sample_pairs random pairs (seeded, so repeated calls agree)
+def pairwise_mean_distance(points, max_exact_points=1000, sample_pairs=50000, seed=0):
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    n = len(points)
+    if n < 2:
+        return 0.0
+
+    if n <= max_exact_points:
+        i, j = np.triu_indices(n, k=1)
+    else:
+        rng = np.random.default_rng(seed)
+        i = rng.integers(0, n, sample_pairs)
+        j = rng.integers(0, n - 1, sample_pairs)
+        j[j >= i] += 1  # draw j from every index except i
+
+    distances = haversine_distances(points[i, 0], points[i, 1], points[j, 0], points[j, 1])
+    return float(distances.mean())
+
+
+# metric length of a polyline given as a sequence of (lon, lat) points
+def polyline_length(points):
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    if len(points) < 2:
+        return 0.0
+    legs = haversine_distances(points[:-1, 0], points[:-1, 1], points[1:, 0], points[1:, 1])
+    return float(legs.sum())
@@ -0,0 +1,131 @@
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+import shapely
+from shapely.geometry import shape, MultiPolygon, Polygon
+from . import metrics
+from .sqlite_store import SQLiteStore
+
+
+# === CACHED GEOCODING ===
+# Forward lookups, reverse lookups and city boundaries are stored in SQLite (boundaries as
+# simplified WKB) behind an in-memory LRU. One forward lookup fetches the point and the
+# boundary together, so planning from a known city needs no Nominatim call at all.
+
+# lower-cases and collapses punctuation/whitespace so "Boston, MA" and "boston ma" share an entry
+def normalize_query(query):
+    return re.sub(r"[\s,;]+", " ", query.strip().lower())
+
+
+class CachedGeocoder(SQLiteStore):
+    SCHEMA = ("""CREATE TABLE IF NOT EXISTS places (
+                        query TEXT PRIMARY KEY,
+                        lon REAL,
+                        lat REAL,
+                        boundary BLOB,
+                        fetched_at REAL NOT NULL)""",
+              """CREATE TABLE IF NOT EXISTS addresses (
+                        key TEXT PRIMARY KEY,
+                        address TEXT,
+                        fetched_at REAL NOT NULL)""")
+
+    def __init__(self, geolocator, path="./cache/geocoding.sqlite", memory_entries=1024,
+                 simplify_tolerance=0.0005, ttl_s=90 * 24 * 60 * 60):
+        self.geolocator = geolocator
+        self.path = path
+        self.memory_entries = memory_entries
+        self.simplify_tolerance = simplify_tolerance  # degrees, applied to stored boundaries
+        self.ttl_s = ttl_s
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()  # (kind, key) -> value
+        self._lock = threading.Lock()
+
+    def geocode(self, query):
+        """(lon, lat) of a place name, or None if it can't be found"""
+        place = self._place(query)
+        return (place[0], place[1]) if place[0] is not None else None
+
+    def boundary(self, query):
+        """Simplified boundary Polygon of a place name, or None"""
+        return self._place(query)[2]
+
+    def reverse_address(self, lat, lon, language="en"):
+        """Nominatim address dict for a coordinate (rounded to ~1 m), or None"""
+        key = f"{round(lat, 5)},{round(lon, 5)},{language}"
+        cached = self._lookup("address", key, "SELECT address FROM addresses WHERE key = ? AND fetched_at >= ?")
+        if cached is not None:
+            return cached[0]
+
+        location = self.geolocator.reverse((lat, lon), language=language)
+        address = location.raw.get("address") if location else None
+        self._store("address", key, (address,), "INSERT OR REPLACE INTO addresses (key, address, fetched_at) "
+                                                "VALUES (?, ?, ?)", (key, json.dumps(address), time.time()))
+        return address
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_ratio": self.hits / total if total else 0.0}
+
+    def _place(self, query):
+        key = normalize_query(query)
+        cached = self._lookup("place", key, "SELECT lon, lat, boundary FROM places WHERE query = ? AND fetched_at >= ?")
+        if cached is not None:
+            return cached
+
+        location = self.geolocator.geocode(query, exactly_one=True, geometry="geojson")
+        lon = location.longitude if location else None
+        lat = location.latitude if location else None
+        boundary = self._boundary_from(location.raw.get("geojson")) if location else None
+        wkb = shapely.to_wkb(boundary) if boundary is not None else None
+        # not-found answers are stored too, so unknown names don't hit Nominatim every run
+        self._store("place", key, (lon, lat, boundary),
+                    "INSERT OR REPLACE INTO places (query, lon, lat, boundary, fetched_at) VALUES (?, ?, ?, ?, ?)",
+                    (key, lon, lat, wkb, time.time()))
+        return lon, lat, boundary
+
+    def _boundary_from(self, geojson):
+        if not geojson or geojson.get("type") not in ("Polygon", "MultiPolygon"):
+            return None
+        geometry = shape(geojson)
+        if isinstance(geometry, MultiPolygon):
+            geometry = max(geometry.geoms, key=lambda polygon: polygon.area)
+        return Polygon(geometry.exterior).simplify(self.simplify_tolerance, preserve_topology=True)
+
+    def _lookup(self, kind, key, sql):
+        with self._lock:
+            value = self._memory.get((kind, key))
+            if value is None:
+                row = self._connection().execute(sql, (key, time.time() - self.ttl_s)).fetchone()
+                if row is not None:
+                    value = self._decode(kind, row)
+                    self._remember((kind, key), value)
+            if value is None:
+                self.misses += 1
+                metrics.record_cache("geocode", misses=1)
+                return None
+            self._memory.move_to_end((kind, key))
+            self.hits += 1
+            metrics.record_cache("geocode", hits=1)
+            return value
+
+    def _store(self, kind, key, value, sql, params):
+        with self._lock:
+            conn = self._connection()
+            conn.execute(sql, params)
+            conn.commit()
+            self._remember((kind, key), value)
+
+    @staticmethod
+    def _decode(kind, row):
+        if kind == "address":
+            return (json.loads(row[0]),)
+        lon, lat, wkb = row
+        return lon, lat, shapely.from_wkb(wkb) if wkb is not None else None
+
+    def _remember(self, key, value):
+        self._memory[key] = value
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
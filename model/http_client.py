@@ -0,0 +1,173 @@
+import bisect
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from geopy.adapters import RequestsAdapter
+from . import metrics
+
+
+# === SHARED HTTP TRANSPORT FOR EXTERNAL BACKENDS ===
+# One pooled, keep-alive session per backend (OSRM, Overpass, Foursquare, Nominatim) so calls
+# reuse TCP/TLS connections, always carry a timeout, and are counted in per-backend stats.
+
+# upper bounds (seconds) of the latency histogram buckets, the last bucket is open ended
+LATENCY_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0]
+
+# default pool size and timeouts (connect, read) per backend
+BACKEND_DEFAULTS = {
+    "osrm": {"pool_size": 16, "timeout": (3.05, 30)},
+    "overpass": {"pool_size": 8, "timeout": (3.05, 180)},
+    "foursquare": {"pool_size": 8, "timeout": (3.05, 10)},
+    "nominatim": {"pool_size": 4, "timeout": (3.05, 10)},
+}
+
+
+class BackendStats:
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.total_latency = 0.0
+        self.latency_histogram = [0] * (len(LATENCY_BUCKETS) + 1)
+        self._lock = threading.Lock()
+
+    def record(self, latency, bytes_sent=0, bytes_received=0, error=False):
+        with self._lock:
+            self.requests += 1
+            self.errors += int(error)
+            self.bytes_sent += bytes_sent
+            self.bytes_received += bytes_received
+            self.total_latency += latency
+            self.latency_histogram[bisect.bisect_left(LATENCY_BUCKETS, latency)] += 1
+
+    def reset(self):
+        with self._lock:
+            self.requests = 0
+            self.errors = 0
+            self.bytes_sent = 0
+            self.bytes_received = 0
+            self.total_latency = 0.0
+            self.latency_histogram = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def as_dict(self):
+        with self._lock:
+            labels = [f"le_{bound}" for bound in LATENCY_BUCKETS] + ["le_inf"]
+            return {
+                "requests": self.requests,
+                "errors": self.errors,
+                "bytes_sent": self.bytes_sent,
+                "bytes_received": self.bytes_received,
+                "mean_latency": self.total_latency / self.requests if self.requests else 0.0,
+                "latency_histogram": dict(zip(labels, self.latency_histogram)),
+            }
+
+
+class BackendClient:
+    def __init__(self, name, pool_size=8, timeout=(3.05, 30), headers=None):
+        self.name = name
+        self.timeout = timeout
+        self.stats = BackendStats()
+        self.session = requests.Session()
+        self.session.headers.update(headers or {})
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def request(self, method, url, **kwargs):
+        """Send a request through the pooled session, recording latency and payload sizes"""
+        kwargs.setdefault("timeout", self.timeout)
+        start_time = time.perf_counter()
+        try:
+            response = self.session.request(method, url, **kwargs)
+        except requests.exceptions.RequestException:
+            latency = time.perf_counter() - start_time
+            self.stats.record(latency, error=True)
+            metrics.record_external_call(self.name, latency, error=True)
+            raise
+
+        latency = time.perf_counter() - start_time
+        body = response.request.body
+        self.stats.record(latency,
+                          bytes_sent=len(body) if body else 0,
+                          bytes_received=len(response.content),
+                          error=not response.ok)
+        metrics.record_external_call(self.name, latency, error=not response.ok)
+        return response
+
+    def close(self):
+        self.session.close()
+
+
+# geopy adapter that sends Nominatim calls through the shared nominatim session
+class PooledGeopyAdapter(RequestsAdapter):
+    def __init__(self, *, proxies, ssl_context):
+        super().__init__(proxies=proxies, ssl_context=ssl_context)
+        self.session.close()
+        self.client = get_client("nominatim")
+        self.session = self.client.session
+
+    def _request(self, url, *, timeout, headers):
+        start_time = time.perf_counter()
+        try:
+            response = super()._request(url, timeout=timeout, headers=headers)
+        except Exception:
+            latency = time.perf_counter() - start_time
+            self.client.stats.record(latency, error=True)
+            metrics.record_external_call(self.client.name, latency, error=True)
+            raise
+        latency = time.perf_counter() - start_time
+        self.client.stats.record(latency, bytes_received=len(response.content))
+        metrics.record_external_call(self.client.name, latency)
+        return response
+
+    def __del__(self):
+        # the session is shared, so never close it with the adapter
+        pass
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def configure_backend(name, pool_size=None, timeout=None, headers=None):
+    """(Re)create the client for a backend with a custom pool size and/or timeout"""
+    defaults = BACKEND_DEFAULTS.get(name, {})
+    client = BackendClient(name,
+                           pool_size=pool_size or defaults.get("pool_size", 8),
+                           timeout=timeout or defaults.get("timeout", (3.05, 30)),
+                           headers=headers)
+    with _clients_lock:
+        previous = _clients.get(name)
+        _clients[name] = client
+    if previous:
+        previous.close()
+    return client
+
+
+def get_client(name):
+    """Return the shared client for a backend, creating it with its defaults on first use"""
+    with _clients_lock:
+        client = _clients.get(name)
+    return client or configure_backend(name)
+
+
+def backend_stats():
+    """Per-backend request counts, bytes and latency histograms"""
+    with _clients_lock:
+        clients = dict(_clients)
+    return {name: client.stats.as_dict() for name, client in clients.items()}
+
+
+def reset_stats():
+    with _clients_lock:
+        clients = list(_clients.values())
+    for client in clients:
+        client.stats.reset()
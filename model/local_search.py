@@ -0,0 +1,211 @@
+import math
+import random
+import time
+import numpy as np
+from .geo_kernels import haversine_matrix
+
+
+# === LOCAL SEARCH ON THE WAYPOINT SEQUENCE ===
+# Moves (insert, remove, swap, 2-opt, or-opt) act on the concrete visiting order instead of
+# re-sampling a random tour. Every move's score change is computed from cached leg costs and
+# running sums, so a step costs O(1)-O(segment) arithmetic and no network calls.
+
+MOVES = ("insert", "remove", "swap", "two_opt", "or_opt")
+
+
+class TourState:
+    """
+    Visiting order over a pool of candidate POIs with a fixed start and end.
+
+    Nodes 0 and 1 are the start and end, nodes 2.. are the candidates. durations is the full
+    node x node travel-time matrix (seconds); dwell and ratings are per-node arrays. Like
+    calculate_score, the rating, spread and count terms cover every node of the tour, start and
+    end included.
+    """
+
+    def __init__(self, points, durations, dwell, ratings, sequence, time_budget, target_count,
+                 min_stops, max_stops, weights):
+        self.points = np.asarray(points, dtype=float)
+        self.durations = np.asarray(durations, dtype=float)
+        self.distances = haversine_matrix(self.points)
+        self.dwell = np.asarray(dwell, dtype=float)
+        self.ratings = np.asarray(ratings, dtype=float)
+        self.time_budget = time_budget
+        self.target_count = target_count
+        self.min_stops = min_stops
+        self.max_stops = max_stops
+        self.weights = weights
+
+        self.nodes = [0] + list(sequence) + [1]
+        self.in_tour = np.zeros(len(self.points), dtype=bool)
+        self.in_tour[self.nodes] = True
+        self.travel = float(self.durations[self.nodes[:-1], self.nodes[1:]].sum())
+        self.dwell_sum = float(self.dwell[self.nodes].sum())
+        self.rating_sum = float(self.ratings[self.nodes].sum())
+        self.pair_sum = float(np.triu(self.distances[np.ix_(self.nodes, self.nodes)], k=1).sum())
+        self.score = self.score_for(self.travel, self.dwell_sum, self.rating_sum, self.pair_sum, len(self.nodes))
+
+    @property
+    def sequence(self):
+        return self.nodes[1:-1]
+
+    def score_for(self, travel, dwell_sum, rating_sum, pair_sum, n):
+        """Same components and weights as calculate_score, from running sums"""
+        mean_rating = rating_sum / n
+        rating_score = 10.0 - min(10.0, mean_rating * 2)
+        spread = pair_sum / (n * (n - 1) / 2) if n > 1 else 0.0
+        geographic_score = abs(spread - 5000.0) / 1000.0
+        time_score = abs(travel + dwell_sum - self.time_budget) / (self.time_budget / 5)
+        poi_count_score = abs(n - self.target_count)
+        return (rating_score * self.weights["rating"] +
+                geographic_score * self.weights["geographic"] +
+                time_score * self.weights["time"] +
+                poi_count_score * self.weights["poi_count"])
+
+    def _edge_sum(self, edges):
+        return sum(self.durations[a, b] for a, b in edges)
+
+    def propose(self, move=None):
+        """Pick a random feasible move; returns (delta_score, move_record) or None"""
+        move = move or random.choice(MOVES)
+        nodes = self.nodes
+        stops = len(nodes) - 2
+        travel_delta, dwell_delta, rating_delta, pair_delta, count_delta = 0.0, 0.0, 0.0, 0.0, 0
+
+        if move == "insert":
+            outside = np.flatnonzero(~self.in_tour)
+            if stops >= self.max_stops or len(outside) == 0:
+                return None
+            node = int(random.choice(outside))
+            pos = random.randint(1, len(nodes) - 1)  # insert before nodes[pos]
+            a, b = nodes[pos - 1], nodes[pos]
+            travel_delta = self.durations[a, node] + self.durations[node, b] - self.durations[a, b]
+            dwell_delta, rating_delta, count_delta = self.dwell[node], self.ratings[node], 1
+            pair_delta = self.distances[node, nodes].sum()
+            record = ("insert", pos, node)
+
+        elif move == "remove":
+            if stops <= self.min_stops or stops == 0:
+                return None
+            pos = random.randint(1, len(nodes) - 2)
+            a, node, b = nodes[pos - 1], nodes[pos], nodes[pos + 1]
+            travel_delta = self.durations[a, b] - self.durations[a, node] - self.durations[node, b]
+            dwell_delta, rating_delta, count_delta = -self.dwell[node], -self.ratings[node], -1
+            pair_delta = -self.distances[node, nodes].sum()
+            record = ("remove", pos, node)
+
+        elif move == "swap":
+            if stops < 2:
+                return None
+            i, j = sorted(random.sample(range(1, len(nodes) - 1), 2))
+            touched = {i - 1, i, j - 1, j}
+            old_edges = [(nodes[k], nodes[k + 1]) for k in touched]
+            new_nodes = {k: nodes[k] for k in range(i - 1, j + 2)}
+            new_nodes[i], new_nodes[j] = nodes[j], nodes[i]
+            new_edges = [(new_nodes[k], new_nodes[k + 1]) for k in touched]
+            travel_delta = self._edge_sum(new_edges) - self._edge_sum(old_edges)
+            record = ("swap", i, j)
+
+        elif move == "two_opt":
+            if stops < 2:
+                return None
+            i, j = sorted(random.sample(range(1, len(nodes) - 1), 2))
+            # reverse nodes[i..j]; durations are asymmetric so the inner legs change too
+            segment = nodes[i:j + 1]
+            old_edges = [(nodes[i - 1], segment[0]), (segment[-1], nodes[j + 1])] + list(zip(segment[:-1], segment[1:]))
+            reversed_segment = segment[::-1]
+            new_edges = ([(nodes[i - 1], reversed_segment[0]), (reversed_segment[-1], nodes[j + 1])] +
+                         list(zip(reversed_segment[:-1], reversed_segment[1:])))
+            travel_delta = self._edge_sum(new_edges) - self._edge_sum(old_edges)
+            record = ("two_opt", i, j)
+
+        elif move == "or_opt":
+            if stops < 2:
+                return None
+            length = random.randint(1, min(3, stops - 1))
+            i = random.randint(1, len(nodes) - 1 - length)  # segment is nodes[i:i + length]
+            segment = nodes[i:i + length]
+            rest = nodes[:i] + nodes[i + length:]
+            pos = random.randint(1, len(rest) - 1)  # re-insert before rest[pos]
+            if pos == i:
+                return None
+            old_edges = [(nodes[i - 1], segment[0]), (segment[-1], nodes[i + length]), (rest[pos - 1], rest[pos])]
+            new_edges = [(nodes[i - 1], nodes[i + length]), (rest[pos - 1], segment[0]), (segment[-1], rest[pos])]
+            travel_delta = self._edge_sum(new_edges) - self._edge_sum(old_edges)
+            record = ("or_opt", i, length, pos)
+
+        else:
+            raise ValueError(f"Unknown move: {move}")
+
+        new_score = self.score_for(self.travel + travel_delta, self.dwell_sum + dwell_delta,
+                                   self.rating_sum + rating_delta, self.pair_sum + pair_delta,
+                                   len(nodes) + count_delta)
+        sums = (travel_delta, dwell_delta, rating_delta, pair_delta)
+        return new_score - self.score, (record, sums, new_score)
+
+    def apply(self, proposal):
+        """Apply a move returned by propose() and update the running sums"""
+        record, (travel_delta, dwell_delta, rating_delta, pair_delta), new_score = proposal
+        kind = record[0]
+        nodes = self.nodes
+
+        if kind == "insert":
+            _, pos, node = record
+            nodes.insert(pos, node)
+            self.in_tour[node] = True
+        elif kind == "remove":
+            _, pos, node = record
+            del nodes[pos]
+            self.in_tour[node] = False
+        elif kind == "swap":
+            _, i, j = record
+            nodes[i], nodes[j] = nodes[j], nodes[i]
+        elif kind == "two_opt":
+            _, i, j = record
+            nodes[i:j + 1] = nodes[i:j + 1][::-1]
+        elif kind == "or_opt":
+            _, i, length, pos = record
+            segment = nodes[i:i + length]
+            rest = nodes[:i] + nodes[i + length:]
+            self.nodes = rest[:pos] + segment + rest[pos:]
+
+        self.travel += travel_delta
+        self.dwell_sum += dwell_delta
+        self.rating_sum += rating_delta
+        self.pair_sum += pair_delta
+        self.score = new_score
+
+
+def anneal_tour(state, iterations=2000, initial_temperature=1.0, cooling_rate=0.998,
+                min_temperature=1e-4, deadline=None, clock=None, trace=None):
+    """
+    Simulated annealing over tour moves. Returns (best_sequence, best_score, accepted_moves)
+
+    trace, when given, receives one record per move in the format of simulated_annealing's trace
+    """
+    clock = clock or time.time
+    temperature = initial_temperature
+    best_sequence, best_score = list(state.sequence), state.score
+    accepted = 0
+    if trace is not None:
+        trace.append({"iteration": 0, "evaluations": 0, "score": state.score, "best_score": best_score,
+                      "temperature": temperature, "time": clock()})
+
+    for iteration in range(iterations):
+        if temperature < min_temperature or (deadline is not None and clock() >= deadline):
+            break
+
+        proposal = state.propose()
+        if proposal is not None:
+            delta, move = proposal
+            if delta < 0 or random.random() < math.exp(-delta / temperature):
+                state.apply(move)
+                accepted += 1
+                if state.score < best_score:
+                    best_sequence, best_score = list(state.sequence), state.score
+        temperature *= cooling_rate
+        if trace is not None:
+            trace.append({"iteration": iteration + 1, "evaluations": iteration + 1, "score": state.score,
+                          "best_score": best_score, "temperature": temperature, "time": clock()})
+
+    return best_sequence, best_score, accepted
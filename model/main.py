@@ -1,5 +1,8 @@
 # ==== IMPORTS ====
+import contextlib
 import math
+import os
+import re
 from geopy.geocoders import Nominatim
 from shapely.geometry import Point, Polygon, LineString, MultiPolygon
 from shapely.ops import unary_union
@@ -8,38 +11,102 @@ from .config_generator import *
 import overpass
 import requests
 import numpy as np
+import shapely
 import random
-import copy
-from . import display_util
+from .trace_sink import NullTraceSink, geometry_to_geojson
+from . import geo_kernels
+from . import local_search
+from . import tour_order
+from . import cooling
+from . import metrics
+from .route_cache import RouteCache
+from .corridor import CorridorEngine
+from .evaluation_cache import EvaluationCache
+from .surrogate import SurrogateModel
+from .dwell_time import DwellTimeModel
+from .duration_matrix import DurationMatrix
+from .ratings_store import RatingsStore
+from .tile_cache import TileCache, tiles_covering, tile_runs, run_polygon, lonlat_to_tile
+from .poi_index import POIIndex
+from .geocoding import CachedGeocoder
+from .http_client import get_client, PooledGeopyAdapter
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 
 # ==== GEOCODING UTILITIES ====
-buffer_counter = 0
 poi_manager = POIQueryManager()
+route_cache = RouteCache()
+osrm_client = get_client("osrm")
+overpass_client = get_client("overpass")
+foursquare_client = get_client("foursquare")
 geolocator = Nominatim(
     user_agent="travel_annealing",
     domain="localhost:8080",
-    scheme="http"
+    scheme="http",
+    timeout=get_client("nominatim").timeout[1],
+    adapter_factory=PooledGeopyAdapter
 )
+geocoder = CachedGeocoder(geolocator)
 
 overpass_url = "http://localhost:12347/api/interpreter"
 osrm_trip_url = "http://localhost:5050/trip/v1/driving/"
 osrm_route_url = "http://localhost:5050/route/v1/driving/"
+osrm_table_url = "http://localhost:5050/table/v1/driving/"
 foursquare_url = "https://api.foursquare.com/v3/places/"
 foursquare_api_key = "YOUR_API_KEY_HERE"
+unrated_poi_rating = 5.0      # rating (0-5) of a POI Foursquare has no place or no rating for
+fallback_poi_rating = 2.5     # rating used, but not stored, while a POI's Foursquare lookup fails
+overpass_max_concurrency = 4  # parallel Overpass requests per corridor query (1 = serial)
+use_duration_matrix = True    # evaluate SA candidates from an OSRM /table matrix, fetch geometry only for the best
+duration_matrix = DurationMatrix(osrm_table_url, osrm_client)
+ratings_store = RatingsStore()
+poi_query_mode = "tiles"      # "tiles": per-tile Overpass cache, "incremental": diff against the last queried area
+overpass_tile_zoom = 13       # slippy zoom of the Overpass tile cache (~5 km tiles)
+tile_cache = TileCache()
+trace_sink = NullTraceSink()  # see set_trace_sink and model/trace_sink.py
+offline_poi_index = None      # POIIndex built by `python -m model.poi_index ingest`, see load_offline_poi_index
+corridor_engine = CorridorEngine(lambda start, end: fetch_route_geometry(start, end))  # memoized base routes and corridors
+evaluation_cache = EvaluationCache()  # scored SA candidates and corridor POI pools, see model/evaluation_cache.py
+dwell_model = DwellTimeModel()  # time spent at each waypoint by POI tag and pace, see model/dwell_time.py
+surrogate = SurrogateModel(dwell_model)  # learned score estimates used to screen SA neighbors, see model/surrogate.py
+surrogate_screening_attempts = 5  # neighbors screened per SA iteration before one is evaluated anyway (0 = off)
+poi_ordering = "local"        # visiting order of sampled POIs: "local" (nearest neighbor + 2-opt over the
+                              # duration matrix), "trip" (OSRM /trip) or "random" (shuffled, the old behavior)
 
 # returns a city's geographical coordinates (lon, lat)
 def geocode_city(city_name):
-    location = geolocator.geocode(city_name)
-    return (location.longitude, location.latitude) if location else None
+    with metrics.stage("geocode"):
+        return geocoder.geocode(city_name)
 
 # returns a polygon that represents the geographical boundary of a city
+# (cached together with the coordinates, so this is free after geocode_city)
 def get_city_bounds(city_name):
-    location = geolocator.geocode(city_name, exactly_one=True, geometry='geojson')
-    if location and 'geojson' in location.raw:
-        return Polygon(location.raw['geojson']['coordinates'][0])
-    return None
+    with metrics.stage("geocode"):
+        return geocoder.boundary(city_name)
+
+# sets where optimizer traces go (NullTraceSink, the default, discards them)
+def set_trace_sink(sink):
+    global trace_sink
+    trace_sink.close()
+    trace_sink = sink or NullTraceSink()
+    return trace_sink
+
+# silences the planner's progress prints (they go to stdout) unless verbose; stdout is process-wide,
+# so this also silences other threads while it is active
+@contextlib.contextmanager
+def quiet_output(verbose=False):
+    if verbose:
+        yield
+        return
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+# answers POI queries from a local index built from an OSM extract instead of Overpass
+def load_offline_poi_index(index_dir):
+    global offline_poi_index
+    offline_poi_index = POIIndex(index_dir) if index_dir else None
+    return offline_poi_index
 
 # generates a random point within a given polygon's boundary
 def generate_random_point_within(polygon):
@@ -50,12 +117,30 @@ def generate_random_point_within(polygon):
             return (point.x, point.y)
 
 # ==== ROUTE GEOMETRY HANDLING ====
+# requests a route through the given (lon, lat) coordinates from OSRM, answering from the
+# persistent route cache when the same coordinates and options were already requested
+def fetch_osrm_route(coords, options):
+    cached = route_cache.get(coords, options)
+    if cached is not None:
+        return cached
+
+    coord_str = ";".join(f"{lon},{lat}" for lon, lat in coords)
+    query = "&".join(f"{k}={v}" for k, v in options.items())
+    response = osrm_client.get(f"{osrm_route_url}{coord_str}?{query}").json()
+    if response.get("code") == "Ok":
+        route_cache.put(coords, options, response)
+    return response
+
 #  gets the drivable route between two coordinates using OSRM and returns it as a LineString for further analysis
+# (the LineString is memoized per start/end by the corridor engine, see model/corridor.py)
 def get_route_geometry(start_coord, end_coord):
     """Get actual road route geometry using OSRM"""
-    url = f"{osrm_route_url}{start_coord[0]},{start_coord[1]};{end_coord[0]},{end_coord[1]}?overview=full&geometries=geojson"
+    with metrics.stage("base_route"):
+        return corridor_engine.route_line(start_coord, end_coord)
+
+def fetch_route_geometry(start_coord, end_coord):
     try:
-        response = requests.get(url).json()
+        response = fetch_osrm_route([start_coord, end_coord], {"overview": "full", "geometries": "geojson"})
         if response["code"] == "Ok":
             coords = response["routes"][0]["geometry"]["coordinates"]
             return LineString([(c[0], c[1]) for c in coords])
@@ -90,22 +175,33 @@ def sample_pois(pois, min_pois, max_pois):
 # ==== ROUTE GENERATION ====
 # Constructs a full route with daily POI groupings between a start and end point
 # # returns both the route data and the ordered list of waypoints
-def generate_route(start, end, pois, daily_capacity):
+# with full_geometry=False the route is evaluated from the duration matrix (no geometry)
+# (the route carries "days": the number of stops visited on each day, and "stop_tags": the
+# THEMES tag of every waypoint in order, None for the start and end, see poi_tag)
+def generate_route(start, end, pois, daily_capacity, full_geometry=True):
     """Create route with daily stop simulation"""
-    random.shuffle(pois)
-    daily_groups = [pois[i:i + daily_capacity] for i in range(0, len(pois), daily_capacity)]
+    daily_groups = order_pois(start, end, pois, daily_capacity)
 
-    coords = [start]
-    for group in daily_groups:
-        coords.extend(group)
-    coords.append(end)
+    stops = [poi for group in daily_groups for poi in group]
+    coords = [start] + [(poi[0], poi[1]) for poi in stops] + [end]
+    days = [len(group) for group in daily_groups]
+    stop_tags = [None] + [poi_tag(poi) for poi in stops] + [None]
+
+    if not full_geometry:
+        try:
+            with metrics.stage("candidate_route"):
+                route_info, waypoints = duration_matrix.route(coords)
+            if route_info is not None:
+                route_info.update(days=days, stop_tags=stop_tags)
+            return route_info, waypoints
+        except Exception as e:
+            print(f"Duration matrix unavailable, falling back to /route: {e}")
 
-    coord_str = ";".join(f"{lon},{lat}" for lon, lat in coords)
-    url = f"{osrm_route_url}{coord_str}?overview=full"
     try:
-        response = requests.get(url).json()
+        with metrics.stage("candidate_route"):
+            response = fetch_osrm_route(coords, {"overview": "full"})
         if response["code"] == "Ok":
-            route_info = response["routes"][0]
+            route_info = dict(response["routes"][0], days=days, stop_tags=stop_tags)  # the response itself is cached
 
             waypoints = response['waypoints']
             latlon_list = []
@@ -120,11 +216,80 @@ def generate_route(start, end, pois, daily_capacity):
     except:
         return None
 
+# THEMES tag a POI record (lon, lat, "key=value") was found with, None for a bare (lon, lat)
+def poi_tag(poi):
+    return poi[2] if len(poi) > 2 else None
+
+# one (lon, lat, tag) record per coordinate, in first-seen order
+def unique_records(records):
+    unique = {}
+    for record in records:
+        unique.setdefault((record[0], record[1]), record)
+    return list(unique.values())
+
+# puts the POIs in visiting order between start and end (see poi_ordering) and splits them into
+# days of at most daily_capacity stops; returns the list of days, each a list of POIs
+def order_pois(start, end, pois, daily_capacity):
+    pois = list(pois)
+    if poi_ordering == "random" or len(pois) < 2:
+        random.shuffle(pois)
+        return [pois[i:i + daily_capacity] for i in range(0, len(pois), daily_capacity)]
+
+    points = [tuple(start), tuple(end)] + [(poi[0], poi[1]) for poi in pois]
+    with metrics.stage("ordering"):
+        days = None
+        if poi_ordering == "trip":
+            try:
+                order, legs = fetch_osrm_trip_order(points)
+                days = tour_order.split_days(order, legs, daily_capacity)
+            except Exception as e:
+                print(f"OSRM trip unavailable, ordering locally: {e}")
+        if days is None:
+            durations = None
+            if use_duration_matrix:
+                try:
+                    durations = duration_matrix.submatrix(points)
+                except Exception as e:
+                    print(f"Duration matrix unavailable, ordering by straight-line distance: {e}")
+            if durations is None:
+                durations = geo_kernels.haversine_matrix(points)
+            days = tour_order.plan_order(durations, daily_capacity)[1]
+    return [[pois[node - 2] for node in day] for day in days]
+
+# asks OSRM /trip for the visiting order of points[2:] from points[0] to points[1];
+# returns (stop nodes in visiting order, leg durations in seconds)
+def fetch_osrm_trip_order(points):
+    coords = [points[0]] + list(points[2:]) + [points[1]]
+    coord_str = ";".join(f"{lon},{lat}" for lon, lat in coords)
+    response = osrm_client.get(f"{osrm_trip_url}{coord_str}"
+                               f"?source=first&destination=last&roundtrip=false&overview=false").json()
+    if response.get("code") != "Ok":
+        raise ValueError(f"OSRM trip request failed: {response.get('code')}")
+
+    # waypoints come in request order, waypoint_index is each one's position in the trip
+    positions = [waypoint["waypoint_index"] for waypoint in response["waypoints"]]
+    nodes = [0] + list(range(2, len(points))) + [1]
+    order = [node for _, node in sorted(zip(positions, nodes))][1:-1]
+    legs = [leg["duration"] for leg in response["trips"][0]["legs"]]
+    return order, legs
+
+# fetches the full OSRM route (with geometry) for a route that was evaluated from the duration matrix
+def materialize_route(route_info):
+    if route_info is None or route_info.get("geometry") is not None:
+        return route_info
+    try:
+        response = fetch_osrm_route(route_info["coordinates"], {"overview": "full"})
+        if response["code"] == "Ok":
+            return dict(response["routes"][0], days=route_info.get("days"), stop_tags=route_info.get("stop_tags"))
+    except Exception as e:
+        print(f"Failed to fetch route geometry: {e}")
+    return route_info
+
 
 # ==== MAIN WORKFLOW ====
 # generates a complete route with waypoints by first identifying relevant POIs along a base route
 # and then sampling a subset based on user configuration
-def generate_random_route_and_poll_pois(start, end, config=RouteConfig()):
+def generate_random_route_and_poll_pois(start, end, config=RouteConfig(), full_geometry=True):
     #NOTE: Do not geocode in this method, causes api timeout (start and end needs to be coordinates)
     # Get base route
     route_line = get_route_geometry(start, end)
@@ -132,42 +297,98 @@ def generate_random_route_and_poll_pois(start, end, config=RouteConfig()):
 
     all_pois = poll_pois_from_route_using_segments(route_line, config)
     poi_subset = sample_pois(all_pois, config.min_pois, config.max_pois)
-    final_route, waypoints = generate_route(start, end, poi_subset, config.daily_capacity)
+    final_route, waypoints = generate_route(start, end, poi_subset, config.daily_capacity, full_geometry)
     return final_route, waypoints
 
+# same as generate_random_route_and_poll_pois, but also scores the route. The corridor's POIs
+# come from the evaluation cache when a config with the same quantized corridor was polled before,
+# and a candidate whose sampled POIs were evaluated before (for the same scoring fields of the
+# config) is answered from the evaluation cache without routing or scoring it again; scores that
+# used a fallback rating are not cached, so they improve once the ratings can be looked up. Every
+# full evaluation trains the surrogate (corridor POI density, detour factor, prediction error).
+# Returns (route, waypoints, score, time_percentage) or None
+def generate_and_score_route(start, end, config, full_geometry=True):
+    route_line = get_route_geometry(start, end)
+    if not route_line: return None
+    route_length = geo_kernels.polyline_length(route_line.coords)
+    predicted_score = predict_score(start, end, config, route_length)
+
+    all_pois = corridor_pois(start, end, route_line, config, route_length)
+    poi_subset = sample_pois(all_pois, config.min_pois, config.max_pois)
+    cached = evaluation_cache.get(start, end, config, poi_subset, full_geometry)
+    if cached is not None:
+        return cached
+
+    generated = generate_route(start, end, poi_subset, config.daily_capacity, full_geometry)
+    if not generated or not generated[0] or not generated[1]:
+        return None
+    route, waypoints = generated
+    score, time_percentage = calculate_score(route, config, waypoints)
+    surrogate.observe(config, route_length, geo_kernels.polyline_length([(lon, lat) for lat, lon in waypoints]),
+                      route.get("duration", 0), calculate_geographic_spread(waypoints), predicted_score, score)
+    evaluation = (route, waypoints, score, time_percentage)
+    if ratings_store.has_ratings(waypoints):
+        evaluation_cache.put(start, end, config, poi_subset, evaluation, full_geometry)
+    return evaluation
+
+# POI records in a config's corridor, polled once per (endpoints, theme, segment_km, quantized
+# buffer_km): the corridor engine builds the same corridor for every buffer_km of a quantization step
+def corridor_pois(start, end, route_line, config, route_length=None):
+    key = evaluation_cache.make_pool_key(start, end, config, corridor_engine.quantize(config.buffer_km))
+    pois = evaluation_cache.get_pool(key)
+    if pois is None:
+        pois = poll_pois_from_route_using_segments(route_line, config)
+        evaluation_cache.put_pool(key, pois)
+        if route_length is not None:
+            surrogate.observe_density((tuple(start), tuple(end)), config.theme, config.buffer_km, route_length,
+                                      len(pois))
+    return pois
+
+# estimated score of a candidate config before any POIs are sampled, routed or rated (without the
+# surrogate's learned bias); only needs the memoized base route
+def predict_score(start, end, config, route_length=None):
+    if route_length is None:
+        route_line = get_route_geometry(start, end)
+        if not route_line: return float('inf')
+        route_length = geo_kernels.polyline_length(route_line.coords)
+    estimate = surrogate.estimate(config, route_length, (tuple(start), tuple(end)))
+    time_diff = estimate["travel_s"] + estimate["dwell_s"] - config.time_budget
+    return combine_score(surrogate.rating_score, estimate["spread_m"], time_diff, estimate["waypoints"], config)[0]
+
 # retrieves POIs located within buffered segments of a route, accounting for previously
-# queried areas to avoid redundant API calls.
+# queried areas to avoid redundant API calls. Returns (lon, lat, tag) records, the tag sets
+# the time spent at the POI (see model/dwell_time.py)
 def poll_pois_from_route_using_segments(route_line, config):
     # Query POIs along entire route
     all_pois = []
-    current_buffer_union = None
-    segment_buffers = []
-    segments = split_route_into_segments(route_line, config.segment_km)
-
-    for segment in segments:
-        # Create buffer for current segment
-        buffer_deg = config.buffer_km * 1000 / 111320  # Approximate degree conversion
-        segment_buffer = segment.buffer(buffer_deg)
-        segment_buffers.append(segment_buffer)
-
-    current_buffer_union = unary_union(segment_buffers)
-
-    try:
-        global buffer_counter
-        display_util.write_buffers_to_map(poi_manager.previously_queried_area,
-                                          current_buffer_union,
-                                          output_path="./visualmaps/buffers/"+str(buffer_counter))
-        buffer_counter += 1
-    except Exception as ex:
-        print(ex)
-        print("failed to write buffers to map")
+    with metrics.stage("corridor"):
+        # buffer_km around the route resampled every segment_km, memoized per route and width
+        current_buffer_union = corridor_engine.corridor(route_line, config.segment_km, config.buffer_km)
+
+    previous_area = poi_manager.previously_queried_area
+    trace_sink.emit("buffer", lambda: {"theme": config.theme, "buffer_km": config.buffer_km,
+                                       "area": geometry_to_geojson(current_buffer_union),
+                                       "previous_area": geometry_to_geojson(previous_area)})
+
+    if offline_poi_index is not None:
+        # the local index answers the whole corridor at once, no tiles or diffs needed
+        with metrics.stage("poi_index_query"):
+            all_pois = unique_records(offline_poi_index.query(current_buffer_union, config.theme))
+        poi_manager.add_to_cache(all_pois)
+        print(f"Returning {len(all_pois)} POIs for current buffer (offline index)")
+        return all_pois
+
+    if poi_query_mode == "tiles":
+        all_pois = query_pois_using_tiles(current_buffer_union, config.theme)
+        print(f"Returning {len(all_pois)} POIs for current buffer")
+        return all_pois
 
     # First run case
     if poi_manager.previously_queried_area is None:
         print("Initial query for full buffer area...")
         all_pois = query_pois_for_area(current_buffer_union, config.theme)
         poi_manager.previously_queried_area = current_buffer_union
-        poi_manager.cached_pois = all_pois
+        poi_manager.reset_cache(all_pois)
 
     # Handle buffer changes - both growing and shrinking
 
@@ -186,24 +407,14 @@ def poll_pois_from_route_using_segments(route_line, config):
         print("Buffer has decreased in some areas, filtering POIs...")
 
         # Option 1: Filter from cached POIs (more efficient)
-        cached_pois = poi_manager.get_cached_pois()
-        if cached_pois:
-            from shapely.geometry import Point
-
+        if poi_manager.get_cached_pois():
             # Filter to keep only POIs that are still within current buffer
-            valid_pois = []
-            poi_coords_set = set()
-            for poi in cached_pois:
-                point = Point(poi)
-                if current_buffer_union.contains(point):
-                    valid_pois.append(poi)
-
-            all_pois =  valid_pois
+            all_pois = poi_manager.pois_within(current_buffer_union)
         # Option 2: Re-query the entire current buffer (less efficient, but guarantees accuracy)
         else:
             print("No cached POIs available, re-querying entire buffer...")
             all_pois = query_pois_for_area(current_buffer_union, config.theme)
-            poi_manager.cached_pois = all_pois
+            poi_manager.reset_cache(all_pois)
     else:
         # If no part of the buffer decreased, get POIs from cache that are in current buffer
         all_pois =  poi_manager.get_cached_pois()
@@ -212,32 +423,109 @@ def poll_pois_from_route_using_segments(route_line, config):
     poi_manager.previously_queried_area = current_buffer_union
 
     print(f"Returning {len(all_pois)} POIs for current buffer")
-    return all_pois
+    return poi_manager.records(all_pois)
+
+
+# collects POIs in an area from the per-tile Overpass cache, fetching only missing or stale tiles
+def query_pois_using_tiles(area, theme):
+    tiles = tiles_covering(area, overpass_tile_zoom)
+    found, missing = tile_cache.get_many(tiles, theme)
+    print(f"Tile cache: {len(found)} cached tiles, {len(missing)} to fetch")
+    if missing:
+        found.update(fetch_tiles(missing, theme))
+
+    records = [record for tile in tiles for record in found.get(tile, [])]
+    if not records:
+        return []
+
+    # keep the POIs that are inside the corridor itself, not just inside its tiles
+    coords = np.array([(lon, lat) for lon, lat, tag in records])
+    shapely.prepare(area)
+    inside = shapely.contains_xy(area, coords[:, 0], coords[:, 1])
+    pois = unique_records(record for record, keep in zip(records, inside) if keep)
+
+    poi_manager.add_to_cache(pois)
+    return pois
 
+# fetches tiles from Overpass (one rectangle query per run of adjacent tiles) and caches them;
+# tiles whose query failed are left out so they are retried next time
+def fetch_tiles(tiles, theme):
+    def fetch_run(run):
+        zoom, y, x0, x1 = run
+        per_tile = {(zoom, x, y): [] for x in range(x0, x1 + 1)}
+        for record in query_poi_records_for_polygon(run_polygon(run), theme):
+            x, _ = lonlat_to_tile(record[0], record[1], zoom)
+            per_tile[(zoom, min(max(x, x0), x1), y)].append(record)
+        return per_tile
+
+    runs = tile_runs(tiles)
+    fetched = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(overpass_max_concurrency, len(runs)))) as executor:
+        futures = [executor.submit(metrics.propagate(fetch_run), run) for run in runs]
+        for future in futures:
+            try:
+                fetched.update(future.result())
+            except Exception as e:
+                print(f"Error querying Overpass API for tiles, keeping partial results: {e}")
+
+    tile_cache.put_many(fetched, theme)
+    return fetched
 
 # collects POIs from a given geographic area using theme-based filters
 def query_pois_for_area(area, theme):
     """Query POIs in the given area (which may be MultiPolygon or Polygon)"""
-    pois = []
-
     # Handle both Polygon and MultiPolygon cases
     if isinstance(area, MultiPolygon):
         # Process each polygon separately to avoid overly complex queries
-        for poly in area.geoms:
-            new_pois = query_pois_for_polygon(poly, theme)
-            pois.extend(new_pois)
+        pois = query_pois_for_polygons(list(area.geoms), theme)
     else:
         # Process single polygon
-        pois.extend(query_pois_for_polygon(area, theme))
+        pois = query_pois_for_polygon(area, theme)
 
     poi_manager.add_to_cache(pois)
 
     return pois
 
+# queries several polygons concurrently (bounded by overpass_max_concurrency), merging and
+# deduplicating the results. A failing polygon only loses its own POIs.
+def query_pois_for_polygons(polygons, theme, max_workers=None):
+    max_workers = max(1, min(max_workers or overpass_max_concurrency, len(polygons)))
+    results = []
+
+    if max_workers == 1:
+        for poly in polygons:
+            results.append(query_pois_for_polygon(poly, theme))
+    else:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(metrics.propagate(query_pois_for_polygon), poly, theme) for poly in polygons]
+            for future in futures:
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    print(f"Error querying polygon, keeping partial results: {e}")
+
+    # merge while dropping POIs that fall into more than one polygon
+    return list(dict.fromkeys(poi for polygon_pois in results for poi in polygon_pois))
+
 # builds and executes a filtered Overpass API query to fetch POIs within a single polygon,
 # constrained by the user’s selected theme.
 def query_pois_for_polygon(polygon, theme):
     """Query POIs for a single polygon area"""
+    try:
+        records = query_poi_records_for_polygon(polygon, theme)
+        poi_manager.add_tags(records)  # the "incremental" mode returns the cached POIs with their tags
+        return [(lon, lat) for lon, lat, tag in records]
+    except Exception as e:
+        print(f"Error querying Overpass API: {e}")
+        return []
+
+# same query as query_pois_for_polygon, but returns (lon, lat, "key=value") records with the
+# THEMES tag each POI matched, and raises on failure so callers can tell errors from empty areas
+def query_poi_records_for_polygon(polygon, theme):
+    if offline_poi_index is not None:
+        with metrics.stage("poi_index_query"):
+            return offline_poi_index.query(polygon, theme)
+
     # Get bounding box
     bbox = (polygon.bounds[1], polygon.bounds[0],  # OSM format: (south, west, north, east)
             polygon.bounds[3], polygon.bounds[2])
@@ -262,17 +550,24 @@ def query_pois_for_polygon(polygon, theme):
     # Construct final query
     query = f"[out:json];({all_queries});out center;"
 
-    try:
-        print(f"Querying new area...")
-        start_time = time.time()
-        response = requests.post(overpass_url, data=query).json()
-        elapsed = time.time() - start_time
-        print(f"Query completed in {elapsed:.2f} seconds, found {len(response['elements'])} POIs")
+    print(f"Querying new area...")
+    start_time = time.time()
+    with metrics.stage("overpass_query"):
+        response = overpass_client.post(overpass_url, data=query).json()
+    elapsed = time.time() - start_time
+    print(f"Query completed in {elapsed:.2f} seconds, found {len(response['elements'])} POIs")
 
-        return [(float(e['lon']), float(e['lat'])) for e in response['elements']]
-    except Exception as e:
-        print(f"Error querying Overpass API: {e}")
-        return []
+    return [(float(e['lon']), float(e['lat']), match_theme_tag(e.get('tags', {}), theme))
+            for e in response['elements']]
+
+# returns the "key=value" THEMES tag an OSM element matched (Overpass ~ filters are regex searches)
+def match_theme_tag(tags, theme):
+    for k, values in THEMES[theme].items():
+        if k in tags:
+            for v in values:
+                if re.search(v, tags[k]):
+                    return f"{k}={v}"
+    return None
 
 
 # ==== SIMULATED ANNEALING UTILITIES ====
@@ -289,9 +584,9 @@ def neighbor_function(current_config, time_percentage, temperature):
     - time_percentage: How far off we are from the target time budget (negative = under budget)
 
     Returns:
-    - A new RouteConfig object with modified parameters
+    - A new RouteConfig object with modified parameters (derived with replace, the current one is unchanged)
     """
-    new_config = copy.deepcopy(current_config)
+    max_pois = current_config.max_pois
 
     # Scale temperature to a range [0, 1] as it decreases
     scaled_temperature = max(0, min(1, temperature / 100))
@@ -313,9 +608,9 @@ def neighbor_function(current_config, time_percentage, temperature):
         # Increase buffer to find more POIs - more conservative increase.
         # 75% chance of adjusting polling rate, 10% chance of changing buffer size
         if buffer_sample_chance >= 10:
-            increase = new_config.max_pois + 1
-            if increase <= new_config.daily_capacity:
-                new_config.max_pois = increase
+            increase = max_pois + 1
+            if increase <= current_config.daily_capacity:
+                max_pois = increase
             else:
                 buffer_adjustment = random.uniform(0.1, 0.5) * exploration_factor
         else:
@@ -325,9 +620,9 @@ def neighbor_function(current_config, time_percentage, temperature):
         # Decrease buffer to reduce number of POIs - more conservative decrease
         # Similar to increase function, with decrement logic
         if buffer_sample_chance >= 25:
-            decrease = new_config.max_pois - 1
-            if decrease <= new_config.min_pois:
-                new_config.max_pois = decrease
+            decrease = max_pois - 1
+            if decrease <= current_config.min_pois:
+                max_pois = decrease
             else:
                 buffer_adjustment = random.uniform(-0.5, -0.1) * exploration_factor
         else:
@@ -337,19 +632,70 @@ def neighbor_function(current_config, time_percentage, temperature):
         buffer_adjustment = random.uniform(-0.05, 0.05) * exploration_factor
 
     # Apply buffer adjustment with bounds checking
-    new_buffer = new_config.buffer_km + buffer_adjustment
-    new_config.buffer_km = max(0.5, min(new_buffer, 20.0))  # Keep between 0.5 and 20 km
+    new_buffer = current_config.buffer_km + buffer_adjustment
+    changes = {"max_pois": max_pois,
+               "buffer_km": max(0.5, min(new_buffer, 20.0))}  # Keep between 0.5 and 20 km
 
     # Occasionally adjust other parameters
     if random.random() < 0.15:  # 15% chance to adjust segment size
         segment_adjustment = random.choice([-2, -1, 1, 2])
-        new_config.segment_km = max(5, min(new_config.segment_km + segment_adjustment, 25))
+        changes["segment_km"] = max(5, min(current_config.segment_km + segment_adjustment, 25))
 
     # Occasionally change theme (less frequently)
     if random.random() < 0.005:  # 0.5% chance
-        new_config.theme = random.choice(list(THEMES.keys()))
-
-    return new_config
+        changes["theme"] = random.choice(list(THEMES.keys()))
+
+    return current_config.replace(**changes)
+
+
+# draws neighbors until the surrogate considers one worth a full evaluation; after
+# surrogate_screening_attempts rejections the next neighbor is evaluated unscreened
+def screened_neighbor(start, end, current_config, time_percentage, scaled_temperature, current_score,
+                      temperature):
+    if surrogate_screening_attempts > 0:
+        with metrics.stage("surrogate_screening"):
+            route_line = get_route_geometry(start, end)
+            route_length = geo_kernels.polyline_length(route_line.coords) if route_line else 0.0
+            for _ in range(surrogate_screening_attempts):
+                candidate = neighbor_function(current_config, time_percentage, scaled_temperature)
+                predicted_score = predict_score(start, end, candidate, route_length)
+                if surrogate.is_promising(predicted_score, current_score, temperature):
+                    return candidate
+    return neighbor_function(current_config, time_percentage, scaled_temperature)
+
+
+# fully evaluates candidate configs (concurrently when max_workers > 1, overlapping their network
+# calls); returns [(config, (route, waypoints, score, time_percentage))] for those that succeeded
+def evaluate_neighbors(start, end, configs, max_workers=1):
+    def evaluate(neighbor_config):
+        return generate_and_score_route(start, end, neighbor_config, full_geometry=not use_duration_matrix)
+
+    if max_workers <= 1 or len(configs) <= 1:
+        evaluations = [evaluate(neighbor_config) for neighbor_config in configs]
+    else:
+        evaluations = []
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(configs))) as executor:
+            futures = [executor.submit(metrics.propagate(evaluate), neighbor_config) for neighbor_config in configs]
+            for future in futures:
+                try:
+                    evaluations.append(future.result())
+                except Exception as e:
+                    print(f"Error evaluating neighbor: {e}")
+                    evaluations.append(None)
+    return [(neighbor_config, evaluation) for neighbor_config, evaluation in zip(configs, evaluations)
+            if evaluation is not None]
+
+# picks the step's neighbor from an evaluated batch: candidates are drawn with Boltzmann weights
+# exp(-(score - best in batch) / temperature), so at high temperature any of them can be tried and
+# at low temperature the best one is; the draw then goes through the usual acceptance test
+def pick_neighbor(candidates, temperature):
+    if len(candidates) == 1:
+        return candidates[0]
+    scores = np.array([evaluation[2] for _, evaluation in candidates], dtype=float)
+    if temperature <= 0 or not np.all(np.isfinite(scores)):
+        return candidates[int(np.argmin(scores))]
+    weights = np.exp(-(scores - scores.min()) / temperature)
+    return random.choices(candidates, weights=weights)[0]
 
 
 # returns id for POI (for use with Foursquare Place Details)
@@ -359,14 +705,15 @@ def get_poi_id(lat, lon):
         "accept": "application/json",
         "Authorization": foursquare_api_key
     }
-    response = requests.get(url, headers=headers).json()
-    results = response.get("results", [])
+    response = foursquare_client.get(url, headers=headers)
+    response.raise_for_status()  # an error (bad key, rate limit) is not "no place here"
+    results = response.json().get("results", [])
 
     if results:
         return results[0].get("fsq_id")
     return None
 
-# returns the rating for a place, give the places fsq_id (defaults to 5.0 if None)
+# returns the rating for a place, give the places fsq_id (Foursquare's 0-10 scale, None if unrated)
 def get_poi_rating(place_id):
     url = f"{foursquare_url}{place_id}?fields=rating"
 
@@ -374,28 +721,24 @@ def get_poi_rating(place_id):
         "accept": "application/json",
         "Authorization": foursquare_api_key
     }
-    response = {}
-    try:
-        response = requests.get(url, headers=headers).json()
-    except Exception as e:
-        response["rating"] = random.randint(0,5)
-    return response.get("rating", 5.0)
-
-# gets the ratings for all POIs in a list
+    response = foursquare_client.get(url, headers=headers)
+    response.raise_for_status()
+    return response.json().get("rating")
+
+# looks up the rating for a single POI on the 0-5 scale of calculate_score; raises when
+# Foursquare can't be reached or answers with an error, so the rating is not stored
+def lookup_rating(lat, lon):
+    place_id = get_poi_id(lat, lon)
+    if not place_id:
+        return unrated_poi_rating
+    rating = get_poi_rating(place_id)
+    return unrated_poi_rating if rating is None else rating / 2
+
+# gets the ratings for all POIs in a list, only looking up POIs the ratings store hasn't seen;
+# POIs whose lookup failed get fallback_poi_rating for now and are looked up again later
 def get_all_ratings(pois):
-    ratings = []
-
-    for lat, lon in pois:
-        place_id = get_poi_id(lat, lon)
-        if place_id:
-            rating = random.randint(1,5)
-        else:
-            # default if there is no place_id
-            rating = 5.0
-
-        ratings.append(rating)
-
-    return np.array(ratings)
+    with metrics.stage("ratings"):
+        return np.array(ratings_store.get_ratings(pois, lookup_rating, default=fallback_poi_rating))
 
 # haversine formula to calculate the distance between two points on the Earth's surface
 def haversine_distance(lon1, lat1, lon2, lat2):
@@ -415,26 +758,14 @@ def haversine_distance(lon1, lat1, lon2, lat2):
     return distance_meters
 
 
-# returns how spaced out POIs are on the route
+# returns how spaced out POIs are on the route (average distance between all pairs)
+# (pois are route waypoints, [lat, lon])
 def calculate_geographic_spread(pois):
     # defaults to 0 if there is only 1 POI in the route
     if len(pois) < 2:
         return 0
 
-    total_distance = 0
-    num_pairs = 0
-
-    # calculate the distance between each pair of points
-    for i in range(len(pois)):
-        for j in range(i + 1, len(pois)):
-            lon1, lat1 = pois[i]
-            lon2, lat2 = pois[j]
-            total_distance += haversine_distance(lon1, lat1, lon2, lat2)
-            num_pairs += 1
-
-    # average distance between all pairs
-    average_distance = total_distance / num_pairs
-    return average_distance
+    return geo_kernels.pairwise_mean_distance(np.asarray(pois, dtype=float)[:, ::-1])
 
 
 def calculate_time_score(route, pois, config):
@@ -459,7 +790,7 @@ def calculate_time_score(route, pois, config):
         travel_time = route['time']  # Alternative key
 
     # Add time spent at POIs
-    poi_time = time_spent_in_pois(pois)
+    poi_time = time_spent_in_pois(pois, config.pace, route.get("stop_tags"))
 
     # Total time
     total_time = travel_time + poi_time
@@ -475,20 +806,30 @@ def calculate_time_score(route, pois, config):
 
     return time_diff, time_percentage
 
-# calculates the time spent at each POI
-def time_spent_in_pois(pois):
-    poi_time = 0
-    for poi in pois:
-        poi_time += random.randint(1,3) * 60 * 60
-    return poi_time
+# calculates the time spent at the waypoints of a route from the THEMES tag each one was
+# routed with (the route's "stop_tags"); waypoints without a tag get the default dwell time
+def time_spent_in_pois(pois, pace="moderate", tags=None):
+    if not pois:
+        return 0.0
+    if tags is None or len(tags) != len(pois):
+        tags = [None] * len(pois)
+    return float(dwell_model.seconds(tags, pace).sum())
 
 # returns the length of the route in meters (shorter is better)
 def calculate_route_length(pois):
-    line = LineString(pois)
-    return line.length
+    return geo_kernels.polyline_length(pois)
+
+# weights of the score components (shared by calculate_score and the tour local search)
+SCORE_WEIGHTS = {
+    "rating": 0.30,      # 30% weight for quality
+    "geographic": 0.15,  # 15% weight for distribution
+    "time": 0.40,        # 40% weight for time adherence
+    "poi_count": 0.15,   # 15% weight for appropriate POI count
+}
 
 # calculates a score for a route based on:
 # ratings, geographic distribution, and time_budget
+@metrics.stage("scoring")
 def calculate_score(route, config, pois):
     """
     Calculate a comprehensive score for a route based on multiple factors.
@@ -502,7 +843,7 @@ def calculate_score(route, config, pois):
     Parameters:
     - route: The route data (containing time, distance)
     - config: Route configuration parameters
-    - pois: List of POIs on the route [(lon, lat), ...]
+    - pois: Waypoints of the route, start and end included [[lat, lon], ...]
 
     Returns:
     - total_score: The overall score (lower is better)
@@ -524,25 +865,13 @@ def calculate_score(route, config, pois):
 
         # Geographic distribution component (higher spread = lower score, up to a point)
         geographic_spread = calculate_geographic_spread(pois)
-        # Normalize geographic spread: we want points reasonably spread out but not too far
-        ideal_spread = 5000.0  # in meters
-        geographic_score = abs(geographic_spread - ideal_spread) / 1000.0
 
         # Time budget adherence
         time_diff, time_percentage = calculate_time_score(route, pois, config)
-        time_budget = config.time_budget
-        time_score = abs(time_diff) / (time_budget / 5)  # Normalized score
-
-        # POI count component - reward routes with appropriate number of POIs, maximize number of POIs user wants to visit
-        poi_count_score = abs(len(pois) - config.max_pois)
 
         # Weight the components and combine for final score (lower is better)
-        weighted_score = (
-                rating_score * 0.30 +  # 30% weight for quality
-                geographic_score * 0.15 +  # 15% weight for distribution
-                time_score * 0.40 +  # 40% weight for time adherence
-                poi_count_score * 0.15  # 15% weight for appropriate POI count
-        )
+        weighted_score, (rating_score, geographic_score, time_score, poi_count_score) = combine_score(
+            rating_score, geographic_spread, time_diff, len(pois), config)
 
         print(f"Score components - Rating: {rating_score:.2f}, Geographic: {geographic_score:.2f}, "
               f"Time: {time_score:.2f}, POI count: {poi_count_score:.2f}")
@@ -555,45 +884,161 @@ def calculate_score(route, config, pois):
         return float('inf'), 0
 
 
+# turns the raw route measurements into the weighted score (shared by calculate_score and the
+# surrogate); returns (weighted score, (rating, geographic, time, poi count component scores))
+def combine_score(rating_score, geographic_spread, time_diff, n_pois, config):
+    # Normalize geographic spread: we want points reasonably spread out but not too far
+    ideal_spread = 5000.0  # in meters
+    geographic_score = abs(geographic_spread - ideal_spread) / 1000.0
+
+    time_budget = config.time_budget
+    time_score = abs(time_diff) / (time_budget / 5)  # Normalized score
+
+    # POI count component - reward routes with appropriate number of POIs, maximize number of POIs user wants to visit
+    poi_count_score = abs(n_pois - config.max_pois)
+
+    weighted_score = (
+            rating_score * SCORE_WEIGHTS["rating"] +
+            geographic_score * SCORE_WEIGHTS["geographic"] +
+            time_score * SCORE_WEIGHTS["time"] +
+            poi_count_score * SCORE_WEIGHTS["poi_count"]
+    )
+    return weighted_score, (rating_score, geographic_score, time_score, poi_count_score)
+
 # determines whether to accept a new solution in an optimization process
+# Metropolis rule for a minimized score: always accept an improvement, accept a worse score with
+# probability exp(-(new - current) / temperature)
 def acceptance_criteria(current_score, new_score, temperature):
     if new_score < current_score:
         return True
-    else:
-        delta = new_score - current_score
-        prob = math.exp(delta / temperature)
-        return random.random() < prob
+    if temperature <= 0:
+        return False
+    delta = new_score - current_score
+    return random.random() < math.exp(-delta / temperature)
 
 
 # ==== IMPROVED SIMULATED ANNEALING LOOP ====
 def simulated_annealing(pois, start_coord, end_coord, route, config=RouteConfig(),
                         initial_temperature=100.0, cooling_rate=0.95, min_temperature=0.1,
-                        max_iterations=100, convergence_threshold=0.001, max_non_improving=15):
+                        max_iterations=100, convergence_threshold=0.001, max_non_improving=15,
+                        deadline=None, trace=None, neighborhood="config", return_metrics=False,
+                        on_progress=None, schedule=None, calibration_samples=5, batch_size=1):
     """
     Run simulated annealing with proper temperature decay and convergence detection
 
     Parameters:
-    - initial_temperature: Starting temperature (higher = more exploration)
-    - cooling_rate: Rate at which temperature decreases (0.8-0.99)
+    - initial_temperature: Starting temperature (higher = more exploration), or "auto" to
+      calibrate it from the score changes of calibration_samples neighbors of the start
+    - cooling_rate: Rate at which temperature decreases (0.8-0.99) with the default schedule
+    - schedule: None (geometric cooling at cooling_rate), "geometric", "lundy_mees", "adaptive"
+      or a CoolingSchedule, see model/cooling.py. Schedules built with reheat_after reheat on
+      stagnation instead of stopping
+    - calibration_samples: Neighbors evaluated to calibrate an "auto" initial temperature
+    - batch_size: Neighbors generated and evaluated concurrently per step; one of them is picked
+      by a Metropolis rule over the batch (1 = the classic one neighbor per step)
     - min_temperature: Stop when temperature reaches this value
     - max_iterations: Maximum number of iterations regardless of other conditions
     - convergence_threshold: If score doesn't improve by this amount, consider converged
     - max_non_improving: Number of consecutive non-improving iterations before stopping
+    - deadline: Optional wall-clock time (time.time() value) after which the search stops
+    - trace: Optional list that receives one record per iteration (score, best score, temperature)
+    - neighborhood: "config" perturbs RouteConfig and re-samples a random tour each iteration,
+      "tour" keeps the config and runs insert/remove/swap/2-opt/or-opt moves on the visiting order
+      (and falls back to "config" when the corridor or the duration matrix is unavailable)
+    - return_metrics: Also return the plan's metrics summary (time per stage, external calls,
+      cache hit ratios, see model/metrics.py) as a fourth value
+    - on_progress: Optional callback receiving the best-so-far progress dict (see
+      simulated_annealing_progress) at the start and after every improvement; returning True
+      stops the search early and keeps that best solution
+    """
+    with metrics.plan() as plan_metrics:
+        result = None
+        if neighborhood == "tour":
+            result = optimize_tour(start_coord, end_coord, config, deadline=deadline, trace=trace)
+            if result[0] is None:
+                print("Tour search failed, falling back to the config neighborhood")
+                result = None
+        if result is None:
+            progress = None
+            for progress in anneal_configs(pois, start_coord, end_coord, route, config, initial_temperature,
+                                           cooling_rate, min_temperature, max_iterations, convergence_threshold,
+                                           max_non_improving, deadline, trace,
+                                           materialize_progress=on_progress is not None, schedule=schedule,
+                                           calibration_samples=calibration_samples, batch_size=batch_size):
+                if on_progress is not None and not progress["done"] and on_progress(progress):
+                    print(f"Stopped early by caller after {progress['iteration']} iterations")
+                    break
+            # Candidates were scored from the duration matrix, so only the winner needs its geometry
+            result = materialize_route(progress["route"]), progress["config"], progress["pois"]
+    if return_metrics:
+        return result + (plan_metrics.summary(),)
+    return result
+
+# anytime form of simulated_annealing: yields the best solution so far right away and after every
+# improvement, with its route geometry ready to draw, and a last time with done=True. The caller
+# can stop iterating at any point and keep the last best solution it received.
+def simulated_annealing_progress(pois, start_coord, end_coord, route, config=RouteConfig(),
+                                 initial_temperature=100.0, cooling_rate=0.95, min_temperature=0.1,
+                                 max_iterations=100, convergence_threshold=0.001, max_non_improving=15,
+                                 deadline=None, trace=None, schedule=None, calibration_samples=5, batch_size=1):
+    """
+    Parameters are those of simulated_annealing (deadline is a time.time() value).
+
+    Yields dicts with:
+    - iteration, elapsed (seconds since the start), temperature
+    - score: best score so far (lower is better)
+    - route, config, pois: the best solution so far
+    - done: True for the final result
     """
+    yield from anneal_configs(pois, start_coord, end_coord, route, config, initial_temperature, cooling_rate,
+                              min_temperature, max_iterations, convergence_threshold, max_non_improving,
+                              deadline, trace, materialize_progress=True, schedule=schedule,
+                              calibration_samples=calibration_samples, batch_size=batch_size)
+
+# the "config" neighborhood of simulated_annealing, as a generator of best-so-far progress dicts
+def anneal_configs(pois, start_coord, end_coord, route, config, initial_temperature, cooling_rate,
+                   min_temperature, max_iterations, convergence_threshold, max_non_improving, deadline, trace,
+                   materialize_progress=False, schedule=None, calibration_samples=5, batch_size=1):
+    start_time = time.time()
+
+    def progress(done=False):
+        return {"iteration": iteration, "elapsed": time.time() - start_time, "temperature": temperature,
+                "score": best_score, "route": best_route, "config": best_config, "pois": best_pois,
+                "done": done}
+
     visualizer = []
-    temperature = initial_temperature
-    current_config = copy.deepcopy(config)
+    schedule = cooling.make_schedule(schedule, cooling_rate)
+    current_config = config
     current_route = route
     current_pois = pois
 
     # Calculate initial score
     current_score, time_percentage = calculate_score(current_route, current_config, current_pois)
 
+    # Calibrate the starting temperature from how much a few neighbors change the score
+    # (the best of them becomes the starting solution if it beats the initial route)
+    evaluations = 0
+    if initial_temperature == "auto":
+        deltas = []
+        start_score = current_score
+        sample_configs = [neighbor_function(config, time_percentage, 100.0) for _ in range(calibration_samples)]
+        evaluations += len(sample_configs)
+        for sample_config, evaluation in evaluate_neighbors(start_coord, end_coord, sample_configs, batch_size):
+            deltas.append(evaluation[2] - start_score)
+            if evaluation[2] < current_score:
+                current_route, current_pois, current_score, time_percentage = evaluation
+                current_config = sample_config
+        initial_temperature = cooling.calibrate_initial_temperature(deltas) or 100.0
+        min_temperature *= initial_temperature / 100.0  # min_temperature is meant for a start at 100
+        print(f"Calibrated initial temperature from {len(deltas)} neighbors: {initial_temperature:.4f}")
+    temperature = schedule.start(initial_temperature, max_iterations)
+
     # Track best solution found
     best_route = current_route
-    best_config = copy.deepcopy(current_config)
+    best_config = current_config
     best_pois = current_pois
     best_score = current_score
+    best_time_percentage = time_percentage
 
     # Counters and tracking
     iteration = 0
@@ -601,78 +1046,125 @@ def simulated_annealing(pois, start_coord, end_coord, route, config=RouteConfig(
     score_history = [current_score]
 
     print(f"Starting SA: Initial score = {current_score:.4f}, Temperature = {temperature:.2f}")
+    if trace is not None:
+        trace.append({"iteration": 0, "evaluations": evaluations, "score": current_score,
+                      "best_score": best_score, "temperature": temperature, "time": time.time()})
+    if materialize_progress:
+        best_route = materialize_route(best_route)
+    yield progress()
 
     # Main annealing loop
     while (temperature > min_temperature and
            iteration < max_iterations and
-           non_improving_iterations < max_non_improving):
-
-        # Generate a neighbor solution
-        new_config = neighbor_function(current_config, time_percentage, temperature)
-        new_route, new_pois = generate_random_route_and_poll_pois(start_coord, end_coord,
-                                                                  new_config)
-
-        # Check if route generation was successful
-        if not new_route or not new_pois:
-            print("Failed to generate new route, skipping iteration")
-            iteration += 1
-            continue
-
-        # Calculate new score
-        new_score, new_time_percentage = calculate_score(new_route, new_config, new_pois)
-
-        # Decide whether to accept the new solution
-        # For maximization problems (higher score is better)
-        delta = current_score - new_score
-
-        if delta > 0 or random.random() < math.exp(delta / temperature):
-            # Accept the new solution
-            current_config = new_config
-            current_route = new_route
-            current_pois = new_pois
-            current_score = new_score
-            time_percentage = new_time_percentage
-
-            # Record for visualization
-            visualizer.append(current_route)
-
-            # Update best solution if needed
-            if current_score < best_score:
-                best_route = current_route
-                best_config = copy.deepcopy(current_config)
-                best_pois = current_pois
-                best_score = current_score
-                non_improving_iterations = 0
-                print(f"Iteration {iteration}: New best score = {best_score:.4f}")
+           non_improving_iterations < max_non_improving and
+           (deadline is None or time.time() < deadline)):
+
+        with metrics.stage("sa_iteration"):
+            # Generate a neighbor solution
+            improved = False
+            # neighbor_function sizes its moves for temperatures on a 100..0 scale
+            new_configs = [screened_neighbor(start_coord, end_coord, current_config, time_percentage,
+                                             100.0 * temperature / schedule.initial_temperature,
+                                             current_score, temperature)
+                           for _ in range(batch_size)]
+            candidates = evaluate_neighbors(start_coord, end_coord, new_configs, batch_size)
+            evaluations += len(new_configs)
+
+            # Check if route generation was successful
+            if not candidates:
+                print("Failed to generate new route, skipping iteration")
+                iteration += 1
+                continue
+
+            # Score comes from calculate_score (or the evaluation cache for a repeated candidate)
+            new_config, (new_route, new_pois, new_score, new_time_percentage) = pick_neighbor(candidates,
+                                                                                            temperature)
+
+            # Decide whether to accept the new solution (lower scores are better)
+            delta = new_score - current_score
+            accepted = acceptance_criteria(current_score, new_score, temperature)
+
+            if accepted:
+                # Accept the new solution
+                current_config = new_config
+                current_route = new_route
+                current_pois = new_pois
+                current_score = new_score
+                time_percentage = new_time_percentage
+
+                # Record for visualization
+                visualizer.append(current_route)
+
+                # Update best solution if needed
+                if current_score < best_score:
+                    best_route = current_route
+                    best_config = current_config
+                    best_pois = current_pois
+                    best_score = current_score
+                    best_time_percentage = time_percentage
+                    non_improving_iterations = 0
+                    improved = True
+                    print(f"Iteration {iteration}: New best score = {best_score:.4f}")
+
+                else:
+                    non_improving_iterations += 1
 
             else:
+                # Reject the solution
                 non_improving_iterations += 1
 
-        else:
-            # Reject the solution
-            non_improving_iterations += 1
-
-        # Check for convergence
-        score_history.append(current_score)
-        if len(score_history) > 5:  # Use window of 5 iterations
-            avg_recent = sum(score_history[-5:]) / 5
-            if abs(avg_recent - score_history[-6]) < convergence_threshold:
+            # the batch's best is kept as the best solution even when the chain moved elsewhere
+            batch_config, (batch_route, batch_pois, batch_score, batch_time_percentage) = min(
+                candidates, key=lambda candidate: candidate[1][2])
+            if batch_score < best_score:
+                best_route, best_config, best_pois = batch_route, batch_config, batch_pois
+                best_score, best_time_percentage = batch_score, batch_time_percentage
+                non_improving_iterations = 0
+                improved = True
+                print(f"Iteration {iteration}: New best score = {best_score:.4f} (not taken by the chain)")
+
+            # Check for convergence
+            score_history.append(current_score)
+            converged = False
+            if len(score_history) > 5:  # Use window of 5 iterations
+                avg_recent = sum(score_history[-5:]) / 5
+                converged = abs(avg_recent - score_history[-6]) < convergence_threshold
+
+            # Cool down the temperature
+            temperature = schedule.update(accepted, delta)
+            iteration += 1
+            if trace is not None:
+                trace.append({"iteration": iteration, "evaluations": evaluations,
+                              "score": current_score, "best_score": best_score, "temperature": temperature,
+                              "time": time.time()})
+
+            # Reheat on stagnation and continue from the best solution, or stop once converged
+            if schedule.should_reheat(non_improving_iterations, converged):
+                temperature = schedule.reheat()
+                current_config, current_route, current_pois = best_config, best_route, best_pois
+                current_score, time_percentage = best_score, best_time_percentage
+                non_improving_iterations = 0
+                score_history = [current_score]
+                print(f"Iteration {iteration}: Stagnated, reheating to {temperature:.4f}")
+            elif converged:
                 print(f"Converged after {iteration} iterations (score stabilized)")
                 break
-
-        # Cool down the temperature
-        temperature *= cooling_rate
-        iteration += 1
-        try:
-            display_util.write_to_map_using_waypoints(current_route['geometry'],path="./visualmaps/bad/"+str(iteration), waypoints=best_pois, start_coord=(start_coord[1],start_coord[0]), end_coord=(end_coord[1],end_coord[0]))
-            display_util.write_to_map_using(current_route['geometry'])
-        except Exception as e:
-            print(f"Failed to display route: {e}")
-
-        # Log progress periodically
-        if iteration % 10 == 0:
-            print(
-                f"Iteration {iteration}: Score = {current_score:.4f}, Best = {best_score:.4f}, Temp = {temperature:.2f}")
+            trace_sink.emit("sa_iteration", lambda route=current_route, pois=current_pois, it=iteration,
+                                                   score=current_score, best=best_score, temp=temperature: {
+                "iteration": it, "score": score, "best_score": best, "temperature": temp,
+                "geometry": route.get("geometry"), "waypoints": pois,
+                "start": (start_coord[1], start_coord[0]), "end": (end_coord[1], end_coord[0])}, is_best=improved)
+
+            # Log progress periodically
+            if iteration % 10 == 0:
+                print(
+                    f"Iteration {iteration}: Score = {current_score:.4f}, Best = {best_score:.4f}, Temp = {temperature:.2f}")
+
+        # hand out the new best outside the timed iteration (the caller may draw it)
+        if improved:
+            if materialize_progress:
+                best_route = materialize_route(best_route)
+            yield progress()
 
     # Report termination condition
     if temperature <= min_temperature:
@@ -681,14 +1173,63 @@ def simulated_annealing(pois, start_coord, end_coord, route, config=RouteConfig(
         print(f"Stopped: Maximum iterations reached ({iteration})")
     elif non_improving_iterations >= max_non_improving:
         print(f"Stopped: No improvement for {max_non_improving} iterations")
+    elif deadline is not None and time.time() >= deadline:
+        print(f"Stopped: Wall-clock deadline reached after {iteration} iterations")
 
     print(f"Final Config: {best_config}")
     print(f"Final Time %: {time_percentage}%")
     print(f"Final best score: {best_score:.4f}")
     print(f"Iterations run: {iteration}")
 
-    # Return the best solution found
-    return best_route, best_config, best_pois
+    # Candidates were scored from the duration matrix, so only the winner needs its geometry
+    best_route = materialize_route(best_route)
+
+    # Hand back the best solution found
+    yield progress(done=True)
+
+# optimizes the concrete visiting order with delta-evaluated local search moves: candidates come
+# from the route corridor, leg costs from the duration matrix, and no route is fetched until the end
+# (returns (None, config, None) when the corridor or the duration matrix is unavailable)
+def optimize_tour(start_coord, end_coord, config=RouteConfig(), pool_size=60, iterations=5000,
+                  initial_temperature=1.0, cooling_rate=0.999, deadline=None, trace=None):
+    route_line = get_route_geometry(start_coord, end_coord)
+    if not route_line: return None, config, None
+
+    candidates = corridor_pois(start_coord, end_coord, route_line, config)
+    if not candidates: return None, config, None
+
+    # nodes 0 and 1 are the fixed start and end, the rest is a sample of corridor POIs
+    pool = random.sample(candidates, min(pool_size, len(candidates)))
+    points = [tuple(start_coord), tuple(end_coord)] + [(poi[0], poi[1]) for poi in pool]
+    try:
+        durations = duration_matrix.submatrix(points)
+    except Exception as e:
+        print(f"Duration matrix unavailable, can't search tours: {e}")
+        return None, config, None
+    durations = np.where(np.isfinite(durations), durations, 1e7)  # unreachable pairs get a large penalty
+
+    # the start and end are rated too, as calculate_score rates every waypoint
+    ratings = get_all_ratings([(lat, lon) for lon, lat in points])
+    dwell = dwell_model.seconds([None, None] + [poi_tag(poi) for poi in pool], config.pace)
+    initial = sample_pois(list(range(2, len(points))), config.min_pois, config.max_pois)
+
+    state = local_search.TourState(points, durations, dwell, ratings, initial,
+                                   time_budget=config.time_budget, target_count=config.max_pois,
+                                   min_stops=min(config.min_pois, len(pool)), max_stops=config.max_pois,
+                                   weights=SCORE_WEIGHTS)
+    print(f"Starting tour search: {len(pool)} candidates, initial score = {state.score:.4f}")
+    best_sequence, best_score, accepted = local_search.anneal_tour(state, iterations=iterations,
+                                                                   initial_temperature=initial_temperature,
+                                                                   cooling_rate=cooling_rate,
+                                                                   deadline=deadline, clock=time.time,
+                                                                   trace=trace)
+    print(f"Tour search finished: best score = {best_score:.4f}, accepted moves = {accepted}")
+
+    coords = [start_coord] + [points[i] for i in best_sequence] + [end_coord]
+    best_route, best_pois = duration_matrix.route(coords)
+    if best_route is not None:
+        best_route["stop_tags"] = [None] + [poi_tag(pool[i - 2]) for i in best_sequence] + [None]
+    return materialize_route(best_route), config, best_pois
 
 # ==== EXAMPLE USAGE ====
 if __name__ == "__main__":
@@ -0,0 +1,319 @@
+import bisect
+import contextlib
+import contextvars
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# === PLANNER METRICS ===
+# Process-wide counters and histograms for each planning stage, external calls and cache
+# lookups, exportable in the Prometheus text format. While a plan is active (see plan()) the
+# same events are also collected into a per-plan summary, so a single slow plan can be
+# broken down by stage even when several plans run concurrently.
+
+# upper bounds (seconds) of the duration histogram buckets
+DURATION_BUCKETS = [0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0]
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n") for _, value in labels)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + "}"
+
+
+def _format_value(value):
+    return "+Inf" if value == float("inf") else repr(float(value))
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self.type = "counter"
+        self._values = {}  # label key -> value
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1.0, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(_label_key(labels), 0.0)
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in sorted(self._values.items())]
+
+    def reset(self):
+        with self._lock:
+            self._values = {}
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=DURATION_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.type = "histogram"
+        self.buckets = list(buckets)
+        self._values = {}  # label key -> [bucket counts (last is +Inf), sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][bisect.bisect_left(self.buckets, value)] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + [float("inf")], counts):
+                    cumulative += bucket_count
+                    samples.append((f"{self.name}_bucket", key + (("le", _format_value(bound)),), cumulative))
+                samples.append((f"{self.name}_sum", key, total))
+                samples.append((f"{self.name}_count", key, count))
+        return samples
+
+    def reset(self):
+        with self._lock:
+            self._values = {}
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = {}     # name -> Counter/Histogram
+        self.collectors = []  # callables returning [(name, help, type, [(labels dict, value)])]
+        self._lock = threading.Lock()
+
+    def counter(self, name, help_text):
+        return self._register(name, lambda: Counter(name, help_text))
+
+    def histogram(self, name, help_text, buckets=DURATION_BUCKETS):
+        return self._register(name, lambda: Histogram(name, help_text, buckets))
+
+    def add_collector(self, collector):
+        """Register a callable that reports extra samples (gauges) at export time"""
+        with self._lock:
+            self.collectors.append(collector)
+
+    def reset(self):
+        with self._lock:
+            metrics = list(self.metrics.values())
+        for metric in metrics:
+            metric.reset()
+
+    def to_prometheus(self):
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self.metrics.values())
+            collectors = list(self.collectors)
+
+        families = [(metric.name, metric.help, metric.type, metric.samples()) for metric in metrics]
+        for collector in collectors:
+            try:
+                for name, help_text, metric_type, values in collector():
+                    families.append((name, help_text, metric_type,
+                                     [(name, _label_key(labels), value) for labels, value in values]))
+            except Exception as e:
+                print(f"Metrics collector failed: {e}")
+
+        lines = []
+        for name, help_text, metric_type, samples in families:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            lines.extend(f"{sample}{_format_labels(labels)} {_format_value(value)}"
+                         for sample, labels, value in samples)
+        return "\n".join(lines) + "\n"
+
+    def _register(self, name, factory):
+        with self._lock:
+            if name not in self.metrics:
+                self.metrics[name] = factory()
+            return self.metrics[name]
+
+
+registry = MetricsRegistry()
+
+stage_seconds = registry.histogram("planner_stage_seconds", "Time spent in each planning stage")
+external_request_seconds = registry.histogram("planner_external_request_seconds",
+                                              "Latency of calls to external backends")
+external_request_errors = registry.counter("planner_external_request_errors_total",
+                                           "Failed calls to external backends")
+cache_lookups = registry.counter("planner_cache_lookups_total", "Cache lookups by cache and result")
+plans_total = registry.counter("planner_plans_total", "Plans run")
+
+
+def _cache_hit_ratios():
+    totals = {}
+    for _, labels, value in cache_lookups.samples():
+        labels = dict(labels)
+        hits_and_total = totals.setdefault(labels["cache"], [0.0, 0.0])
+        hits_and_total[0] += value if labels["result"] == "hit" else 0.0
+        hits_and_total[1] += value
+    return [("planner_cache_hit_ratio", "Share of cache lookups answered from the cache", "gauge",
+             [({"cache": cache}, hits / total if total else 0.0) for cache, (hits, total) in sorted(totals.items())])]
+
+
+registry.add_collector(_cache_hit_ratios)
+
+
+# ==== PER-PLAN SUMMARIES ====
+class PlanMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.finished = None
+        self.stages = {}     # name -> [count, total seconds, max seconds]
+        self.external = {}   # backend -> [calls, total seconds, errors]
+        self.caches = {}     # cache -> [hits, misses]
+        self._lock = threading.Lock()
+
+    def add_stage(self, name, seconds):
+        with self._lock:
+            entry = self.stages.setdefault(name, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+
+    def add_external(self, backend, seconds, error):
+        with self._lock:
+            entry = self.external.setdefault(backend, [0, 0.0, 0])
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] += int(error)
+
+    def add_cache(self, cache, hits, misses):
+        with self._lock:
+            entry = self.caches.setdefault(cache, [0, 0])
+            entry[0] += hits
+            entry[1] += misses
+
+    def summary(self):
+        """Plain dict of where the plan spent its time"""
+        with self._lock:
+            end = self.finished if self.finished is not None else time.perf_counter()
+            return {
+                "wall_s": end - self.started,
+                "iterations": self.stages.get("sa_iteration", [0])[0],
+                "stages": {name: {"count": count, "total_s": total, "mean_s": total / count, "max_s": longest}
+                           for name, (count, total, longest) in self.stages.items()},
+                "external_calls": {backend: {"calls": calls, "total_s": total, "mean_s": total / calls,
+                                             "errors": errors}
+                                   for backend, (calls, total, errors) in self.external.items()},
+                "caches": {cache: {"hits": hits, "misses": misses,
+                                   "hit_ratio": hits / (hits + misses) if hits + misses else 0.0}
+                           for cache, (hits, misses) in self.caches.items()},
+            }
+
+
+_current_plan = contextvars.ContextVar("current_plan", default=None)
+
+
+@contextlib.contextmanager
+def plan():
+    """
+    Collect the events of one plan into a PlanMetrics. Nested calls join the outer plan, so a
+    caller can open a plan around geocoding and the initial route before annealing starts.
+    """
+    current = _current_plan.get()
+    if current is not None:
+        yield current
+        return
+
+    current = PlanMetrics()
+    token = _current_plan.set(current)
+    plans_total.inc()
+    try:
+        yield current
+    finally:
+        current.finished = time.perf_counter()
+        _current_plan.reset(token)
+
+
+def current_plan():
+    return _current_plan.get()
+
+
+def propagate(fn):
+    """Wrap fn so it reports into the caller's plan when run on a worker thread"""
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        return context.copy().run(fn, *args, **kwargs)
+
+    return run
+
+
+# ==== RECORDING ====
+@contextlib.contextmanager
+def stage(name):
+    """Time a block as one occurrence of a planning stage"""
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start_time
+        stage_seconds.observe(elapsed, stage=name)
+        current = _current_plan.get()
+        if current is not None:
+            current.add_stage(name, elapsed)
+
+
+def record_external_call(backend, seconds, error=False):
+    external_request_seconds.observe(seconds, backend=backend)
+    if error:
+        external_request_errors.inc(backend=backend)
+    current = _current_plan.get()
+    if current is not None:
+        current.add_external(backend, seconds, error)
+
+
+def record_cache(cache, hits=0, misses=0):
+    if hits:
+        cache_lookups.inc(hits, cache=cache, result="hit")
+    if misses:
+        cache_lookups.inc(misses, cache=cache, result="miss")
+    current = _current_plan.get()
+    if current is not None:
+        current.add_cache(cache, hits, misses)
+
+
+# ==== EXPORT ====
+def to_prometheus():
+    return registry.to_prometheus()
+
+
+def start_metrics_server(port=9108, host="127.0.0.1"):
+    """Serve the metrics at http://host:port/metrics from a background thread"""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            data = to_prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
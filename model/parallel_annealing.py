@@ -0,0 +1,91 @@
+import contextlib
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+import numpy as np
+from . import main
+from .batch_plan import shared_query_mode
+from .config_generator import RouteConfig
+
+
+# === MULTI-CHAIN SIMULATED ANNEALING ===
+# Runs several independent annealing chains (different seeds and starting configs) on a pool
+# and keeps the global best. Chains share one wall-clock budget, so adding chains costs cores,
+# not latency.
+
+# runs a single chain from its own random starting point; top level so process pools can pickle it
+def run_chain(chain_id, seed, start_coord, end_coord, config, deadline, sa_kwargs):
+    random.seed(seed)
+    np.random.seed(seed % (2 ** 32))
+
+    # chain 0 starts from the given config, the others from a randomly perturbed copy
+    chain_config = config
+    if chain_id > 0:
+        chain_config = main.neighbor_function(config, random.uniform(-50, 50),
+                                              sa_kwargs.get("initial_temperature", 100.0))
+
+    result = {"chain_id": chain_id, "seed": seed, "route": None, "config": chain_config,
+              "pois": None, "score": float("inf"), "trace": []}
+
+    initial = main.generate_random_route_and_poll_pois(start_coord, end_coord, chain_config)
+    if not initial or not initial[0] or not initial[1]:
+        print(f"Chain {chain_id}: failed to generate a starting route")
+        return result
+
+    route, pois = initial
+    trace = []
+    best_route, best_config, best_pois = main.simulated_annealing(pois, start_coord, end_coord, route,
+                                                                  chain_config, deadline=deadline,
+                                                                  trace=trace, **sa_kwargs)
+    # score the chain's result itself: the "tour" neighborhood records no trace, and every chain has to
+    # be compared on the same scale whichever neighborhood it ran
+    score = main.calculate_score(best_route, best_config, best_pois)[0] if best_route else float("inf")
+    result.update(route=best_route, config=best_config, pois=best_pois, trace=trace, score=score)
+    return result
+
+
+def simulated_annealing_multichain(start_coord, end_coord, config=RouteConfig(), n_chains=4,
+                                   time_budget_s=120.0, executor="process", max_workers=None,
+                                   seed=None, **sa_kwargs):
+    """
+    Run n_chains independent simulated annealing chains in parallel and return the global best
+
+    Parameters:
+    - n_chains: Number of independent chains (each with its own seed and starting config)
+    - time_budget_s: Wall-clock budget shared by all chains, in seconds
+    - executor: "process" (default, chains fully isolated) or "thread". Threads share the module
+      level caches and random state, which is cheaper but makes runs non-reproducible; they also
+      share poi_manager, so poi_query_mode is switched to "tiles" while they run
+    - max_workers: Pool size (defaults to n_chains)
+    - seed: Base seed, chain i uses seed + i (random when omitted)
+    - sa_kwargs: Passed through to simulated_annealing (cooling_rate, max_iterations, ...)
+
+    Returns:
+    - best_route, best_config, best_pois, chains (per-chain results including their traces)
+    """
+    base_seed = seed if seed is not None else random.randrange(2 ** 31)
+    deadline = time.time() + time_budget_s
+    pool_class = ProcessPoolExecutor if executor == "process" else ThreadPoolExecutor
+
+    # "incremental" querying diffs against the area of the previous call, which concurrent chains
+    # in one process would overwrite for each other
+    query_mode = shared_query_mode() if executor == "thread" else contextlib.nullcontext()
+
+    chains = []
+    with query_mode, pool_class(max_workers=max_workers or n_chains) as pool:
+        futures = [pool.submit(run_chain, i, base_seed + i, start_coord, end_coord, config, deadline, sa_kwargs)
+                   for i in range(n_chains)]
+        wait(futures)
+        for i, future in enumerate(futures):
+            try:
+                chains.append(future.result())
+            except Exception as e:
+                print(f"Chain {i} failed: {e}")
+
+    if not chains:
+        return None, config, None, chains
+
+    best = min(chains, key=lambda chain: chain["score"])
+    print(f"Multi-chain SA: best score {best['score']:.4f} from chain {best['chain_id']} "
+          f"({len(chains)} of {n_chains} chains finished)")
+    return best["route"], best["config"], best["pois"], chains
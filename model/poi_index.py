@@ -0,0 +1,174 @@
+import argparse
+import json
+import math
+import os
+import re
+import time
+import numpy as np
+import shapely
+from .theme_meta import THEMES
+
+
+# === OFFLINE POI INDEX BUILT FROM OSM EXTRACTS ===
+# Column-oriented store of themed POIs (id, lon/lat, matched THEMES tag, name) written as .npy
+# files and memory-mapped at load time. A fixed lat/lon grid sorted by cell gives the spatial
+# index, so a corridor lookup touches only the rows of the cells it overlaps.
+#
+# Build one with:
+#   python -m model.poi_index ingest massachusetts-latest.osm.pbf ./cache/poi_index
+
+# every "key=value" pattern in THEMES, in a stable order (the tag column stores indices into it)
+THEME_TAGS = list(dict.fromkeys(f"{k}={v}" for tags in THEMES.values() for k, values in tags.items() for v in values))
+
+
+# ==== INGEST ====
+def ingest(extract_path, out_dir, cell_deg=0.05):
+    """Parse an .osm/.osm.pbf extract and write the POI index to out_dir"""
+    import osmium  # only needed to build an index, not to query one
+
+    patterns = {}  # key -> [(code, compiled value regex)], same regex semantics as the Overpass ~ filter
+    for code, tag in enumerate(THEME_TAGS):
+        key, value = tag.split("=", 1)
+        patterns.setdefault(key, []).append((code, re.compile(value)))
+
+    ids, lons, lats, codes, names = [], [], [], [], []
+
+    class POIHandler(osmium.SimpleHandler):
+        def node(self, n):
+            matched = []
+            for key, key_patterns in patterns.items():
+                value = n.tags.get(key)
+                if value is not None:
+                    matched.extend(code for code, pattern in key_patterns if pattern.search(value))
+            if not matched:
+                return
+            name = n.tags.get("name", "")
+            # one row per matched tag so every theme sees the POI under its own tag
+            for code in matched:
+                ids.append(n.id)
+                lons.append(n.location.lon)
+                lats.append(n.location.lat)
+                codes.append(code)
+                names.append(name)
+
+    start_time = time.time()
+    POIHandler().apply_file(extract_path)
+    print(f"Parsed {len(ids)} themed POI rows in {time.time() - start_time:.1f} seconds")
+
+    lon = np.array(lons, dtype=np.float64)
+    lat = np.array(lats, dtype=np.float64)
+    cells = cell_ids(lon, lat, cell_deg)
+    order = np.argsort(cells, kind="stable")
+    cells = cells[order]
+    cell_keys, cell_starts = np.unique(cells, return_index=True)
+
+    encoded = [names[i].encode("utf-8") for i in order]
+    name_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    name_offsets[1:] = np.cumsum([len(name) for name in encoded])
+
+    os.makedirs(out_dir, exist_ok=True)
+    np.save(os.path.join(out_dir, "id.npy"), np.array(ids, dtype=np.int64)[order])
+    np.save(os.path.join(out_dir, "lon.npy"), lon[order])
+    np.save(os.path.join(out_dir, "lat.npy"), lat[order])
+    np.save(os.path.join(out_dir, "tag.npy"), np.array(codes, dtype=np.uint16)[order])
+    np.save(os.path.join(out_dir, "name_offsets.npy"), name_offsets)
+    np.save(os.path.join(out_dir, "cell_keys.npy"), cell_keys.astype(np.int64))
+    np.save(os.path.join(out_dir, "cell_starts.npy"), np.append(cell_starts, len(cells)).astype(np.int64))
+    with open(os.path.join(out_dir, "names.bin"), "wb") as f:
+        f.write(b"".join(encoded))
+    with open(os.path.join(out_dir, "meta.json"), "w") as f:
+        json.dump({"tags": THEME_TAGS, "cell_deg": cell_deg, "rows": len(encoded),
+                   "source": os.path.basename(extract_path), "built_at": time.time()}, f)
+    print(f"Wrote POI index with {len(encoded)} rows to {out_dir}")
+
+
+def cell_ids(lon, lat, cell_deg):
+    columns = int(math.ceil(360 / cell_deg))
+    row = np.floor((np.asarray(lat) + 90.0) / cell_deg).astype(np.int64)
+    col = np.floor((np.asarray(lon) + 180.0) / cell_deg).astype(np.int64)
+    return row * columns + col
+
+
+# ==== QUERY ====
+class POIIndex:
+    def __init__(self, index_dir):
+        with open(os.path.join(index_dir, "meta.json")) as f:
+            meta = json.load(f)
+        self.index_dir = index_dir
+        self.cell_deg = meta["cell_deg"]
+        self.columns = int(math.ceil(360 / self.cell_deg))
+        # tag codes are positions in the tag list the index was built with
+        self.tags = meta["tags"]
+
+        def load(name):
+            return np.load(os.path.join(index_dir, name), mmap_mode="r")
+
+        self.id = load("id.npy")
+        self.lon = load("lon.npy")
+        self.lat = load("lat.npy")
+        self.tag = load("tag.npy")
+        self.name_offsets = load("name_offsets.npy")
+        self.cell_keys = load("cell_keys.npy")
+        self.cell_starts = load("cell_starts.npy")
+        self.names = np.memmap(os.path.join(index_dir, "names.bin"), dtype=np.uint8, mode="r") \
+            if self.name_offsets[-1] > 0 else np.zeros(0, dtype=np.uint8)
+
+    def __len__(self):
+        return len(self.id)
+
+    def tag_codes(self, theme):
+        wanted = {f"{k}={v}" for k, values in THEMES[theme].items() for v in values}
+        return np.array([code for code, tag in enumerate(self.tags) if tag in wanted], dtype=np.uint16)
+
+    def candidate_rows(self, min_lon, min_lat, max_lon, max_lat):
+        """Row indices of every grid cell overlapping a bounding box"""
+        row0, row1 = (int(math.floor((v + 90.0) / self.cell_deg)) for v in (min_lat, max_lat))
+        col0, col1 = (int(math.floor((v + 180.0) / self.cell_deg)) for v in (min_lon, max_lon))
+        ranges = []
+        for row in range(row0, row1 + 1):
+            # cells of one grid row are contiguous in the sorted key array
+            first = np.searchsorted(self.cell_keys, row * self.columns + col0, side="left")
+            last = np.searchsorted(self.cell_keys, row * self.columns + col1, side="right")
+            if last > first:
+                ranges.append(np.arange(self.cell_starts[first], self.cell_starts[last]))
+        return np.concatenate(ranges) if ranges else np.zeros(0, dtype=np.int64)
+
+    def query_rows(self, geometry, theme):
+        """Rows inside a (Multi)Polygon whose tag belongs to the theme"""
+        rows = self.candidate_rows(*geometry.bounds)
+        if len(rows) == 0:
+            return rows
+        rows = rows[np.isin(self.tag[rows], self.tag_codes(theme))]
+        shapely.prepare(geometry)
+        return rows[shapely.contains_xy(geometry, self.lon[rows], self.lat[rows])]
+
+    def query(self, geometry, theme):
+        """(lon, lat, "key=value") records inside the geometry, like query_poi_records_for_polygon"""
+        rows = self.query_rows(geometry, theme)
+        return [(float(lon), float(lat), self.tags[code])
+                for lon, lat, code in zip(self.lon[rows], self.lat[rows], self.tag[rows])]
+
+    def name(self, row):
+        return bytes(self.names[self.name_offsets[row]:self.name_offsets[row + 1]]).decode("utf-8")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or inspect the offline POI index")
+    commands = parser.add_subparsers(dest="command", required=True)
+    ingest_parser = commands.add_parser("ingest", help="build an index from an .osm/.osm.pbf extract")
+    ingest_parser.add_argument("extract")
+    ingest_parser.add_argument("out_dir")
+    ingest_parser.add_argument("--cell-deg", type=float, default=0.05, help="grid cell size in degrees")
+    info_parser = commands.add_parser("info", help="print a summary of an index")
+    info_parser.add_argument("index_dir")
+    args = parser.parse_args()
+
+    if args.command == "ingest":
+        ingest(args.extract, args.out_dir, args.cell_deg)
+    else:
+        index = POIIndex(args.index_dir)
+        counts = np.bincount(index.tag, minlength=len(index.tags))
+        print(f"{len(index)} rows, cell size {index.cell_deg} degrees")
+        for tag, count in zip(index.tags, counts):
+            if count:
+                print(f"  {tag}: {count}")
@@ -0,0 +1,148 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from . import metrics
+from .sqlite_store import SQLiteStore
+
+
+# === PERSISTENT POI RATINGS ===
+# Ratings are looked up once per POI: an in-run memo answers repeats within a process, a SQLite
+# store (with TTL) answers repeats across runs, and only the misses are fetched, concurrently
+# and under a client-side rate limit. Failed lookups are never stored: they are retried on the
+# next call, or after retry_after_s when the caller accepts a default rating meanwhile.
+
+class RateLimiter:
+    """Token bucket shared by the fetcher threads"""
+
+    def __init__(self, rate_per_s=10.0, burst=None):
+        self.rate_per_s = rate_per_s
+        self.capacity = burst or max(1.0, rate_per_s)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate_per_s)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate_per_s
+            time.sleep(wait)
+
+
+class RatingsStore(SQLiteStore):
+    SCHEMA = ("""CREATE TABLE IF NOT EXISTS ratings (
+                        key TEXT PRIMARY KEY,
+                        rating REAL NOT NULL,
+                        fetched_at REAL NOT NULL)""",)
+
+    def __init__(self, path="./cache/ratings.sqlite", ttl_s=30 * 24 * 60 * 60, precision=5,
+                 max_workers=8, requests_per_s=10.0, retry_after_s=5 * 60):
+        self.path = path
+        self.ttl_s = ttl_s                # ratings older than this are fetched again
+        self.precision = precision        # decimals of the rounded coordinate key (5 ~ 1 m)
+        self.max_workers = max_workers
+        self.rate_limiter = RateLimiter(requests_per_s)
+        self.retry_after_s = retry_after_s  # failed lookups answered with the caller's default this long
+        self.memo = {}                    # in-run memo: key -> rating
+        self._failed = {}                 # key -> time of its last failed lookup (kept in memory only)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def make_key(self, lat, lon):
+        return f"{round(float(lat), self.precision)},{round(float(lon), self.precision)}"
+
+    def get_ratings(self, pois, fetch, default=None):
+        """
+        Ratings for a list of (lat, lon) POIs, in order.
+
+        fetch(lat, lon) is only called for POIs that are neither memoized nor stored (or whose
+        stored rating expired), and raises when the lookup fails. The successful lookups are
+        always stored. Without a default the first error is then raised. With a default, the
+        POIs whose lookup failed get the default (which is not stored), and they are not looked
+        up again for retry_after_s.
+        """
+        keys = [self.make_key(lat, lon) for lat, lon in pois]
+        missing = self._load([key for key in dict.fromkeys(keys)])
+
+        if missing and default is not None:
+            now = time.time()
+            with self._lock:
+                missing = [key for key in missing if now - self._failed.get(key, -self.retry_after_s)
+                           >= self.retry_after_s]
+        if missing:
+            first_poi = {}
+            for key, poi in zip(keys, pois):
+                first_poi.setdefault(key, poi)
+            errors = self._fetch_missing({key: first_poi[key] for key in missing}, fetch)
+            if errors and default is None:
+                raise errors[0]
+            if errors:
+                print(f"{len(errors)} rating lookups failed, using {default} until they are retried: {errors[0]}")
+
+        return [self.memo.get(key, default) for key in keys]
+
+    def has_ratings(self, pois):
+        """True when every (lat, lon) POI has a looked up rating (none would get a default)"""
+        with self._lock:
+            return all(self.make_key(lat, lon) in self.memo for lat, lon in pois)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_ratio": self.hits / total if total else 0.0}
+
+    def _load(self, keys):
+        # fill the memo from disk, returning the keys that still need a fetch
+        with self._lock:
+            pending = [key for key in keys if key not in self.memo]
+            self.hits += len(keys) - len(pending)
+            metrics.record_cache("rating", hits=len(keys) - len(pending))
+            if not pending:
+                return []
+
+            cutoff = time.time() - self.ttl_s
+            conn = self._connection()
+            for start in range(0, len(pending), 500):
+                chunk = pending[start:start + 500]
+                rows = conn.execute(f"SELECT key, rating FROM ratings WHERE fetched_at >= ? AND key IN "
+                                    f"({','.join('?' * len(chunk))})", [cutoff] + chunk).fetchall()
+                self.memo.update(rows)
+
+            missing = [key for key in pending if key not in self.memo]
+            self.hits += len(pending) - len(missing)
+            self.misses += len(missing)
+            metrics.record_cache("rating", hits=len(pending) - len(missing), misses=len(missing))
+            return missing
+
+    def _fetch_missing(self, missing, fetch):
+        def fetch_one(item):
+            key, (lat, lon) = item
+            self.rate_limiter.acquire()
+            return key, fetch(lat, lon)
+
+        results, errors, failed = [], [], []
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(missing))) as executor:
+            futures = [executor.submit(metrics.propagate(fetch_one), item) for item in missing.items()]
+            for key, future in zip(missing, futures):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    errors.append(e)
+                    failed.append(key)
+
+        with self._lock:
+            now = time.time()
+            self._failed.update((key, now) for key in failed)
+            for key, _ in results:
+                self._failed.pop(key, None)
+            conn = self._connection()
+            conn.executemany("INSERT OR REPLACE INTO ratings (key, rating, fetched_at) VALUES (?, ?, ?)",
+                             [(key, float(rating), now) for key, rating in results])
+            conn.commit()
+            self.memo.update((key, float(rating)) for key, rating in results)
+        return errors
@@ -0,0 +1,128 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from . import metrics
+from .sqlite_store import SQLiteStore
+
+
+# === PERSISTENT CACHE FOR OSRM /route RESPONSES ===
+# Responses are keyed by the normalized coordinate sequence plus the query options and stored
+# in SQLite, so repeated plans (and every SA iteration re-fetching the same base route) skip the
+# network round trip. A small in-memory LRU in front of the disk store also skips the JSON parse;
+# its hits are queued and written to last_access in batches, so the disk LRU still sees them.
+class RouteCache(SQLiteStore):
+    SCHEMA = ("""CREATE TABLE IF NOT EXISTS routes (
+                        key TEXT PRIMARY KEY,
+                        response TEXT NOT NULL,
+                        last_access REAL NOT NULL)""",
+              "CREATE INDEX IF NOT EXISTS routes_last_access ON routes (last_access)")
+
+    def __init__(self, path="./cache/osrm_routes.sqlite", max_entries=5000, memory_entries=256,
+                 precision=6, touch_batch=64):
+        self.path = path
+        self.max_entries = max_entries        # size bound for the on-disk store (LRU eviction)
+        self.memory_entries = memory_entries  # size bound for the parsed in-memory front
+        self.precision = precision            # decimals kept when normalizing coordinates
+        self.touch_batch = touch_batch        # memory hits queued before their last_access is written
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._touches = {}                    # key -> last_access of memory hits not yet on disk
+        self._lock = threading.Lock()
+
+    def make_key(self, coords, options=None):
+        """Build a cache key from a coordinate sequence [(lon, lat), ...] and query options"""
+        coord_part = ";".join(f"{round(float(lon), self.precision)},{round(float(lat), self.precision)}"
+                              for lon, lat in coords)
+        option_part = "&".join(f"{k}={v}" for k, v in sorted((options or {}).items()))
+        return f"{coord_part}?{option_part}"
+
+    def get(self, coords, options=None):
+        """Return the cached OSRM response (parsed JSON) or None on a miss"""
+        key = self.make_key(coords, options)
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                metrics.record_cache("osrm_route", hits=1)
+                self._touches[key] = time.time()
+                if len(self._touches) >= self.touch_batch:
+                    self._flush_touches()
+                    self._connection().commit()
+                return self._memory[key]
+
+            row = self._connection().execute("SELECT response FROM routes WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                metrics.record_cache("osrm_route", misses=1)
+                return None
+
+            self.hits += 1
+            metrics.record_cache("osrm_route", hits=1)
+            self._touch(key)
+            response = json.loads(row[0])
+            self._remember(key, response)
+            return response
+
+    def put(self, coords, options, response):
+        """Store a successful OSRM response"""
+        key = self.make_key(coords, options)
+        with self._lock:
+            conn = self._connection()
+            conn.execute("INSERT OR REPLACE INTO routes (key, response, last_access) VALUES (?, ?, ?)",
+                         (key, json.dumps(response), time.time()))
+            self._flush_touches()  # evict by up-to-date access times
+            self._evict(conn)
+            conn.commit()
+            self._remember(key, response)
+
+    def stats(self):
+        """Hit/miss counters for reporting"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+            "memory_entries": len(self._memory),
+        }
+
+    def clear(self):
+        """Drop every cached route (both memory and disk)"""
+        with self._lock:
+            self._memory.clear()
+            self._touches.clear()
+            conn = self._connection()
+            conn.execute("DELETE FROM routes")
+            conn.commit()
+
+    def _touch(self, key):
+        conn = self._connection()
+        conn.execute("UPDATE routes SET last_access = ? WHERE key = ?", (time.time(), key))
+        conn.commit()
+
+    def flush(self):
+        """Write the queued last_access updates of memory hits to disk"""
+        with self._lock:
+            self._flush_touches()
+            self._connection().commit()
+
+    def _flush_touches(self):
+        if self._touches:
+            self._connection().executemany("UPDATE routes SET last_access = ? WHERE key = ?",
+                                           [(accessed, key) for key, accessed in self._touches.items()])
+            self._touches.clear()
+
+    def _remember(self, key, response):
+        self._memory[key] = response
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict(self, conn):
+        # remove the least recently used rows beyond the size bound
+        count = conn.execute("SELECT COUNT(*) FROM routes").fetchone()[0]
+        if count > self.max_entries:
+            conn.execute("""DELETE FROM routes WHERE key IN (
+                                SELECT key FROM routes ORDER BY last_access ASC LIMIT ?)""",
+                         (count - self.max_entries,))
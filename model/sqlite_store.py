@@ -0,0 +1,25 @@
+import os
+import sqlite3
+
+
+# === SQLITE-BACKED CACHES ===
+# Base class of the persistent caches (routes, ratings, tiles, geocoding). Each keeps one
+# connection, opened lazily at self.path with the subclass's SCHEMA, and shared by its threads
+# under the subclass's own lock.
+class SQLiteStore:
+    SCHEMA = ()        # CREATE statements run whenever a connection is opened
+    _conn = None
+    _conn_pid = None
+
+    def _connection(self):
+        # reopen after a fork so worker processes never share a sqlite handle
+        if self._conn is None or self._conn_pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            for statement in self.SCHEMA:
+                self._conn.execute(statement)
+            self._conn.commit()
+            self._conn_pid = os.getpid()
+        return self._conn
@@ -0,0 +1,362 @@
+import hashlib
+import json
+import math
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs, unquote, urlencode
+import numpy as np
+import shapely
+from shapely.geometry import Polygon
+from . import tour_order
+
+
+# === LOCAL STAND-IN SERVERS FOR EXTERNAL APIS ===
+# Small HTTP servers that answer like the external backends with deterministic responses, so
+# code paths that call them can be exercised (and benchmarked) without API keys or the Docker
+# stack. Responses can also be replayed from a recordings file captured from a real backend.
+class StandinServer:
+    def __init__(self, routes, host="127.0.0.1", port=0, recordings=None, record=False):
+        """
+        Parameters:
+        - routes: list of (method, path_prefix, handler) where handler(path, query, body) -> (status, payload)
+        - recordings: dict request_key -> [status, payload] answered before the handlers (see load_recordings)
+        - record: keep every served response in self.recordings so it can be saved with save_recordings
+        """
+        self.routes = routes
+        self.recordings = recordings if recordings is not None else {}
+        self.record = record
+        self.request_count = 0
+        self._count_lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                self._dispatch("GET")
+
+            def do_POST(self):
+                self._dispatch("POST")
+
+            def _dispatch(self, method):
+                with server._count_lock:
+                    server.request_count += 1
+                parts = urlsplit(self.path)
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length).decode() if length else ""
+                key = request_key(method, self.path, body)
+                if key in server.recordings:
+                    status, payload = server.recordings[key]
+                else:
+                    for route_method, prefix, handler in server.routes:
+                        if route_method == method and parts.path.startswith(prefix):
+                            status, payload = handler(parts.path, parse_qs(parts.query), body)
+                            break
+                    else:
+                        status, payload = 404, {"message": "Not Found"}
+                    if server.record:
+                        server.recordings[key] = [status, payload]
+
+                data = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass  # keep test and benchmark output quiet
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def save_recordings(self, path):
+        with open(path, "w") as f:
+            json.dump(self.recordings, f)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+
+# key a response is recorded under: method, full path with query string, and a hash of the body
+def request_key(method, path, body=""):
+    key = f"{method} {path}"
+    if body:
+        key += " " + hashlib.sha1(body.encode()).hexdigest()
+    return key
+
+
+def load_recordings(path):
+    """Recorded responses saved by StandinServer.save_recordings, keyed by request_key"""
+    with open(path) as f:
+        return json.load(f)
+
+
+# forwards every request to a real backend (run with record=True to capture a recordings file)
+def proxy_routes(upstream, timeout=60):
+    import requests
+
+    def forward(method):
+        def handler(path, query, body):
+            url = f"{upstream.rstrip('/')}{path}"
+            if query:
+                url += "?" + urlencode(query, doseq=True)
+            response = requests.request(method, url, data=body or None, timeout=timeout)
+            try:
+                return response.status_code, response.json()
+            except ValueError:
+                return response.status_code, {"message": response.text}
+        return handler
+
+    return [("GET", "/", forward("GET")),
+            ("POST", "/", forward("POST"))]
+
+
+# stable pseudo-random value in [0, 1) derived from a string
+def _stable_fraction(text):
+    return int(hashlib.sha1(text.encode()).hexdigest()[:8], 16) / 0xFFFFFFFF
+
+
+# ==== FOURSQUARE ====
+# /v3/places/search?ll=lat,lon&limit=1 and /v3/places/<fsq_id>?fields=rating
+def foursquare_routes(match_ratio=0.8):
+    def search(path, query, body):
+        ll = query.get("ll", [""])[0]
+        if _stable_fraction("match:" + ll) >= match_ratio:
+            return 200, {"results": []}
+        return 200, {"results": [{"fsq_id": hashlib.sha1(ll.encode()).hexdigest()[:24]}]}
+
+    def details(path, query, body):
+        fsq_id = path.rsplit("/", 1)[-1]
+        return 200, {"rating": round(5 + 5 * _stable_fraction(fsq_id), 1)}
+
+    return [("GET", "/v3/places/search", search),
+            ("GET", "/v3/places/", details)]
+
+
+def start_foursquare_standin(host="127.0.0.1", port=0, match_ratio=0.8):
+    """Start a Foursquare stand-in; point main.foursquare_url at server.url + '/v3/places/'"""
+    return StandinServer(foursquare_routes(match_ratio), host, port).start()
+
+
+# ==== OSRM ====
+# /route/v1/driving/<lon,lat;...> and /table/v1/driving/<lon,lat;...>. Roads are straight lines
+# between the coordinates with a fixed detour factor and average speed, so durations are
+# consistent between /route and /table.
+def _haversine_m(lon1, lat1, lon2, lat2):
+    lon1, lat1, lon2, lat2 = map(np.radians, (lon1, lat1, lon2, lat2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371000.0 * np.arcsin(np.sqrt(a))
+
+
+def _parse_coordinates(path):
+    coord_str = unquote(path.rsplit("/", 1)[-1])
+    return [tuple(float(v) for v in pair.split(",")) for pair in coord_str.split(";") if pair]
+
+
+# Google encoded polyline (precision 5), the OSRM default geometry format
+def encode_polyline(coords):
+    result, previous = [], (0, 0)
+    for lon, lat in coords:
+        current = (round(lat * 1e5), round(lon * 1e5))
+        for value, before in zip(current, previous):
+            value = value - before
+            value = ~(value << 1) if value < 0 else value << 1
+            while value >= 0x20:
+                result.append(chr((0x20 | (value & 0x1f)) + 63))
+                value >>= 5
+            result.append(chr(value + 63))
+        previous = current
+    return "".join(result)
+
+
+def osrm_routes(speed_mps=22.0, detour_factor=1.3, step_m=500.0):
+    def leg_costs(coords):
+        points = np.asarray(coords)
+        distances = _haversine_m(points[:-1, 0], points[:-1, 1], points[1:, 0], points[1:, 1]) * detour_factor
+        return distances, distances / speed_mps
+
+    def build_route(coords, query):
+        distances, durations = leg_costs(coords)
+
+        geometry = [coords[0]]
+        for (lon1, lat1), (lon2, lat2), distance in zip(coords[:-1], coords[1:], distances):
+            steps = max(1, int(distance // step_m))
+            geometry.extend((lon1 + (lon2 - lon1) * t, lat1 + (lat2 - lat1) * t)
+                            for t in np.linspace(0, 1, steps + 1)[1:])
+        if query.get("overview", ["simplified"])[0] == "false":
+            encoded = None
+        elif query.get("geometries", ["polyline"])[0] == "geojson":
+            encoded = {"type": "LineString", "coordinates": [list(c) for c in geometry]}
+        else:
+            encoded = encode_polyline(geometry)
+
+        legs = [{"distance": float(d), "duration": float(t), "weight": float(t), "steps": [], "summary": ""}
+                for d, t in zip(distances, durations)]
+        return {"geometry": encoded, "legs": legs, "distance": float(distances.sum()),
+                "duration": float(durations.sum()), "weight": float(durations.sum()), "weight_name": "routability"}
+
+    def route(path, query, body):
+        coords = _parse_coordinates(path)
+        if len(coords) < 2:
+            return 400, {"code": "InvalidQuery", "message": "Query string malformed"}
+        return 200, {"code": "Ok", "routes": [build_route(coords, query)],
+                     "waypoints": [{"location": list(c), "name": "", "distance": 0.0} for c in coords]}
+
+    # only the source=first&destination=last&roundtrip=false form the planner uses
+    def trip(path, query, body):
+        coords = _parse_coordinates(path)
+        if len(coords) < 2:
+            return 400, {"code": "InvalidQuery", "message": "Query string malformed"}
+        points = np.asarray([coords[0], coords[-1]] + coords[1:-1])  # tour_order numbering
+        distances = _haversine_m(points[:, None, 0], points[:, None, 1], points[None, :, 0], points[None, :, 1])
+        order = tour_order.two_opt(distances, tour_order.nearest_neighbor(distances))
+        visit = [0] + [node - 1 for node in order] + [len(coords) - 1]  # request indices in trip order
+        position = {index: i for i, index in enumerate(visit)}
+        return 200, {"code": "Ok", "trips": [build_route([coords[i] for i in visit], query)],
+                     "waypoints": [{"location": list(c), "name": "", "distance": 0.0, "trips_index": 0,
+                                    "waypoint_index": position[i]} for i, c in enumerate(coords)]}
+
+    def table(path, query, body):
+        coords = _parse_coordinates(path)
+
+        def indices(name):
+            value = query.get(name, ["all"])[0]
+            return list(range(len(coords))) if value == "all" else [int(i) for i in value.split(";")]
+
+        sources, destinations = indices("sources"), indices("destinations")
+        points = np.asarray(coords)
+        distances = detour_factor * _haversine_m(points[sources, 0][:, None], points[sources, 1][:, None],
+                                                 points[destinations, 0][None, :], points[destinations, 1][None, :])
+        return 200, {"code": "Ok",
+                     "durations": (distances / speed_mps).tolist(),
+                     "distances": distances.tolist(),
+                     "sources": [{"location": list(coords[i]), "name": ""} for i in sources],
+                     "destinations": [{"location": list(coords[j]), "name": ""} for j in destinations]}
+
+    return [("GET", "/route/v1/", route),
+            ("GET", "/table/v1/", table),
+            ("GET", "/trip/v1/", trip)]
+
+
+# ==== OVERPASS ====
+# Answers the node["key"~"value"](bbox)(poly:'...') and (around:r,lat,lon) queries the planner
+# sends. POIs sit on a fixed global lattice (one candidate per cell and tag, kept with
+# probability `density`), so overlapping queries always see the same POIs.
+_CLAUSE = re.compile(r'node\["([^"]+)"~"([^"]+)"\]\(([^)]*)\)(?:\(poly:\'([^\']*)\'\))?')
+
+
+def overpass_routes(cell_deg=0.01, density=0.3, max_cells=250000):
+    def lattice(tag, south, west, north, east):
+        rows = np.arange(math.floor(south / cell_deg), math.floor(north / cell_deg) + 1)
+        cols = np.arange(math.floor(west / cell_deg), math.floor(east / cell_deg) + 1)
+        if len(rows) * len(cols) > max_cells:
+            return []
+        elements = []
+        for row in rows:
+            for col in cols:
+                seed = f"{tag}:{row}:{col}"
+                if _stable_fraction(seed) >= density:
+                    continue
+                lat = (row + _stable_fraction(seed + ":lat")) * cell_deg
+                lon = (col + _stable_fraction(seed + ":lon")) * cell_deg
+                if south <= lat <= north and west <= lon <= east:
+                    elements.append((int(hashlib.sha1(seed.encode()).hexdigest()[:12], 16), lon, lat))
+        return elements
+
+    def interpreter(path, query, body):
+        text = query["data"][0] if "data" in query else unquote(body[5:]) if body.startswith("data=") else body
+        elements = {}
+        for key, value, area, poly in _CLAUSE.findall(text):
+            if area.startswith("around:"):
+                radius, lat, lon = (float(v) for v in area[len("around:"):].split(","))
+                dlat = radius / 111320.0
+                dlon = dlat / max(0.01, math.cos(math.radians(lat)))
+                candidates = lattice(f"{key}={value}", lat - dlat, lon - dlon, lat + dlat, lon + dlon)
+                candidates = [c for c in candidates if _haversine_m(lon, lat, c[1], c[2]) <= radius]
+            else:
+                candidates = lattice(f"{key}={value}", *(float(v) for v in area.split(",")))
+                if poly and candidates:
+                    values = [float(v) for v in poly.split()]
+                    shape = Polygon(list(zip(values[1::2], values[0::2])))  # poly lists "lat lon" pairs
+                    ids, lons, lats = (np.array(column) for column in zip(*candidates))
+                    inside = shapely.contains_xy(shape, lons, lats)
+                    candidates = list(zip(ids[inside].tolist(), lons[inside].tolist(), lats[inside].tolist()))
+            for element_id, lon, lat in candidates:
+                name = f"{value.replace('_', ' ').title()} {element_id % 1000}"
+                elements[element_id] = {"type": "node", "id": element_id, "lat": lat, "lon": lon,
+                                        "tags": {key: value, "name": name}}
+        return 200, {"version": 0.6, "generator": "Overpass stand-in", "elements": list(elements.values())}
+
+    return [("POST", "/api/interpreter", interpreter),
+            ("GET", "/api/interpreter", interpreter)]
+
+
+# ==== NOMINATIM ====
+# /search?q=...&format=json and /reverse?lat=..&lon=..&format=json. Known places answer with
+# their real centre, anything else with a stable point derived from the name; boundaries are
+# octagons around the centre.
+KNOWN_PLACES = {
+    "boston ma": (-71.0589, 42.3601),
+    "cambridge ma": (-71.1097, 42.3736),
+    "worcester ma": (-71.8023, 42.2626),
+    "providence ri": (-71.4128, 41.8240),
+    "hartford ct": (-72.6851, 41.7658),
+    "portland me": (-70.2553, 43.6591),
+    "albany ny": (-73.7562, 42.6526),
+    "new york ny": (-74.0060, 40.7128),
+}
+
+
+def nominatim_routes(radius_deg=0.08):
+    def place(name):
+        key = re.sub(r"[\s,;]+", " ", name.strip().lower())
+        if key in KNOWN_PLACES:
+            return KNOWN_PLACES[key]
+        return -80.0 + 10.0 * _stable_fraction("lon:" + key), 38.0 + 6.0 * _stable_fraction("lat:" + key)
+
+    def search(path, query, body):
+        name = query.get("q", [""])[0]
+        if not name or name.lower().startswith("nowhere"):
+            return 200, []
+        lon, lat = place(name)
+        result = {"place_id": int(_stable_fraction(name) * 1e9), "lat": str(lat), "lon": str(lon),
+                  "display_name": name, "class": "boundary", "type": "administrative",
+                  "boundingbox": [str(lat - radius_deg), str(lat + radius_deg),
+                                  str(lon - radius_deg), str(lon + radius_deg)]}
+        if query.get("polygon_geojson", ["0"])[0] == "1":
+            ring = [[lon + radius_deg * math.cos(math.pi * i / 4), lat + radius_deg * math.sin(math.pi * i / 4)]
+                    for i in range(8)]
+            result["geojson"] = {"type": "Polygon", "coordinates": [ring + [ring[0]]]}
+        return 200, [result]
+
+    def reverse(path, query, body):
+        lat, lon = float(query["lat"][0]), float(query["lon"][0])
+        nearest = min(KNOWN_PLACES, key=lambda key: (KNOWN_PLACES[key][0] - lon) ** 2 +
+                                                    (KNOWN_PLACES[key][1] - lat) ** 2)
+        city, state = nearest.rsplit(" ", 1)
+        address = {"house_number": str(int(_stable_fraction(f"{lat},{lon}") * 200) + 1),
+                   "road": "Main Street", "city": city.title(), "state": state.upper(),
+                   "country": "United States", "country_code": "us"}
+        return 200, {"lat": str(lat), "lon": str(lon), "address": address,
+                     "display_name": ", ".join(address.values())}
+
+    return [("GET", "/search", search),
+            ("GET", "/reverse", reverse)]
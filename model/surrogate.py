@@ -0,0 +1,161 @@
+import math
+import threading
+from . import metrics
+from .dwell_time import DwellTimeModel
+
+
+# === SURROGATE SCORES FOR SA NEIGHBORS ===
+# Estimates the parts of a candidate's score from its config alone: the number of stops from
+# the corridor's POI density, the travel time from haversine lengths times a learned detour
+# factor, and the spread of the stops from the base route's length. The annealing loop uses
+# the estimate to skip neighbors that are very unlikely to be accepted before any POIs are
+# sampled, routed or rated. Every full evaluation is fed back, so the factors adapt to the
+# area and the prediction error (which also widens the screen) is known.
+
+surrogate_abs_error = metrics.registry.histogram(
+    "planner_surrogate_abs_error", "Absolute error of surrogate score predictions",
+    buckets=[0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 25.0])
+surrogate_candidates = metrics.registry.counter(
+    "planner_surrogate_candidates_total", "SA neighbors screened by the surrogate, by result")
+
+
+class SurrogateModel:
+    def __init__(self, dwell_model=None, rating_score=3.0, smoothing=0.2, min_observations=5,
+                 min_acceptance=0.05):
+        """
+        Parameters:
+        - dwell_model: DwellTimeModel for the time spent at the waypoints (stops are expected to
+          take the mean dwell time of their theme, the start and end the default)
+        - rating_score: Expected rating component of the score (ratings are unknown before sampling)
+        - smoothing: Weight of a new observation in the running averages
+        - min_observations: Full evaluations seen before the surrogate rejects anything
+        - min_acceptance: A neighbor is rejected when, even after subtracting the typical
+          prediction error, its acceptance probability would be below this
+        """
+        self.dwell_model = dwell_model or DwellTimeModel()
+        self.rating_score = rating_score
+        self.smoothing = smoothing
+        self.min_observations = min_observations
+        self.min_acceptance = min_acceptance
+
+        # learned factors
+        self.seconds_per_meter = 1.3 / 22.0  # travel time per haversine meter (detour factor / speed)
+        self.spread_ratio = 1.0              # observed spread / spread of stops evenly along the route
+        self.densities = {}                  # (route key, theme) and theme -> POIs per km² of corridor
+        self.bias = 0.0                      # mean (actual - predicted) score
+        self.abs_error = None                # mean |actual - predicted| score
+        self.observations = 0
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self._lock:
+            self.screened = 0
+            self.rejected = 0
+            self.error_count = 0    # full evaluations since the last reset
+            self.error_sum = 0.0    # of actual - predicted score
+            self.abs_error_sum = 0.0
+
+    @staticmethod
+    def corridor_area_km2(buffer_km, route_length_m):
+        # area of a buffer around a line: a band along it plus the round caps at its ends
+        return 2 * buffer_km * route_length_m / 1000.0 + math.pi * buffer_km ** 2
+
+    @staticmethod
+    def path_length_m(buffer_km, route_length_m, stops):
+        # each stop lies about half a buffer off the route, so it adds about one buffer width
+        return route_length_m + stops * buffer_km * 1000.0
+
+    def expected_stops(self, config, route_length_m, key):
+        density = self.densities.get((key, config.theme), self.densities.get(config.theme))
+        available = (config.max_pois if density is None
+                     else density * self.corridor_area_km2(config.buffer_km, route_length_m))
+        # sample_pois draws uniformly between min_pois and max_pois, capped by what is available
+        low, high = min(config.min_pois, available), min(config.max_pois, available)
+        return (low + high) / 2 if low <= high else available
+
+    def estimate(self, config, route_length_m, key):
+        """
+        Expected components of a candidate with this config on a base route of route_length_m.
+
+        Returns:
+        - dict with waypoints (stops plus start and end), travel_s, dwell_s and spread_m
+        """
+        stops = self.expected_stops(config, route_length_m, key)
+        waypoints = stops + 2
+        return {
+            "waypoints": waypoints,
+            "travel_s": self.seconds_per_meter * self.path_length_m(config.buffer_km, route_length_m, stops),
+            "dwell_s": (stops * self.dwell_model.theme_seconds(config.theme, config.pace)
+                        + 2 * self.dwell_model.default_seconds(config.pace)),
+            # mean distance between points spread evenly along a line is a third of its length
+            "spread_m": self.spread_ratio * route_length_m / 3.0,
+        }
+
+    def observe_density(self, key, theme, buffer_km, route_length_m, corridor_pois):
+        density = corridor_pois / self.corridor_area_km2(buffer_km, route_length_m)
+        with self._lock:
+            for density_key in ((key, theme), theme):
+                self.densities[density_key] = self._average(self.densities.get(density_key), density)
+
+    def observe(self, config, route_length_m, path_length_m, travel_s, spread_m, predicted_score, score):
+        """
+        Learn from a fully evaluated candidate.
+
+        Parameters:
+        - path_length_m: haversine length through the candidate's waypoints
+        - travel_s, spread_m: the candidate's route duration and waypoint spread
+        - predicted_score: prediction made for its config before evaluation (without the bias)
+        - score: its actual score
+        """
+        if not math.isfinite(score) or not math.isfinite(predicted_score):
+            return
+        with self._lock:
+            error = score - (predicted_score + self.bias)
+            self.error_count += 1
+            self.error_sum += error
+            self.abs_error_sum += abs(error)
+            self.abs_error = self._average(self.abs_error, abs(error))
+            self.bias = self._average(self.bias if self.observations else None, score - predicted_score)
+            if path_length_m > 0 and travel_s > 0:
+                self.seconds_per_meter = self._average(self.seconds_per_meter, travel_s / path_length_m)
+            if route_length_m > 0 and spread_m > 0:
+                self.spread_ratio = self._average(self.spread_ratio, spread_m / (route_length_m / 3.0))
+            self.observations += 1
+        surrogate_abs_error.observe(abs(error))
+
+    def is_promising(self, predicted_score, current_score, temperature):
+        """
+        Whether a neighbor predicted at predicted_score (without the bias) deserves a full
+        evaluation: always during warm-up, afterwards unless it would be accepted with a
+        probability below min_acceptance even if it scored the typical error better.
+        """
+        with self._lock:
+            if self.observations < self.min_observations or self.abs_error is None:
+                return True
+            optimistic_delta = predicted_score + self.bias - self.abs_error - current_score
+            promising = optimistic_delta <= -max(temperature, 1e-12) * math.log(self.min_acceptance)
+            self.screened += 1
+            self.rejected += int(not promising)
+        surrogate_candidates.inc(result="passed" if promising else "rejected")
+        return promising
+
+    def stats(self):
+        with self._lock:
+            count = self.error_count
+            return {
+                "screened": self.screened,
+                "rejected": self.rejected,
+                "rejection_rate": self.rejected / self.screened if self.screened else 0.0,
+                "evaluations": count,
+                "mean_abs_error": self.abs_error_sum / count if count else None,
+                "mean_error": self.error_sum / count if count else None,
+                "seconds_per_meter": self.seconds_per_meter,
+                "spread_ratio": self.spread_ratio,
+                "bias": self.bias,
+            }
+
+    def _average(self, previous, value):
+        if previous is None:
+            return value
+        return previous + self.smoothing * (value - previous)
@@ -48,3 +48,58 @@ THEMES = {
         "natural": ["beach", "peak", "volcano", "waterfall", "cave_entrance"]
     }
 }
+
+
+# === TIME SPENT AT A POI ===
+# Typical visit length in hours, by the "key=value" THEMES tag a POI matched. Tags not listed
+# here (and waypoints that are not a known POI, such as the start and end) get
+# DEFAULT_DWELL_HOURS, the mean of the old random 1-3 hours.
+
+DEFAULT_DWELL_HOURS = 2.0
+
+DWELL_HOURS = {
+    # Education
+    "amenity=school": 0.5, "amenity=college": 1.0, "amenity=university": 1.5, "amenity=kindergarten": 0.25,
+    "amenity=library": 1.0, "amenity=public_bookcase": 0.1,
+    # Healthcare
+    "amenity=hospital": 2.0, "amenity=clinic": 1.0, "amenity=doctors": 1.0, "amenity=dentist": 1.0,
+    "amenity=pharmacy": 0.25, "amenity=veterinary": 1.0,
+    # Tourism
+    "tourism=attraction": 1.5, "tourism=museum": 2.5, "tourism=arts_centre": 1.5, "tourism=aquarium": 2.5,
+    "tourism=zoo": 3.5, "tourism=theme_park": 5.0, "tourism=gallery": 1.5,
+    "historic=castle": 2.0, "historic=monument": 0.5, "historic=ruins": 1.0, "historic=archaeological_site": 1.5,
+    # Religious
+    "amenity=place_of_worship": 0.75, "building=church": 0.5, "building=mosque": 0.5,
+    "building=synagogue": 0.5, "building=temple": 0.5,
+    # Transportation
+    "amenity=bus_station": 0.25, "amenity=ferry_terminal": 0.5, "amenity=taxi": 0.1,
+    "amenity=bicycle_rental": 2.0, "amenity=car_rental": 0.5, "amenity=fuel": 0.25,
+    "railway=station": 0.25, "railway=tram_stop": 0.1, "railway=halt": 0.1,
+    # Accommodation (check-in and settling in, the night itself is not driving time)
+    "tourism=hotel": 1.0, "tourism=motel": 0.75, "tourism=guest_house": 1.0, "tourism=hostel": 1.0,
+    "tourism=camp_site": 1.5, "tourism=caravan_site": 1.5,
+    # Food_and_Drink
+    "amenity=restaurant": 1.5, "amenity=cafe": 0.75, "amenity=fast_food": 0.5, "amenity=pub": 1.5,
+    "amenity=bar": 1.5, "amenity=ice_cream": 0.25,
+    # Shopping
+    "shop=supermarket": 0.5, "shop=convenience": 0.25, "shop=mall": 2.0, "shop=clothes": 1.0,
+    "shop=gift": 0.5, "shop=bakery": 0.25, "shop=butcher": 0.25, "shop=greengrocer": 0.25,
+    # Leisure
+    "leisure=park": 1.5, "leisure=garden": 1.0, "leisure=playground": 1.0, "leisure=sports_centre": 2.0,
+    "leisure=stadium": 3.0, "leisure=swimming_pool": 2.0, "leisure=fitness_centre": 1.5,
+    # Emergency
+    "amenity=police": 0.5, "amenity=fire_station": 0.25, "amenity=ambulance_station": 0.25, "emergency=phone": 0.1,
+    # Finance
+    "amenity=bank": 0.5, "amenity=atm": 0.1, "amenity=bureau_de_change": 0.25,
+    # Public_services
+    "amenity=post_office": 0.25, "amenity=townhall": 0.5, "amenity=courthouse": 1.0,
+    "amenity=community_centre": 1.0,
+    # Entertainment
+    "amenity=theatre": 2.5, "amenity=cinema": 2.5, "amenity=nightclub": 3.0, "amenity=casino": 3.0,
+    # Natural
+    "natural=beach": 3.0, "natural=peak": 2.5, "natural=volcano": 3.0, "natural=waterfall": 1.0,
+    "natural=cave_entrance": 1.0,
+}
+
+# dwell time multiplier per travel pace (UserPreferences.pace)
+PACE_FACTORS = {"relaxed": 1.3, "moderate": 1.0, "fast": 0.7}
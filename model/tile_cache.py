@@ -0,0 +1,155 @@
+import json
+import math
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+import shapely
+from shapely.geometry import box
+from . import metrics
+from .sqlite_store import SQLiteStore
+
+
+# === OVERPASS RESULTS CACHED PER SLIPPY TILE ===
+# Overpass results are stored per fixed (zoom, x, y) web-mercator tile and theme, so a corridor
+# query reduces to "which tiles are missing or stale". Tiles live on disk and are shared across
+# users, sessions and restarts.
+
+# tile containing a (lon, lat) point
+def lonlat_to_tile(lon, lat, zoom):
+    n = 2 ** zoom
+    x = int((lon + 180.0) / 360.0 * n)
+    lat_rad = math.radians(max(-85.0511, min(85.0511, lat)))
+    y = int((1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+# vectorized version for arrays of lon/lat, returns (x, y) integer arrays
+def lonlat_to_tiles(lon, lat, zoom):
+    n = 2 ** zoom
+    x = ((np.asarray(lon) + 180.0) / 360.0 * n).astype(int)
+    lat_rad = np.radians(np.clip(lat, -85.0511, 85.0511))
+    y = ((1.0 - np.arcsinh(np.tan(lat_rad)) / np.pi) / 2.0 * n).astype(int)
+    return np.clip(x, 0, n - 1), np.clip(y, 0, n - 1)
+
+
+# (min_lon, min_lat, max_lon, max_lat) of a tile
+def tile_bounds(x, y, zoom):
+    n = 2 ** zoom
+
+    def lat_of(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return x / n * 360.0 - 180.0, lat_of(y + 1), (x + 1) / n * 360.0 - 180.0, lat_of(y)
+
+
+# every tile at the given zoom that intersects the geometry, as (zoom, x, y)
+def tiles_covering(geometry, zoom):
+    min_lon, min_lat, max_lon, max_lat = geometry.bounds
+    x0, y0 = lonlat_to_tile(min_lon, max_lat, zoom)
+    x1, y1 = lonlat_to_tile(max_lon, min_lat, zoom)
+    candidates = [(x, y) for y in range(y0, y1 + 1) for x in range(x0, x1 + 1)]
+    boxes = shapely.box(*np.array([tile_bounds(x, y, zoom) for x, y in candidates]).T)
+    shapely.prepare(geometry)
+    hits = shapely.intersects(geometry, boxes)
+    return [(zoom, x, y) for (x, y), hit in zip(candidates, hits) if hit]
+
+
+# groups tiles into horizontal runs of adjacent tiles, each run is queried as one rectangle
+def tile_runs(tiles):
+    runs = []
+    for zoom, x, y in sorted(tiles, key=lambda tile: (tile[0], tile[2], tile[1])):
+        if runs and runs[-1][0] == zoom and runs[-1][1] == y and runs[-1][3] == x - 1:
+            runs[-1][3] = x
+        else:
+            runs.append([zoom, y, x, x])
+    return [(zoom, y, x0, x1) for zoom, y, x0, x1 in runs]
+
+
+# rectangle polygon covering a run of tiles
+def run_polygon(run):
+    zoom, y, x0, x1 = run
+    min_lon, min_lat, _, max_lat = tile_bounds(x0, y, zoom)
+    _, _, max_lon, _ = tile_bounds(x1, y, zoom)
+    return box(min_lon, min_lat, max_lon, max_lat)
+
+
+class TileCache(SQLiteStore):
+    SCHEMA = ("""CREATE TABLE IF NOT EXISTS tiles (
+                        zoom INTEGER NOT NULL,
+                        x INTEGER NOT NULL,
+                        y INTEGER NOT NULL,
+                        theme TEXT NOT NULL,
+                        records TEXT NOT NULL,
+                        fetched_at REAL NOT NULL,
+                        PRIMARY KEY (zoom, x, y, theme))""",)
+
+    def __init__(self, path="./cache/overpass_tiles.sqlite", max_age_s=7 * 24 * 60 * 60,
+                 memory_tiles=4096):
+        self.path = path
+        self.max_age_s = max_age_s        # tiles older than this are stale and fetched again
+        self.memory_tiles = memory_tiles  # parsed tiles kept in memory
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()      # (zoom, x, y, theme) -> (fetched_at, records)
+        self._lock = threading.Lock()
+
+    def get_many(self, tiles, theme):
+        """
+        Look up tiles for a theme.
+
+        Returns:
+        - found: dict (zoom, x, y) -> list of (lon, lat, tag) records for fresh tiles
+        - missing: tiles that are not cached or stale
+        """
+        cutoff = time.time() - self.max_age_s
+        found, missing = {}, []
+        with self._lock:
+            conn = self._connection()
+            for tile in tiles:
+                key = tile + (theme,)
+                entry = self._memory.get(key)
+                if entry is None:
+                    row = conn.execute("SELECT fetched_at, records FROM tiles WHERE zoom = ? AND x = ? AND y = ? "
+                                       "AND theme = ?", key).fetchone()
+                    if row is not None:
+                        entry = (row[0], [tuple(record) for record in json.loads(row[1])])
+                        self._remember(key, entry)
+                if entry is not None and entry[0] >= cutoff:
+                    self._memory.move_to_end(key)
+                    found[tile] = entry[1]
+                else:
+                    missing.append(tile)
+            self.hits += len(found)
+            self.misses += len(missing)
+        metrics.record_cache("overpass_tile", hits=len(found), misses=len(missing))
+        return found, missing
+
+    def put_many(self, tile_records, theme):
+        """Store freshly fetched records, tile_records: dict (zoom, x, y) -> list of (lon, lat, tag)"""
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.executemany("INSERT OR REPLACE INTO tiles (zoom, x, y, theme, records, fetched_at) "
+                             "VALUES (?, ?, ?, ?, ?, ?)",
+                             [tile + (theme, json.dumps(records), now) for tile, records in tile_records.items()])
+            conn.commit()
+            for tile, records in tile_records.items():
+                self._remember(tile + (theme,), (now, list(records)))
+
+    def purge_stale(self):
+        """Delete stale tiles from disk"""
+        with self._lock:
+            conn = self._connection()
+            conn.execute("DELETE FROM tiles WHERE fetched_at < ?", (time.time() - self.max_age_s,))
+            conn.commit()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_ratio": self.hits / total if total else 0.0}
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_tiles:
+            self._memory.popitem(last=False)
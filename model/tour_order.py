@@ -0,0 +1,115 @@
+import numpy as np
+
+
+# === CONSTRUCTIVE VISITING ORDER ===
+# Orders a set of stops between a fixed start and end before the route is requested: greedy
+# nearest neighbor, then 2-opt segment reversals until no reversal shortens the tour. Node
+# numbering follows local_search.TourState: 0 is the start, 1 the end and 2.. are the stops.
+# Durations may be asymmetric (one-way streets), so a reversal is priced with the reversed
+# costs of the segment, not just its two boundary edges.
+
+UNREACHABLE_PENALTY = 1e7  # seconds charged for a pair the router could not connect
+
+
+def nearest_neighbor(durations):
+    """Stops (nodes 2..) in greedy order, starting from node 0"""
+    unvisited = list(range(2, len(durations)))
+    order = []
+    current = 0
+    while unvisited:
+        costs = durations[current, unvisited]
+        current = unvisited.pop(int(np.argmin(costs)))
+        order.append(current)
+    return order
+
+
+def two_opt(durations, order, max_passes=100):
+    """Improve a stop order by reversing segments (best reversal first) with start and end fixed"""
+    path = np.array([0] + list(order) + [1])
+    interior = np.arange(1, len(path) - 1)
+    if len(interior) < 2:
+        return list(order)
+    first, last = np.meshgrid(interior, interior, indexing="ij")
+    valid = last > first
+
+    for _ in range(max_passes):
+        forward = np.concatenate([[0.0], np.cumsum(durations[path[:-1], path[1:]])])
+        backward = np.concatenate([[0.0], np.cumsum(durations[path[1:], path[:-1]])])
+        before, after = path[first - 1], path[last + 1]
+        delta = (durations[before, path[last]] + durations[path[first], after]
+                 - durations[before, path[first]] - durations[path[last], after]
+                 + (backward[last] - backward[first]) - (forward[last] - forward[first]))
+        delta = np.where(valid, delta, np.inf)
+        best = np.unravel_index(np.argmin(delta), delta.shape)
+        if delta[best] >= -1e-9:
+            break
+        i, j = first[best], last[best]
+        path[i:j + 1] = path[i:j + 1][::-1]
+    return path[1:-1].tolist()
+
+
+def leg_durations(durations, order):
+    """Travel time of every leg of start -> order -> end"""
+    path = np.array([0] + list(order) + [1])
+    return durations[path[:-1], path[1:]]
+
+
+def split_days(order, legs, daily_capacity):
+    """
+    Split an order into the fewest days of at most daily_capacity stops, balancing the days so
+    the longest day's driving is as short as possible. A day drives from the previous night's
+    stop (or the start) through its stops; the last day also drives on to the end.
+
+    Parameters:
+    - order: stops in visiting order
+    - legs: travel time of the len(order) + 1 legs of start -> order -> end
+
+    Returns:
+    - list of days, each a list of stops
+    """
+    n = len(order)
+    if n == 0:
+        return []
+    daily_capacity = max(1, daily_capacity)
+    n_days = -(-n // daily_capacity)
+    legs = np.asarray(legs, dtype=float)
+    driven = np.concatenate([[0.0], np.cumsum(legs)])  # driven[k]: start to the k-th stop
+
+    def day_cost(j, k):
+        # stops j+1..k of the order (1-based), plus the drive to the end on the last day
+        return driven[k] - driven[j] + (legs[-1] if k == n else 0.0)
+
+    # longest[d][k]: best longest day when the first k stops are covered by d days
+    longest = np.full((n_days + 1, n + 1), np.inf)
+    cut = np.zeros((n_days + 1, n + 1), dtype=int)
+    longest[0][0] = 0.0
+    for d in range(1, n_days + 1):
+        for k in range(d, min(n, d * daily_capacity) + 1):
+            for j in range(max(d - 1, k - daily_capacity), k):
+                cost = max(longest[d - 1][j], day_cost(j, k))
+                if cost < longest[d][k]:
+                    longest[d][k], cut[d][k] = cost, j
+
+    days, k = [], n
+    for d in range(n_days, 0, -1):
+        j = cut[d][k]
+        days.append(list(order[j:k]))
+        k = j
+    return days[::-1]
+
+
+def plan_order(durations, daily_capacity):
+    """
+    Near-optimal visiting order and day split for nodes 2.. between start 0 and end 1.
+
+    Parameters:
+    - durations: node x node travel times (seconds, inf when unreachable)
+    - daily_capacity: Stops per day
+
+    Returns:
+    - order: stop nodes in visiting order
+    - days: order split into days (see split_days)
+    """
+    durations = np.where(np.isfinite(durations), np.asarray(durations, dtype=float), UNREACHABLE_PENALTY)
+    order = two_opt(durations, nearest_neighbor(durations))
+    return order, split_days(order, leg_durations(durations, order), daily_capacity)
@@ -0,0 +1,130 @@
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+from shapely.geometry import mapping, shape
+
+
+# === OPTIMIZER TRACE SINKS ===
+# The optimizer reports what it is doing (corridors, iterations, new bests) to a trace sink
+# instead of rendering folium maps on its hot path. The default sink drops everything; the
+# NDJSON sink samples records and writes them from a background thread, and the traces can be
+# rendered to HTML maps offline with `python -m model.trace_sink render <trace> <out_dir>`.
+
+class NullTraceSink:
+    """Discards every record (the default)"""
+
+    def emit(self, kind, payload, is_best=False):
+        pass
+
+    def close(self):
+        pass
+
+
+class NDJSONTraceSink(NullTraceSink):
+    def __init__(self, path, every_n=10, best_only=False, max_queue=1000):
+        """
+        Parameters:
+        - path: NDJSON file the records are appended to
+        - every_n: Keep every Nth record of each kind (records flagged as a new best are always kept)
+        - best_only: Only keep records flagged as a new best
+        - max_queue: Records waiting for the writer; when full, new records are dropped, never waited on
+        """
+        self.path = path
+        self.every_n = max(1, every_n)
+        self.best_only = best_only
+        self.dropped = 0
+        self.written = 0
+        self._counts = {}
+        self._lock = threading.Lock()  # emit is called from concurrent chains and batch workers
+        self._queue = queue.Queue(maxsize=max_queue)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+
+    def emit(self, kind, payload, is_best=False):
+        """
+        Record an event. payload is a dict or a zero-argument callable returning one; callables
+        are only evaluated (on the writer thread) for records that pass the sampling policy.
+        """
+        with self._lock:
+            count = self._counts.get(kind, 0)
+            self._counts[kind] = count + 1
+        if not is_best and (self.best_only or count % self.every_n):
+            return
+        try:
+            self._queue.put_nowait((kind, time.time(), is_best, payload))
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def close(self):
+        """Flush the pending records and stop the writer"""
+        self._queue.put(None)
+        self._writer.join()
+
+    def _write_loop(self):
+        with open(self.path, "a") as f:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    break
+                kind, timestamp, is_best, payload = item
+                try:
+                    record = payload() if callable(payload) else payload
+                    f.write(json.dumps({"kind": kind, "time": timestamp, "is_best": is_best, **record}) + "\n")
+                    self.written += 1
+                except Exception as e:
+                    print(f"Failed to write trace record: {e}")
+                if self._queue.empty():
+                    f.flush()
+
+
+# GeoJSON for a shapely geometry (or None), for use inside trace payloads
+def geometry_to_geojson(geometry, simplify_tolerance=0.0001):
+    if geometry is None:
+        return None
+    return mapping(geometry.simplify(simplify_tolerance, preserve_topology=True))
+
+
+# ==== OFFLINE RENDERING ====
+def render_trace(trace_path, out_dir="./visualmaps/", kinds=None):
+    """Render the records of an NDJSON trace to folium HTML maps (one file per record)"""
+    from . import display_util  # folium is only needed for rendering
+
+    rendered = 0
+    with open(trace_path) as f:
+        for line in f:
+            record = json.loads(line)
+            kind = record["kind"]
+            if kinds and kind not in kinds:
+                continue
+            target = os.path.join(out_dir, kind, "")
+            os.makedirs(target, exist_ok=True)
+
+            if kind == "buffer":
+                previous = shape(record["previous_area"]) if record.get("previous_area") else None
+                display_util.write_buffers_to_map(previous, shape(record["area"]), output_path=target)
+            elif record.get("geometry") or record.get("waypoints"):
+                display_util.write_to_map_using_waypoints(record.get("geometry"), waypoints=record.get("waypoints"),
+                                                          start_coord=record.get("start"), end_coord=record.get("end"),
+                                                          path=target)
+            else:
+                continue
+            rendered += 1
+    print(f"Rendered {rendered} maps to {out_dir}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Work with optimizer traces")
+    commands = parser.add_subparsers(dest="command", required=True)
+    render_parser = commands.add_parser("render", help="render an NDJSON trace to HTML maps")
+    render_parser.add_argument("trace")
+    render_parser.add_argument("out_dir", nargs="?", default="./visualmaps/")
+    render_parser.add_argument("--kind", action="append", help="only render records of this kind")
+    args = parser.parse_args()
+    render_trace(args.trace, args.out_dir, args.kind)
@@ -0,0 +1,15 @@
+import pytest
+from model import benchmark
+from model import main as planner
+from model.evaluation_cache import EvaluationCache
+
+
+# the planner pointed at the stand-in servers, with fresh caches in a temporary directory
+@pytest.fixture
+def standin_planner(tmp_path, monkeypatch):
+    monkeypatch.setattr(planner, "evaluation_cache", EvaluationCache())
+    planner.poi_manager.reset()
+    with benchmark.standin_backends(ephemeral_ports=True) as servers, benchmark.isolated_caches(str(tmp_path)):
+        planner.standin_servers = servers
+        yield planner
+    del planner.standin_servers
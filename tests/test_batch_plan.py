@@ -0,0 +1,75 @@
+import json
+from model import batch_plan
+
+
+# === BATCH PLANNING AGAINST THE STAND-INS ===
+
+REQUESTS = [
+    {"id": "bos-pvd", "start": "Boston MA", "end": "Providence RI",
+     "preferences": {"theme_preference": "Food_and_Drink", "trip_duration_days": 2}},
+    {"id": "bos-loop", "start": "Boston MA", "preferences": {"theme_preference": "Tourism"}},
+    {"id": "bad-preferences", "start": "Boston MA", "preferences": {"no_such_preference": 1}},
+]
+
+
+def write_requests(path, requests, extra_lines=()):
+    path.write_text("".join(json.dumps(request) + "\n" for request in requests) + "".join(extra_lines))
+
+
+def read_results(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def run(input_path, output_path, **kwargs):
+    return batch_plan.run_batch(str(input_path), str(output_path), workers=2, max_iterations=2, **kwargs)
+
+
+def test_results_are_one_json_line_per_request(standin_planner, tmp_path):
+    input_path, output_path = tmp_path / "requests.jsonl", tmp_path / "results.jsonl"
+    write_requests(input_path, REQUESTS, extra_lines=["not json\n"])
+
+    assert run(input_path, output_path) == {"planned": 2, "failed": 2, "skipped": 0}
+
+    results = {result["id"]: result for result in read_results(output_path)}
+    assert set(results) == {"bos-pvd", "bos-loop", "bad-preferences", "line-4"}
+    for request_id in ("bos-pvd", "bos-loop"):
+        result = results[request_id]
+        assert result["ok"] is True
+        assert {"start_coord", "end_coord", "config", "score", "iterations", "duration_s", "distance_m",
+                "geometry", "pois", "timings", "stages", "caches"} <= set(result)
+        assert result["geometry"] and result["pois"]
+        assert result["timings"]["total_s"] > 0
+    assert results["bad-preferences"]["ok"] is False and "TypeError" in results["bad-preferences"]["error"]
+    assert results["line-4"]["error"].startswith("invalid request")
+
+
+def test_resume_skips_requests_already_planned(standin_planner, tmp_path):
+    input_path, output_path = tmp_path / "requests.jsonl", tmp_path / "results.jsonl"
+    write_requests(input_path, REQUESTS[:1])
+    run(input_path, output_path)
+
+    write_requests(input_path, REQUESTS[:2])
+    assert run(input_path, output_path) == {"planned": 1, "failed": 0, "skipped": 1}
+    assert [result["id"] for result in read_results(output_path)] == ["bos-pvd", "bos-loop"]
+
+
+def test_resume_after_a_cut_off_line(standin_planner, tmp_path):
+    input_path, output_path = tmp_path / "requests.jsonl", tmp_path / "results.jsonl"
+    write_requests(input_path, REQUESTS[:1])
+    output_path.write_text('{"id": "bos-pvd", "ok": tr')
+
+    assert run(input_path, output_path)["planned"] == 1
+    cut_off, result = output_path.read_text().splitlines()
+    assert json.loads(result)["id"] == "bos-pvd"
+
+
+def test_retry_failed_plans_failures_again(standin_planner, tmp_path):
+    input_path, output_path = tmp_path / "requests.jsonl", tmp_path / "results.jsonl"
+    write_requests(input_path, [REQUESTS[0], REQUESTS[2]])
+    run(input_path, output_path)
+
+    assert run(input_path, output_path) == {"planned": 0, "failed": 0, "skipped": 2}
+    assert run(input_path, output_path, retry_failed=True) == {"planned": 0, "failed": 1, "skipped": 1}
+    # results are appended as trips finish, not in request order
+    assert sorted(result["id"] for result in read_results(output_path)) == ["bad-preferences", "bad-preferences",
+                                                                            "bos-pvd"]
@@ -0,0 +1,26 @@
+import sys
+from model import benchmark
+from model import main as planner
+
+
+# === BENCHMARK HARNESS ===
+
+def test_quiet_output_silences_stdout_and_closes_devnull(capsys):
+    with planner.quiet_output():
+        devnull = sys.stdout
+        print("planner chatter")
+    assert devnull.closed
+    assert sys.stdout is not devnull
+    with planner.quiet_output(verbose=True):
+        print("shown")
+    assert capsys.readouterr().out == "shown\n"
+
+
+def test_run_benchmarks_reports_every_run_quietly(tmp_path, capsys):
+    report = benchmark.run_benchmarks(benchmark.SCENARIOS[1:2], max_iterations=2, ephemeral_ports=True,
+                                      cache_dir=str(tmp_path), measure_memory=False)
+
+    [run] = report["runs"]
+    assert run["scenario"] == "boston_providence_food" and run["standin_requests"] > 0
+    # only the summary line reaches stdout, the planner's own prints are silenced
+    assert len(capsys.readouterr().out.strip().splitlines()) == 1
@@ -0,0 +1,22 @@
+import pytest
+from model import cooling
+
+
+# === COOLING SCHEDULES ===
+
+def test_schedule_without_next_temperature_fails_at_construction():
+    class Incomplete(cooling.CoolingSchedule):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
+    with pytest.raises(TypeError):
+        cooling.CoolingSchedule()
+
+
+@pytest.mark.parametrize("name", [None] + list(cooling.SCHEDULES))
+def test_every_built_in_schedule_runs(name):
+    schedule = cooling.make_schedule(name)
+    assert schedule.start(100.0, 50) == 100.0
+    temperatures = [schedule.update(i % 2 == 0, 1.0) for i in range(50)]
+    assert all(0 < temperature < float("inf") for temperature in temperatures)
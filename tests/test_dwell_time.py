@@ -0,0 +1,40 @@
+import pytest
+from model import main as planner
+from model.dwell_time import DwellTimeModel
+from model.theme_meta import DEFAULT_DWELL_HOURS, DWELL_HOURS, PACE_FACTORS
+
+
+# === DETERMINISTIC DWELL TIMES ===
+
+def test_seconds_by_tag_and_pace():
+    model = DwellTimeModel()
+    seconds = model.seconds(["tourism=museum", "amenity=cafe", None, "not=a_tag"], "fast")
+    expected = [DWELL_HOURS["tourism=museum"], DWELL_HOURS["amenity=cafe"], DEFAULT_DWELL_HOURS, DEFAULT_DWELL_HOURS]
+    assert seconds.tolist() == pytest.approx([hours * 3600 * PACE_FACTORS["fast"] for hours in expected])
+
+
+def test_unknown_pace_is_rejected():
+    with pytest.raises(ValueError):
+        DwellTimeModel().seconds(["tourism=museum"], "sprint")
+
+
+def test_time_score_uses_the_tags_the_route_was_built_with():
+    waypoints = [[42.36, -71.06], [42.35, -71.07], [42.34, -71.08], [42.30, -71.0]]
+    route = {"duration": 3600, "stop_tags": [None, "tourism=museum", "amenity=cafe", None]}
+    config = planner.RouteConfig(time_budget=10 * 3600)
+
+    first = planner.calculate_time_score(route, waypoints, config)
+    # the POI cache has no say in the dwell time, so resetting it changes nothing
+    planner.poi_manager.reset()
+    assert planner.calculate_time_score(route, waypoints, config) == first
+
+    dwell_hours = DWELL_HOURS["tourism=museum"] + DWELL_HOURS["amenity=cafe"] + 2 * DEFAULT_DWELL_HOURS
+    assert first[0] == pytest.approx(3600 + dwell_hours * 3600 - config.time_budget)
+
+
+def test_records_keep_the_tag_of_each_poi():
+    manager = planner.POIQueryManager()
+    manager.add_to_cache([(-71.06, 42.36, "tourism=museum"), (-71.0601, 42.3601, "amenity=cafe")])
+    manager.reset_cache(manager.get_cached_pois())
+    assert manager.records([(-71.0601, 42.3601), (-71.06, 42.36), (0.0, 0.0)]) == [
+        (-71.0601, 42.3601, "amenity=cafe"), (-71.06, 42.36, "tourism=museum"), (0.0, 0.0, None)]
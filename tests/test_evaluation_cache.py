@@ -0,0 +1,70 @@
+from model.config_generator import RouteConfig
+from model.evaluation_cache import EvaluationCache
+from model.ratings_store import RatingsStore
+from model.standin_servers import foursquare_routes
+
+
+# === EVALUATION CACHE ===
+
+# more POIs allowed than the corridor holds, so every candidate visits the whole corridor
+WHOLE_CORRIDOR = RouteConfig(buffer_km=0.5, min_pois=1000, max_pois=1000, theme="Food_and_Drink")
+
+
+def test_key_ignores_corridor_fields_and_poi_order():
+    config = RouteConfig(buffer_km=3.0, segment_km=5)
+    pois = [(-71.06, 42.36, "tourism=museum"), (-71.07, 42.35, "amenity=cafe")]
+    key = EvaluationCache.make_key((0, 0), (1, 1), config, pois)
+    assert key == EvaluationCache.make_key((0, 0), (1, 1), config.replace(buffer_km=3.07, segment_km=6),
+                                           [(-71.07, 42.35), (-71.06, 42.36)])
+    assert key != EvaluationCache.make_key((0, 0), (1, 1), config.replace(pace="fast"), pois)
+    assert key != EvaluationCache.make_key((0, 0), (1, 1), config, pois[:1])
+    assert key != EvaluationCache.make_key((0, 0), (1, 1), config, pois, full_geometry=False)
+
+
+def test_neighbor_with_the_same_pois_is_answered_from_the_cache(standin_planner, tmp_path):
+    planner = standin_planner
+    planner.ratings_store = RatingsStore(str(tmp_path / "ratings.sqlite"), requests_per_s=1000)
+    start, end = planner.geocode_city("Boston MA"), planner.geocode_city("Providence RI")
+    config = WHOLE_CORRIDOR
+
+    first = planner.generate_and_score_route(start, end, config)
+    assert first is not None
+    requests_before = sum(server.request_count for server in planner.standin_servers.values())
+
+    # a neighbor whose buffer moved within the same quantization step
+    neighbor = config.replace(buffer_km=0.55)
+    assert planner.generate_and_score_route(start, end, neighbor) is first
+
+    stats = planner.evaluation_cache.stats()
+    assert (stats["hits"], stats["pool_hits"]) == (1, 1)
+    assert sum(server.request_count for server in planner.standin_servers.values()) == requests_before
+
+
+
+def test_matrix_only_evaluation_is_not_returned_for_full_geometry(standin_planner, tmp_path):
+    planner = standin_planner
+    planner.ratings_store = RatingsStore(str(tmp_path / "ratings.sqlite"), requests_per_s=1000)
+    start, end = planner.geocode_city("Boston MA"), planner.geocode_city("Providence RI")
+
+    matrix_only = planner.generate_and_score_route(start, end, WHOLE_CORRIDOR, full_geometry=False)
+    assert matrix_only[0]["geometry"] is None
+    full = planner.generate_and_score_route(start, end, WHOLE_CORRIDOR)
+    assert full[0]["geometry"]
+    assert planner.evaluation_cache.stats()["hits"] == 0
+
+
+def test_scores_with_fallback_ratings_are_not_cached(standin_planner, tmp_path):
+    planner = standin_planner
+    foursquare = planner.standin_servers["foursquare"]
+    planner.ratings_store = RatingsStore(str(tmp_path / "ratings.sqlite"), requests_per_s=1000, retry_after_s=0)
+    start, end = planner.geocode_city("Boston MA"), planner.geocode_city("Providence RI")
+
+    foursquare.routes = [("GET", "/v3/places/", lambda path, query, body: (503, {"message": "down"}))]
+    degraded = planner.generate_and_score_route(start, end, WHOLE_CORRIDOR)
+    assert degraded is not None and planner.evaluation_cache.stats()["entries"] == 0
+
+    foursquare.routes = foursquare_routes()
+    rated = planner.generate_and_score_route(start, end, WHOLE_CORRIDOR)
+    assert rated[2] != degraded[2]
+    assert planner.evaluation_cache.stats()["entries"] == 1
+    assert planner.generate_and_score_route(start, end, WHOLE_CORRIDOR) is rated
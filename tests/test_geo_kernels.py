@@ -0,0 +1,129 @@
+import math
+import numpy as np
+import pytest
+from model import geo_kernels
+from model.main import calculate_geographic_spread, haversine_distance
+
+
+# === GEO KERNELS AGAINST THE SCALAR HELPERS ===
+
+def random_points(n, seed):
+    rng = np.random.default_rng(seed)
+    return np.column_stack([rng.uniform(-180, 180, n), rng.uniform(-90, 90, n)])
+
+
+# (lon, lat) pairs across the antimeridian, through the poles and a few degenerate cases
+EDGE_PAIRS = [
+    ((179.9, 10.0), (-179.9, 10.0)),
+    ((180.0, 0.0), (-180.0, 0.0)),
+    ((-179.5, -45.0), (179.5, -45.5)),
+    ((0.0, 90.0), (120.0, 90.0)),
+    ((0.0, 89.9), (180.0, 89.9)),
+    ((10.0, -90.0), (-170.0, -89.0)),
+    ((0.0, 0.0), (180.0, 0.0)),  # antipodal
+    ((-71.06, 42.36), (-71.06, 42.36)),
+]
+
+
+# the O(n^2) loop calculate_geographic_spread used before the kernels
+def scalar_pairwise_mean(points):
+    total, pairs = 0.0, 0
+    for i in range(len(points)):
+        for j in range(i + 1, len(points)):
+            total += haversine_distance(points[i][0], points[i][1], points[j][0], points[j][1])
+            pairs += 1
+    return total / pairs
+
+
+def scalar_polyline_length(points):
+    return sum(haversine_distance(lon1, lat1, lon2, lat2)
+               for (lon1, lat1), (lon2, lat2) in zip(points[:-1], points[1:]))
+
+
+def test_haversine_distances_matches_scalar_on_random_points():
+    a, b = random_points(500, 1), random_points(500, 2)
+    vectorized = geo_kernels.haversine_distances(a[:, 0], a[:, 1], b[:, 0], b[:, 1])
+    expected = [haversine_distance(lon1, lat1, lon2, lat2) for (lon1, lat1), (lon2, lat2) in zip(a, b)]
+    np.testing.assert_allclose(vectorized, expected, rtol=1e-9, atol=1e-6)
+
+
+@pytest.mark.parametrize("first, second", EDGE_PAIRS)
+def test_haversine_distances_matches_scalar_on_edge_cases(first, second):
+    vectorized = geo_kernels.haversine_distances(first[0], first[1], second[0], second[1])
+    assert vectorized == pytest.approx(haversine_distance(*first, *second), rel=1e-9, abs=1e-6)
+
+
+def test_haversine_distances_across_the_antimeridian_is_short():
+    # 0.2 degrees of longitude at 10N, not most of the way around the globe
+    distance = geo_kernels.haversine_distances(179.9, 10.0, -179.9, 10.0)
+    assert distance == pytest.approx(0.2 * math.pi / 180 * geo_kernels.EARTH_RADIUS_M * math.cos(math.radians(10)),
+                                     rel=1e-3)
+
+
+def test_haversine_matrix_matches_scalar():
+    points = np.vstack([random_points(40, 3), [p for pair in EDGE_PAIRS for p in pair]])
+    matrix = geo_kernels.haversine_matrix(points)
+    assert matrix.shape == (len(points), len(points))
+    expected = [[haversine_distance(lon1, lat1, lon2, lat2) for lon2, lat2 in points] for lon1, lat1 in points]
+    np.testing.assert_allclose(matrix, expected, rtol=1e-9, atol=1e-6)
+    np.testing.assert_allclose(matrix, matrix.T, atol=1e-6)
+
+
+def test_haversine_matrix_between_two_sets():
+    a, b = random_points(7, 4), random_points(5, 5)
+    matrix = geo_kernels.haversine_matrix(a, b)
+    assert matrix.shape == (7, 5)
+    assert matrix[3, 2] == pytest.approx(haversine_distance(*a[3], *b[2]), rel=1e-9)
+
+
+@pytest.mark.parametrize("n", [2, 3, 10, 250, 1000])
+def test_pairwise_mean_distance_matches_scalar_loop(n):
+    points = random_points(n, n).tolist()
+    assert geo_kernels.pairwise_mean_distance(points) == pytest.approx(scalar_pairwise_mean(points), rel=1e-9)
+
+
+def test_pairwise_mean_distance_with_edge_points():
+    points = [p for pair in EDGE_PAIRS for p in pair]
+    assert geo_kernels.pairwise_mean_distance(points) == pytest.approx(scalar_pairwise_mean(points), rel=1e-9)
+
+
+@pytest.mark.parametrize("points", [[], [(-71.06, 42.36)]])
+def test_pairwise_mean_distance_of_fewer_than_two_points_is_zero(points):
+    assert geo_kernels.pairwise_mean_distance(points) == 0.0
+
+
+def test_pairwise_mean_distance_sampled_estimate():
+    # above max_exact_points the mean comes from sampled pairs, compared with the exact mean
+    rng = np.random.default_rng(6)
+    points = np.column_stack([rng.uniform(-75, -70, 1500), rng.uniform(40, 45, 1500)])
+    exact = np.triu(geo_kernels.haversine_matrix(points), k=1).sum() / (1500 * 1499 / 2)
+    estimate = geo_kernels.pairwise_mean_distance(points)
+    assert estimate == pytest.approx(exact, rel=0.01)
+    assert geo_kernels.pairwise_mean_distance(points) == estimate  # seeded, so repeatable
+
+
+def test_pairwise_mean_distance_sampled_branch_never_pairs_a_point_with_itself():
+    points = [(0.0, 0.0), (1.0, 0.0)] * 600
+    assert geo_kernels.pairwise_mean_distance(points, max_exact_points=10, sample_pairs=20000) > 0
+
+
+@pytest.mark.parametrize("points", [
+    [],
+    [(-71.06, 42.36)],
+    [(-71.06, 42.36), (-71.41, 41.82)],
+    [(-71.06, 42.36), (-71.06, 42.36), (-71.41, 41.82), (-71.41, 41.82), (-74.0, 40.7)],
+    [(179.9, 0.0), (-179.9, 0.0), (-179.9, 0.5)],
+])
+def test_polyline_length_matches_summed_scalar_haversine(points):
+    assert geo_kernels.polyline_length(points) == pytest.approx(scalar_polyline_length(points), rel=1e-9, abs=1e-6)
+
+
+def test_polyline_length_of_repeated_point_is_zero():
+    assert geo_kernels.polyline_length([(-71.06, 42.36)] * 4) == 0.0
+
+
+def test_geographic_spread_reads_waypoints_as_lat_lon():
+    # route waypoints are [lat, lon]; the kernels take (lon, lat)
+    waypoints = [[42.36, -71.06], [41.82, -71.41], [40.71, -74.0]]
+    points = [(lon, lat) for lat, lon in waypoints]
+    assert calculate_geographic_spread(waypoints) == pytest.approx(scalar_pairwise_mean(points), rel=1e-9)
@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+from model import local_search
+from model import main as planner
+from model.config_generator import RouteConfig
+
+
+# === TOUR LOCAL SEARCH SCORING ===
+
+POINTS = [(-71.06, 42.36), (-71.41, 41.82), (-71.10, 42.30), (-71.20, 42.10), (-71.30, 41.95)]
+RATINGS = np.array([1.0, 2.0, 4.5, 3.0, 5.0])
+TAGS = [None, None, "amenity=cafe", "tourism=museum", "leisure=park"]
+
+
+def test_tour_score_matches_calculate_score(monkeypatch):
+    config = RouteConfig(theme="Food_and_Drink", max_pois=4)
+    durations = np.full((len(POINTS), len(POINTS)), 1800.0)
+    dwell = planner.dwell_model.seconds(TAGS, config.pace)
+    state = local_search.TourState(POINTS, durations, dwell, RATINGS, [2, 3, 4], time_budget=config.time_budget,
+                                   target_count=config.max_pois, min_stops=config.min_pois,
+                                   max_stops=config.max_pois, weights=planner.SCORE_WEIGHTS)
+
+    # the same tour as a routed candidate: waypoints are [lat, lon], ratings cover every waypoint
+    order = [0, 2, 3, 4, 1]
+    monkeypatch.setattr(planner, "get_all_ratings", lambda pois: RATINGS[order])
+    route = {"duration": 1800.0 * (len(order) - 1), "stop_tags": [TAGS[node] for node in order]}
+    waypoints = [[POINTS[node][1], POINTS[node][0]] for node in order]
+
+    assert state.score == pytest.approx(planner.calculate_score(route, config, waypoints)[0])
@@ -0,0 +1,61 @@
+import math
+import time
+from model import parallel_annealing
+from model.config_generator import RouteConfig
+
+
+# === MULTI-CHAIN SIMULATED ANNEALING AGAINST THE STAND-INS ===
+
+def test_tour_chain_reports_its_score(standin_planner):
+    planner = standin_planner
+    start, end = planner.geocode_city("Boston MA"), planner.geocode_city("Providence RI")
+    config = RouteConfig(theme="Food_and_Drink")
+    chain = parallel_annealing.run_chain(0, 1, start, end, config, time.time() + 30,
+                                         {"neighborhood": "tour", "max_iterations": 5})
+
+    assert chain["route"] is not None
+    assert math.isfinite(chain["score"])
+    assert chain["score"] == planner.calculate_score(chain["route"], chain["config"], chain["pois"])[0]
+
+
+def test_thread_chains_do_not_query_incrementally(standin_planner, monkeypatch):
+    planner = standin_planner
+    monkeypatch.setattr(planner, "poi_query_mode", "incremental")
+    modes = []
+
+    def run_chain(chain_id, *args):
+        modes.append(planner.poi_query_mode)
+        return {"chain_id": chain_id, "route": None, "config": None, "pois": None, "score": float("inf")}
+
+    monkeypatch.setattr(parallel_annealing, "run_chain", run_chain)
+    parallel_annealing.simulated_annealing_multichain((0.0, 0.0), (1.0, 1.0), n_chains=3, executor="thread")
+
+    assert modes == ["tiles"] * 3
+    assert planner.poi_query_mode == "incremental"
+
+
+def test_tour_search_fills_the_trace(standin_planner):
+    planner = standin_planner
+    start, end = planner.geocode_city("Boston MA"), planner.geocode_city("Providence RI")
+    trace = []
+    route, config, pois = planner.optimize_tour(start, end, RouteConfig(theme="Food_and_Drink"),
+                                                iterations=200, trace=trace)
+
+    assert route is not None
+    assert trace[0]["iteration"] == 0 and len(trace) > 1
+    assert all(later["best_score"] <= earlier["best_score"] for earlier, later in zip(trace, trace[1:]))
+
+
+def test_tour_search_falls_back_when_the_table_fails(standin_planner):
+    planner = standin_planner
+    osrm = planner.standin_servers["osrm"]
+    osrm.routes = [route for route in osrm.routes if route[1] != "/table/v1/"]
+    start, end = planner.geocode_city("Boston MA"), planner.geocode_city("Providence RI")
+    config = RouteConfig(theme="Food_and_Drink")
+
+    assert planner.optimize_tour(start, end, config) == (None, config, None)
+
+    route, pois = planner.generate_random_route_and_poll_pois(start, end, config)
+    best_route, best_config, best_pois = planner.simulated_annealing(pois, start, end, route, config,
+                                                                     neighborhood="tour", max_iterations=3)
+    assert best_route is not None and best_pois
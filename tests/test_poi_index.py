@@ -0,0 +1,122 @@
+import numpy as np
+import pytest
+from shapely.geometry import Point, box
+from model import poi_index
+from model.poi_index import POIIndex
+
+pytest.importorskip("osmium")
+
+
+# === OFFLINE POI INDEX BUILT FROM A TINY OSM FIXTURE ===
+
+# id, lon, lat, tags
+NODES = [
+    (1, -71.0600, 42.3600, {"amenity": "cafe", "name": "Café Nero"}),
+    (2, -71.0940, 42.3390, {"tourism": "museum", "name": "Museum of Fine Arts"}),
+    (3, -71.0620, 42.3610, {"amenity": "restaurant"}),
+    (4, -71.4100, 41.8200, {"amenity": "fuel", "name": "Providence Fuel"}),
+    (5, -71.0605, 42.3605, {"leisure": "bench_not_themed"}),
+    (6, -71.3000, 42.1000, {"amenity": "cafe", "name": "Far Cafe"}),
+]
+
+
+def write_extract(path):
+    nodes = []
+    for node_id, lon, lat, tags in NODES:
+        tag_xml = "".join(f'<tag k="{key}" v="{value}"/>' for key, value in tags.items())
+        nodes.append(f'<node id="{node_id}" version="1" lat="{lat}" lon="{lon}">{tag_xml}</node>')
+    path.write_text('<?xml version="1.0" encoding="UTF-8"?><osm version="0.6">' + "".join(nodes) + "</osm>",
+                    encoding="utf-8")
+
+
+@pytest.fixture
+def index_dir(tmp_path):
+    extract = tmp_path / "fixture.osm"
+    write_extract(extract)
+    poi_index.ingest(str(extract), str(tmp_path / "index"))
+    return str(tmp_path / "index")
+
+
+def test_ingest_keeps_only_themed_nodes(index_dir):
+    index = POIIndex(index_dir)
+    assert sorted(index.id.tolist()) == [1, 2, 3, 4, 6]
+    # rows are sorted by grid cell
+    cells = poi_index.cell_ids(index.lon, index.lat, index.cell_deg)
+    assert np.all(np.diff(cells) >= 0)
+
+
+def test_bbox_query(index_dir):
+    index = POIIndex(index_dir)
+    rows = index.candidate_rows(-71.07, 42.35, -71.05, 42.37)
+    assert {1, 3} <= set(index.id[rows].tolist())
+    assert 4 not in index.id[rows]
+
+    records = index.query(box(-71.07, 42.35, -71.05, 42.37), "Food_and_Drink")
+    assert sorted(records) == [(-71.062, 42.361, "amenity=restaurant"), (-71.06, 42.36, "amenity=cafe")]
+
+
+def test_radius_query(index_dir):
+    index = POIIndex(index_dir)
+    assert len(index.query(Point(-71.06, 42.36).buffer(0.01), "Food_and_Drink")) == 2
+    assert index.query(Point(-71.06, 42.36).buffer(0.01), "Tourism") == []
+    assert index.query(Point(-71.094, 42.339).buffer(0.01), "Tourism") == [(-71.094, 42.339, "tourism=museum")]
+    assert index.query(Point(0.0, 0.0).buffer(0.01), "Food_and_Drink") == []
+
+
+def test_tag_codes_filter_by_theme(index_dir):
+    index = POIIndex(index_dir)
+    food_tags = {index.tags[code] for code in index.tag_codes("Food_and_Drink")}
+    assert food_tags == {"amenity=restaurant", "amenity=cafe", "amenity=fast_food", "amenity=pub", "amenity=bar",
+                         "amenity=ice_cream"}
+    everything = box(-72, 41, -70, 43)
+    assert [tag for _, _, tag in index.query(everything, "Transportation")] == ["amenity=fuel"]
+
+
+def test_name_lookups(index_dir):
+    index = POIIndex(index_dir)
+    names = {int(index.id[row]): index.name(row) for row in range(len(index))}
+    assert names == {1: "Café Nero", 2: "Museum of Fine Arts", 3: "", 4: "Providence Fuel", 6: "Far Cafe"}
+
+
+def test_planner_falls_back_to_overpass_without_an_index(standin_planner, index_dir):
+    planner = standin_planner
+    overpass = planner.standin_servers["overpass"]
+    area = box(-71.07, 42.35, -71.05, 42.37)
+
+    assert planner.offline_poi_index is None
+    requests = overpass.request_count
+    planner.query_poi_records_for_polygon(area, "Food_and_Drink")
+    assert overpass.request_count > requests
+
+    planner.load_offline_poi_index(index_dir)
+    try:
+        requests = overpass.request_count
+        assert sorted(planner.query_poi_records_for_polygon(area, "Food_and_Drink")) == \
+            sorted(planner.offline_poi_index.query(area, "Food_and_Drink"))
+        route_line = planner.get_route_geometry(planner.geocode_city("Boston MA"),
+                                                planner.geocode_city("Providence RI"))
+        pois = planner.poll_pois_from_route_using_segments(route_line, planner.RouteConfig(theme="Food_and_Drink"))
+        assert overpass.request_count == requests
+        assert set(pois) <= {(-71.06, 42.36, "amenity=cafe"), (-71.062, 42.361, "amenity=restaurant"),
+                             (-71.3, 42.1, "amenity=cafe")}
+    finally:
+        planner.load_offline_poi_index(None)
+
+    # with the index unloaded, the corridor goes back to the tile cache and Overpass
+    pois = planner.poll_pois_from_route_using_segments(route_line, planner.RouteConfig(theme="Food_and_Drink"))
+    assert overpass.request_count > requests and pois
+
+
+def test_itinerary_names_come_from_the_index(standin_planner, index_dir):
+    for module in ("streamlit", "folium", "polyline", "geopy"):
+        pytest.importorskip(module)
+    from webapp import gui_utils
+
+    planner = standin_planner
+    planner.load_offline_poi_index(index_dir)
+    try:
+        places = gui_utils._named_places_from_index([(42.36, -71.06)], "Food_and_Drink", 2000)
+    finally:
+        planner.load_offline_poi_index(None)
+    # unnamed POIs are left out, and the radius pads the box around the stop
+    assert places == [("Café Nero", -71.06, 42.36)]
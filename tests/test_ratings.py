@@ -0,0 +1,64 @@
+import math
+import pytest
+from model.config_generator import RouteConfig
+from model.ratings_store import RatingsStore
+from model.standin_servers import foursquare_routes
+
+
+# === POI RATINGS AGAINST THE FOURSQUARE STAND-IN ===
+
+POIS = [(42.36, -71.06), (42.35, -71.07), (41.82, -71.41)]
+
+
+def failing_routes(status):
+    def fail(path, query, body):
+        return status, {"message": "error"}
+    return [("GET", "/v3/places/", fail)]
+
+
+def test_generate_and_score_route_against_the_standins(standin_planner):
+    planner = standin_planner
+    start, end = planner.geocode_city("Boston MA"), planner.geocode_city("Providence RI")
+    route, waypoints, score, time_percentage = planner.generate_and_score_route(
+        start, end, RouteConfig(theme="Food_and_Drink"))
+
+    assert math.isfinite(score)
+    assert route["duration"] > 0 and len(waypoints) == len(route["stop_tags"])
+    assert planner.standin_servers["foursquare"].request_count > 0
+    # every rating came from the stand-in (0-10, scaled to 0-5) and was stored
+    requests = planner.standin_servers["foursquare"].request_count
+    ratings = planner.get_all_ratings(waypoints)
+    assert all(0 <= rating <= 5 for rating in ratings)
+    assert planner.standin_servers["foursquare"].request_count == requests
+
+
+@pytest.mark.parametrize("status", [401, 429, 503])
+def test_error_responses_are_not_stored(standin_planner, tmp_path, status):
+    planner = standin_planner
+    foursquare = planner.standin_servers["foursquare"]
+    planner.ratings_store = store = RatingsStore(str(tmp_path / "ratings.sqlite"), retry_after_s=3600)
+    foursquare.routes = failing_routes(status)
+
+    assert planner.get_all_ratings(POIS).tolist() == [planner.fallback_poi_rating] * len(POIS)
+    assert store.memo == {}
+    assert store._connection().execute("SELECT COUNT(*) FROM ratings").fetchone()[0] == 0
+
+    # failed POIs are not looked up again until retry_after_s has passed
+    requests = foursquare.request_count
+    planner.get_all_ratings(POIS)
+    assert foursquare.request_count == requests
+
+    foursquare.routes = foursquare_routes()
+    store.retry_after_s = 0
+    planner.get_all_ratings(POIS)
+    assert len(store.memo) == len(POIS)
+    assert store._connection().execute("SELECT COUNT(*) FROM ratings").fetchone()[0] == len(POIS)
+
+
+def test_failed_lookup_raises_without_a_default(standin_planner, tmp_path):
+    planner = standin_planner
+    planner.standin_servers["foursquare"].routes = failing_routes(500)
+    store = RatingsStore(str(tmp_path / "ratings.sqlite"))
+    with pytest.raises(Exception):
+        store.get_ratings(POIS, planner.lookup_rating)
+    assert store.memo == {}
@@ -0,0 +1,36 @@
+from model.route_cache import RouteCache
+
+
+# === PERSISTENT OSRM ROUTE CACHE ===
+
+def coords(i):
+    return [(-71.0 - i / 100, 42.0), (-71.5, 42.5)]
+
+
+def stored_keys(cache):
+    return {row[0] for row in cache._connection().execute("SELECT key FROM routes")}
+
+
+def test_memory_hits_keep_routes_from_disk_eviction(tmp_path):
+    cache = RouteCache(str(tmp_path / "routes.sqlite"), max_entries=3, memory_entries=3, touch_batch=100)
+    for i in range(3):
+        cache.put(coords(i), {}, {"route": i})
+
+    # route 0 is only ever hit in memory, which must still count as an access on disk
+    assert cache.get(coords(0)) == {"route": 0}
+    cache.put(coords(3), {}, {"route": 3})
+
+    assert stored_keys(cache) == {cache.make_key(coords(i)) for i in (0, 2, 3)}
+
+
+def test_memory_hits_are_written_in_batches(tmp_path):
+    cache = RouteCache(str(tmp_path / "routes.sqlite"), touch_batch=2)
+    cache.put(coords(0), {}, {"route": 0})
+    cache.put(coords(1), {}, {"route": 1})
+    written = dict(cache._connection().execute("SELECT key, last_access FROM routes"))
+
+    cache.get(coords(0))
+    assert dict(cache._connection().execute("SELECT key, last_access FROM routes")) == written
+    cache.get(coords(1))
+    touched = dict(cache._connection().execute("SELECT key, last_access FROM routes"))
+    assert all(touched[key] > written[key] for key in written)
@@ -0,0 +1,27 @@
+import pytest
+from model.geocoding import CachedGeocoder
+from model.ratings_store import RatingsStore
+from model.route_cache import RouteCache
+from model.tile_cache import TileCache
+
+
+# === SQLITE-BACKED CACHES ===
+
+TABLES = {RouteCache: {"routes"}, RatingsStore: {"ratings"}, TileCache: {"tiles"},
+          CachedGeocoder: {"places", "addresses"}}
+
+
+def make(cls, path):
+    return cls(None, path=path) if cls is CachedGeocoder else cls(path)
+
+
+@pytest.mark.parametrize("cls", list(TABLES))
+def test_connection_creates_the_schema_and_reopens_after_a_fork(cls, tmp_path):
+    store = make(cls, str(tmp_path / "nested" / "store.sqlite"))
+    conn = store._connection()
+    assert store._connection() is conn
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert tables == TABLES[cls]
+
+    store._conn_pid = -1  # as seen from a forked child
+    assert store._connection() is not conn
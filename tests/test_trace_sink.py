@@ -0,0 +1,22 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from model.trace_sink import NDJSONTraceSink
+
+
+# === NDJSON TRACE SINK ===
+
+def test_sampling_is_exact_under_concurrent_emits(tmp_path):
+    path = tmp_path / "trace.ndjson"
+    sink = NDJSONTraceSink(str(path), every_n=10, max_queue=10000)
+
+    def emit_many(worker):
+        for i in range(1000):
+            sink.emit("sa_iteration", {"worker": worker, "i": i})
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(emit_many, range(8)))
+    sink.close()
+
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert len(records) == sink.written == 8 * 1000 // 10
+    assert sink.dropped == 0
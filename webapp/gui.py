@@ -1,10 +1,12 @@
 from model.config_generator import UserPreferences, generate_route_config_from_user_preferences
 from model.main import (geocode_city, generate_random_point_within, get_city_bounds,
-                        generate_random_route_and_poll_pois, simulated_annealing)
+                        generate_random_route_and_poll_pois, simulated_annealing_progress)
 from gui_utils import generate_itinerary, write_to_map_using, write_to_map_using_waypoints
 from streamlit_folium import st_folium
 from model.theme_meta import THEMES
 import streamlit as st
+import streamlit.components.v1 as components
+import time
 
 st.title("Travel Route Generator")
 
@@ -134,6 +136,23 @@ roam_level = st.sidebar.slider(
     step=0.5
 )
 
+pace = st.sidebar.radio(
+    "🚶 How much time do you like to spend at each stop?",
+    options=["relaxed", "moderate", "fast"],
+    index=1,
+    format_func=lambda x: {"relaxed": "Relaxed (linger)", "moderate": "Moderate",
+                           "fast": "Fast (quick visits)"}[x]
+)
+
+# wall-clock limit of the route search, the best route so far is shown while it runs
+search_seconds = st.sidebar.slider(
+    "⏳ How long should we search for a better route (seconds)?",
+    min_value=10,
+    max_value=300,
+    value=60,
+    step=10
+)
+
 run_button = st.button("Generate Route")
 
 # SIMULATED ANNEALING RUN
@@ -151,7 +170,8 @@ if run_button:
                                                min_poi_rating=min_poi_rating,
                                                route_type=route_type,
                                                prefer_scenic_routes=prefer_scenic_routes,
-                                               roam_level=roam_level)
+                                               roam_level=roam_level,
+                                               pace=pace)
             config = generate_route_config_from_user_preferences(trip_preferences)
         except KeyError as e:
             st.error(f"Missing expected key: {e}")
@@ -176,10 +196,30 @@ if run_button:
                     if not route or not pois:
                         st.error("Failed to generate a valid route or POIs.")
                     else:
-                        best_route, _, best_pois = simulated_annealing(pois, start_coord, end_coord, route, config)
-
-                        # store route data in session state to display map
-                        st.session_state.route_data = (best_route, best_pois, start_coord, end_coord)
+                        # clicking stop reruns the script, which ends the search and shows the
+                        # best route kept in session state below
+                        st.button("Stop and keep the best route so far")
+                        status = st.empty()
+                        progress_map = st.empty()
+
+                        best_route, best_pois = route, pois
+                        deadline = time.time() + search_seconds
+                        for progress in simulated_annealing_progress(pois, start_coord, end_coord, route, config,
+                                                                     deadline=deadline):
+                            best_route, best_pois = progress["route"], progress["pois"]
+                            # store route data in session state to display map (also after a stop)
+                            st.session_state.route_data = (best_route, best_pois, start_coord, end_coord)
+                            status.write(f"Best score so far: {progress['score']:.3f} "
+                                         f"(iteration {progress['iteration']}, {progress['elapsed']:.0f} s)")
+                            if not progress["done"] and best_route and best_route.get("geometry"):
+                                current_map = write_to_map_using_waypoints(encoded_polyline=best_route["geometry"],
+                                                                           waypoints=best_pois,
+                                                                           start_coord=(start_coord[1], start_coord[0]),
+                                                                           end_coord=(end_coord[1], end_coord[0]))
+                                with progress_map.container():
+                                    components.html(current_map._repr_html_(), height=500)
+
+                        progress_map.empty()
                         st.success("Route generated!")
 
                         # show route using folium
@@ -202,6 +242,7 @@ elif st.session_state.route_data:
                                                   start_coord=(start_coord[1],start_coord[0]), end_coord=(end_coord[1],end_coord[0]))
         st_folium(map_folium, width=725)
         st.header("Your Itinerary")
-        st.write(generate_itinerary(best_pois, selected_theme, best_route["legs"]))
-        print(generate_itinerary(best_pois, selected_theme, best_route["legs"]))
+        itinerary = generate_itinerary(best_pois, selected_theme, best_route["legs"])
+        st.write(itinerary)
+        print(itinerary)
 
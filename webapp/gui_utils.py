@@ -1,107 +1,134 @@
-from geopy.geocoders import Nominatim
-from geopy.distance import geodesic
 from model.theme_meta import THEMES
+from model.http_client import get_client
+from model.geo_kernels import haversine_matrix
+from model import main as planner
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import numpy as np
 import streamlit as st
 import folium
 import polyline
 import requests
 
-# reverse geocoding utils
-geolocator = Nominatim(
-        user_agent="travel_annealing",
-        domain="localhost:8080",
-        scheme="http"
-    )
 overpass_url = "http://localhost:12347/api/interpreter"
+overpass_client = get_client("overpass")
+itinerary_cache = OrderedDict()  # route key -> itinerary lines, least recently used first
+max_itineraries = 128
+itinerary_lock = threading.Lock()  # streamlit runs every session on its own thread
 
-# get city for a POI coordinate
+# get city for a POI coordinate (reverse lookups are cached by the planner's geocoder)
 def reverse_geocode(lat, lon):
     try:
-        location = geolocator.reverse((lat, lon), language='en', timeout=10)
-        if location and location.raw.get('address'):
-            city = location.raw['address'].get('city', None)
+        address = planner.geocoder.reverse_address(lat, lon, language='en')
+        if address:
+            city = address.get('city', None)
             # since some places don't have city tags
             if not city:
-                city = location.raw['address'].get('town', None)
+                city = address.get('town', None)
             if not city:
-                city = location.raw['address'].get('village', None)
+                city = address.get('village', None)
             return city
         else:
             return "Unknown City"
     except Exception as e:
         return f"Error: {e}"
 
-# reverse search POI from coordinates that is within radius and matches theme
-def get_nearest_poi(lat, lon, theme, search_radius=2000):
-    # theme picked by user
+# finds the nearest named POI for every stop at once: from the offline POI index when one is
+# loaded, otherwise with a single Overpass query holding one around-clause per stop
+def get_nearest_pois(coordinates, theme, search_radius=2000):
     tags = THEMES.get(theme, {})
+    if not tags or not coordinates:
+        return [None] * len(coordinates)
 
-    if not tags:
-        return None
+    if planner.offline_poi_index is not None:
+        places = _named_places_from_index(coordinates, theme, search_radius)
+    else:
+        places = _named_places_from_overpass(coordinates, tags, search_radius)
+    if not places:
+        print("No POIs found within the given radius.")
+        return [None] * len(coordinates)
+
+    # distance from every stop to every candidate, keep the closest one within the radius
+    stops = np.array([(lon, lat) for lat, lon in coordinates], dtype=float)
+    distances = haversine_matrix(stops, np.array([(lon, lat) for name, lon, lat in places]))
+    nearest = []
+    for row in distances:
+        best = int(np.argmin(row))
+        nearest.append({'name': places[best][0], 'distance': float(row[best])} if row[best] <= search_radius else None)
+    return nearest
+
+def _named_places_from_overpass(coordinates, tags, search_radius):
+    clauses = []
+    for lat, lon in coordinates:
+        for key, values in tags.items():
+            clauses.append(f'node["{key}"~"{"|".join(values)}"](around:{search_radius},{lat},{lon});')
+    query = f"[out:json];({''.join(clauses)});out body;"
 
-    # overpass query to get POIs
-    query = """
-        [out:json];
-        (
-            node["amenity"~"{}"](around:{}, {}, {});
-            way["amenity"~"{}"](around:{}, {}, {});
-            relation["amenity"~"{}"](around:{}, {}, {});
-        );
-        out body;
-        """.format("|".join(tags.get("amenity", [])), search_radius, lat, lon,
-                   "|".join(tags.get("amenity", [])), search_radius, lat, lon,
-                   "|".join(tags.get("amenity", [])), search_radius, lat, lon)
-
-    # try overpass query, included timeout to prevent error
     try:
-        response = requests.get(overpass_url, params={'data': query}, timeout=10)
-        # checking for any HTTP errors
+        response = overpass_client.post(overpass_url, data=query)
         response.raise_for_status()
-
-        try:
-            data = response.json()
-        except ValueError as e:
-            print(f"Error decoding JSON: {e}")
-            return None
-
-        # if we have the data
-        places = []
-
-        for element in data['elements']:
-            name = element.get('tags', {}).get('name', 'Unnamed')
-            poi_lat = element.get('lat', None)
-            poi_lon = element.get('lon', None)
-
-            # make sure we return *named* places with valid coordinates
-            if poi_lat and poi_lon and name != 'Unnamed':
-                # calculate the distance to the provided coordinates
-                distance = geodesic((lat, lon), (poi_lat, poi_lon)).meters
-                places.append({'name': name, 'distance': distance})
-
-        # return the closest POI
-        if places:
-            nearest_poi = min(places, key=lambda x: x['distance'])
-            return nearest_poi
-        else:
-            print("No POIs found within the given radius.")
-            return None
-
-    except requests.exceptions.RequestException as e:
+        data = response.json()
+    except (requests.exceptions.RequestException, ValueError) as e:
         print(f"Error making request to Overpass API: {e}")
-        return None
-
-
-# generate itinerary from coors
+        return []
+
+    # make sure we only return *named* places with valid coordinates
+    return [(element['tags']['name'], element['lon'], element['lat'])
+            for element in data.get('elements', [])
+            if element.get('tags', {}).get('name') and element.get('lat') and element.get('lon')]
+
+def _named_places_from_index(coordinates, theme, search_radius):
+    index = planner.offline_poi_index
+    lats = [lat for lat, lon in coordinates]
+    lons = [lon for lat, lon in coordinates]
+    # pad the bounding box by the search radius (degrees of longitude shrink with latitude)
+    pad_lat = search_radius / 111320
+    pad_lon = pad_lat / max(0.1, np.cos(np.radians(max(abs(v) for v in lats))))
+    rows = index.candidate_rows(min(lons) - pad_lon, min(lats) - pad_lat, max(lons) + pad_lon, max(lats) + pad_lat)
+    rows = rows[np.isin(index.tag[rows], index.tag_codes(theme))]
+    places = [(index.name(row), float(index.lon[row]), float(index.lat[row])) for row in rows]
+    return [place for place in places if place[0]]
+
+# reverse geocodes many coordinates concurrently (each distinct coordinate once)
+def reverse_geocode_many(coordinates, max_workers=4):
+    keys = [(lat, lon) for lat, lon in coordinates]
+    unique = list(dict.fromkeys(keys))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        cities = dict(zip(unique, executor.map(lambda key: reverse_geocode(*key), unique)))
+    return [cities[key] for key in keys]
+
+# generate itinerary from coors (memoized per route, the last max_itineraries routes are kept)
 def generate_itinerary(coordinates, theme, legs):
+    route_key = (tuple(tuple(coord) for coord in coordinates), theme,
+                 tuple((leg["distance"], leg["duration"]) for leg in legs))
+    with itinerary_lock:
+        if route_key in itinerary_cache:
+            itinerary_cache.move_to_end(route_key)
+            return itinerary_cache[route_key]
+
+    itinerary = _build_itinerary(coordinates, theme, legs)
+    with itinerary_lock:
+        itinerary_cache[route_key] = itinerary
+        itinerary_cache.move_to_end(route_key)
+        while len(itinerary_cache) > max_itineraries:
+            itinerary_cache.popitem(last=False)
+    return itinerary
+
+def _build_itinerary(coordinates, theme, legs):
     itinerary = []
     stop_number = 1
 
+    nearest_pois = get_nearest_pois(coordinates, theme)
+    found = [coord for coord, poi in zip(coordinates, nearest_pois) if poi]
+    cities = dict(zip(map(tuple, found), reverse_geocode_many(found)))
+
     for i, coord in enumerate(coordinates):
         lat, lon = coord
-        nearest_poi = get_nearest_poi(lat, lon, theme)
+        nearest_poi = nearest_pois[i]
 
         if nearest_poi:
-            city = reverse_geocode(lat, lon)
+            city = cities[tuple(coord)]
             # use route["legs"] to add distance and duration to next stop
             if i < len(coordinates) - 1:
                 # get the leg that corresponds with the current stop